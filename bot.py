@@ -1,17 +1,42 @@
+"""
+Бот приёма заявок.
+
+Настройки (load_config): переменные окружения BOT_TOKEN, BOT_OWNER_IDS (id через запятую),
+BOT_WEBHOOK_SECRET, а если их нет — bot_config.json рядом с ботом (не коммитится):
+    {"token": "123:ABC", "owner_ids": [5651149188, 728379071], "webhook_secret": "..."}
+
+Запуск:
+    python3 bot.py                                   # long polling
+    python3 bot.py --webhook https://example.com/tg  # вебхук, локальный сервер на --listen:--port
+Апдейты разных пользователей обрабатываются параллельно (не больше --workers одновременно),
+апдейты одного пользователя — строго по порядку (PerUserUpdateProcessor).
+Анкете (bot_intake) нужен pip install "python-telegram-bot[job-queue]" — без JobQueue брошенные анкеты не сбрасываются;
+вебхук требует pip install "python-telegram-bot[webhooks]".
+"""
+
+import argparse
+import asyncio
+import json
 import logging
+import os
+from urllib.parse import urlparse
 
 from telegram import Update
 from telegram.ext import (
     Application,
-    CommandHandler,
+    BaseUpdateProcessor,
     MessageHandler,
     ContextTypes,
     filters,
 )
 
-# Токен бота и список получателей заявок
-BOT_TOKEN = "8208417749:AAE4FPGVdAuF2rIkwNUYfisrOA6-p-vMQMk"
-OWNER_IDS = [5651149188, 728379071]
+from bot_intake import intake_handlers
+from bot_queue import QUEUE_DB, DeliveryWorker, SubmissionQueue
+
+CONFIG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bot_config.json")
+DEFAULT_WORKERS = 16
+# Сколько апдейтов может ждать своей очереди (сверх работающих), пока PTB не перестанет их раздавать
+MAX_PENDING_PER_WORKER = 64
 
 logging.basicConfig(
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
@@ -20,27 +45,76 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-START_TEXT = (
-    "Мы открыты к вашим предложениям. Заполните следующую форму:\n\n"
-    "1. ссылка на бота с миниаппом / бота\n"
-    "2. название\n"
-    "3. описание\n"
-    "4. лого\n"
-    "5. скриншоты (по возможности) размером 370x650\n"
-    "6. ссылка типа: https://t.me/юз_миниаппа_без_@/app?startapp\n"
-    "7. ваш юзернейм для связи"
-)
-
-
-async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Обрабатывает /start."""
-    if not update.message:
-        return
-    await update.message.reply_text(START_TEXT)
+def load_config(path: str = CONFIG_FILE) -> dict:
+    """{"token", "owner_ids", "webhook_secret"}: из окружения, недостающее — из bot_config.json."""
+    config = {}
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            config = json.load(f)
+    if os.environ.get("BOT_TOKEN"):
+        config["token"] = os.environ["BOT_TOKEN"]
+    if os.environ.get("BOT_OWNER_IDS"):
+        config["owner_ids"] = [int(i) for i in os.environ["BOT_OWNER_IDS"].replace(" ", "").split(",") if i]
+    if os.environ.get("BOT_WEBHOOK_SECRET"):
+        config["webhook_secret"] = os.environ["BOT_WEBHOOK_SECRET"]
+    missing = [key for key in ("token", "owner_ids") if not config.get(key)]
+    if missing:
+        raise SystemExit(f"Не заданы {', '.join(missing)}: переменные BOT_TOKEN / BOT_OWNER_IDS или {path}")
+    config["owner_ids"] = [int(i) for i in config["owner_ids"]]
+    return config
+
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    """
+    Апдейты разных пользователей — параллельно, но не больше workers одновременно;
+    апдейты одного пользователя (или чата, если пользователя нет) — по очереди, в порядке поступления.
+    Свой семафор берётся уже после замка пользователя: иначе ждущие апдейты одного активного
+    пользователя заняли бы все места и остальные снова шли бы по одному.
+    """
+
+    def __init__(self, workers: int = DEFAULT_WORKERS):
+        super().__init__(max_concurrent_updates=workers * MAX_PENDING_PER_WORKER)
+        self.workers = workers
+        self._running = asyncio.Semaphore(workers)
+        self._locks = {}  # ключ -> [замок, число апдейтов, которые его держат или ждут]
+
+    @staticmethod
+    def _key(update: object):
+        if isinstance(update, Update):
+            if update.effective_user:
+                return "user", update.effective_user.id
+            if update.effective_chat:
+                return "chat", update.effective_chat.id
+        return None
+
+    async def do_process_update(self, update: object, coroutine) -> None:
+        key = self._key(update)
+        if key is None:
+            async with self._running:
+                await coroutine
+            return
+        entry = self._locks.setdefault(key, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0], self._running:
+                await coroutine
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._locks[key]
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
 
 
 async def forward_proposal(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Любое сообщение после /start пересылается тебе в личку."""
+    """
+    Сообщение вне анкеты (bot_intake) ставится в очередь заявок (bot_queue.db), пользователю отвечаем сразу.
+    Разошлёт владельцам фоновый DeliveryWorker; части альбома уходят одной пересылкой.
+    """
     message = update.message
     if message is None:
         return
@@ -50,37 +124,99 @@ async def forward_proposal(update: Update, context: ContextTypes.DEFAULT_TYPE) -
 
     # Текст, который придёт тебе
     header = f"Новая заявка от {user_info}:\n\n"
-    text = message.text or ""
-    caption = message.caption or ""
-
-    if text or caption:
-        for owner_id in OWNER_IDS:
-            await context.bot.send_message(
-                chat_id=owner_id,
-                text=header + (text or caption),
-            )
-
-    # Пересылаем медиа (фото/документы) как есть всем получателям
-    if message.photo or message.document:
-        for owner_id in OWNER_IDS:
-            await message.forward(chat_id=owner_id)
-
-    await message.reply_text(
-        "Спасибо! Ваша заявка отправлена, мы свяжемся с вами при необходимости."
-    )
-
-
-def main() -> None:
-    app = Application.builder().token(BOT_TOKEN).build()
-
-    app.add_handler(CommandHandler("start", start))
-    # Все сообщения, кроме команд, пересылаем как заявки
+    text = message.text or message.caption or ""
+
+    # Медиа (фото/документы) пересылаются как есть всем получателям
+    forward = bool(message.photo or message.document)
+    is_new = True
+    if text or forward:
+        queue: SubmissionQueue = context.bot_data["queue"]
+        is_new = queue.enqueue(
+            chat_id=message.chat_id,
+            message_id=message.message_id,
+            owner_ids=context.bot_data["owner_ids"],
+            text=header + text if text else None,
+            forward=forward,
+            media_group_id=message.media_group_id,
+        )
+
+    # На альбом отвечаем один раз
+    if is_new:
+        await message.reply_text(
+            "Спасибо! Ваша заявка отправлена, мы свяжемся с вами при необходимости."
+        )
+
+
+async def post_init(app: Application) -> None:
+    """Открывает очередь и запускает доставку заявок владельцам."""
+    queue = SubmissionQueue(app.bot_data.get("queue_path", QUEUE_DB))
+    app.bot_data["queue"] = queue
+    app.bot_data["delivery_task"] = asyncio.create_task(DeliveryWorker(app.bot, queue).run())
+
+
+async def post_stop(app: Application) -> None:
+    """Останавливает доставку до остановки бота; недоставленное останется в очереди."""
+    task = app.bot_data.pop("delivery_task", None)
+    if task:
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+    queue = app.bot_data.pop("queue", None)
+    if queue:
+        queue.close()
+
+
+def build_application(token: str, owner_ids, workers: int = DEFAULT_WORKERS, queue_path: str = QUEUE_DB,
+                      request=None) -> Application:
+    """
+    Приложение со всеми обработчиками. workers <= 1 — апдейты по одному, как в PTB по умолчанию.
+    request — свой BaseRequest (например, заглушка Bot API в bot_loadtest.py).
+    """
+    builder = Application.builder().token(token).post_init(post_init).post_stop(post_stop)
+    if workers > 1:
+        builder = builder.concurrent_updates(PerUserUpdateProcessor(workers))
+    if request is not None:
+        builder = builder.request(request).get_updates_request(request)
+    app = builder.build()
+    app.bot_data["owner_ids"] = list(owner_ids)
+    app.bot_data["queue_path"] = queue_path
+
+    # Анкета /start и команды владельцев /pending, /approve, /reject
+    app.add_handlers(intake_handlers(owner_ids))
+    # Остальные сообщения, кроме команд, пересылаем как свободные заявки
     app.add_handler(MessageHandler(filters.ALL & ~filters.COMMAND, forward_proposal))
-
-    print("Bot is running. Press Ctrl+C to stop.")
-    app.run_polling()
+    return app
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Бот приёма заявок.")
+    parser.add_argument("--webhook", metavar="URL",
+                        help="публичный URL вебхука (https://host/path); без него — long polling")
+    parser.add_argument("--listen", default="127.0.0.1", help="адрес локального сервера вебхука")
+    parser.add_argument("--port", type=int, default=8443, help="порт локального сервера вебхука")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help=f"апдейтов одновременно (по умолчанию {DEFAULT_WORKERS}; 1 — по одному)")
+    parser.add_argument("--config", default=CONFIG_FILE, help="файл настроек")
+    args = parser.parse_args(argv)
+
+    config = load_config(args.config)
+    app = build_application(config["token"], config["owner_ids"], workers=args.workers)
+
+    if args.webhook:
+        print(f"Bot is running (webhook {args.webhook} -> {args.listen}:{args.port}). Press Ctrl+C to stop.")
+        app.run_webhook(
+            listen=args.listen,
+            port=args.port,
+            url_path=urlparse(args.webhook).path.lstrip("/"),
+            webhook_url=args.webhook,
+            secret_token=config.get("webhook_secret"),
+        )
+    else:
+        print("Bot is running. Press Ctrl+C to stop.")
+        app.run_polling()
 
 
 if __name__ == "__main__":
     main()
-
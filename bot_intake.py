@@ -0,0 +1,423 @@
+"""
+Анкета заявки в боте и одобрение заявок владельцами.
+
+/start проводит пользователя по 7 полям формы по одному, проверяя ответы: ссылки на бота и миниапп,
+логотип (квадратный, от 128 px) и скриншоты (вертикальные, не меньше 370x650). Картинки сразу
+переводятся в WebP. Готовая заявка сохраняется в pending_channels (telegram_channels.db), файлы —
+в database/logo&screens с именами как у остальных приложений (<бот>_logo.webp, <бот>_scr_N.webp),
+владельцам через очередь bot_queue уходит сводка с пересылкой картинок.
+
+Команды владельцев:
+    /pending — список ждущих заявок;
+    /approve 12 13 | /approve all — добавить заявки в каталог одной транзакцией;
+    /reject 12 — отклонить заявку и удалить её файлы.
+Требуется: pip install Pillow "python-telegram-bot[job-queue]" (JobQueue нужен для conversation_timeout)
+"""
+
+import asyncio
+import io
+import logging
+import os
+import re
+import sys
+from functools import lru_cache
+
+try:
+    from PIL import Image
+except ImportError:
+    print("Установите Pillow: python3 -m pip install Pillow")
+    raise
+
+from telegram import Update
+from telegram.ext import CommandHandler, ContextTypes, ConversationHandler, MessageHandler, filters
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "database"))
+import mainbd  # noqa: E402
+from categorizer import compile_rules  # noqa: E402
+from channel import join_screenshots, split_screenshots  # noqa: E402
+import pending_channels  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+BOT_LINK, TITLE, DESCRIPTION, LOGO, SCREENSHOTS, APP_URL, CONTACT = range(7)
+
+LOGO_MIN_SIZE = 128
+LOGO_MAX_SIZE = 512
+SCREENSHOT_MIN_SIZE = (370, 650)
+SCREENSHOT_MAX_SIZE = (740, 1300)   # больше витрине не нужно (detail — 370x650, x2 для плотных экранов)
+MAX_SCREENSHOTS = 10
+MAX_IMAGE_BYTES = 10 * 1024 * 1024
+WEBP_QUALITY = 85
+CONVERSATION_TIMEOUT = 3600
+
+_USERNAME = r"[A-Za-z][A-Za-z0-9_]{3,31}"
+BOT_LINK_RE = re.compile(rf"^(?:@|(?:https?://)?t\.me/)({_USERNAME})/?$")
+APP_URL_RE = re.compile(rf"^https://t\.me/({_USERNAME})(?:/[A-Za-z0-9_]{{1,64}})?/?\?startapp(?:=[A-Za-z0-9_-]*)?$")
+CONTACT_RE = re.compile(rf"^@({_USERNAME})$")
+
+START_TEXT = (
+    "Мы открыты к вашим предложениям. Ответьте по очереди на вопросы формы:\n\n"
+    "1. ссылка на бота с миниаппом / бота\n"
+    "2. название\n"
+    "3. описание\n"
+    "4. лого\n"
+    "5. скриншоты (по возможности) размером 370x650\n"
+    "6. ссылка типа: https://t.me/юз_миниаппа_без_@/app?startapp\n"
+    "7. ваш юзернейм для связи\n\n"
+    "Отменить заявку — /cancel."
+)
+PROMPTS = {
+    BOT_LINK: "1/7. Ссылка на бота с миниаппом, например https://t.me/notcoin_bot или @notcoin_bot",
+    TITLE: "2/7. Название приложения",
+    DESCRIPTION: "3/7. Описание",
+    LOGO: "4/7. Логотип: квадратная картинка от 128x128 (лучше файлом, без сжатия)",
+    SCREENSHOTS: f"5/7. Скриншоты: вертикальные, от 370x650, до {MAX_SCREENSHOTS} штук. "
+                 "Когда закончите — /done, без скриншотов — /skip",
+    APP_URL: "6/7. Ссылка на миниапп вида https://t.me/юз_миниаппа_без_@/app?startapp",
+    CONTACT: "7/7. Ваш юзернейм для связи, например @username",
+}
+
+
+class ImageRejected(ValueError):
+    """Картинка не подходит; текст ошибки показывается пользователю."""
+
+
+def _open_image(data: bytes) -> Image.Image:
+    if len(data) > MAX_IMAGE_BYTES:
+        raise ImageRejected(f"Файл больше {MAX_IMAGE_BYTES // (1024 * 1024)} МБ.")
+    try:
+        img = Image.open(io.BytesIO(data))
+        img.load()
+    except Exception:
+        raise ImageRejected("Не удалось открыть картинку. Пришлите PNG, JPEG или WebP.")
+    if img.mode not in ("RGB", "RGBA"):
+        img = img.convert("RGBA" if "A" in img.mode or "transparency" in img.info else "RGB")
+    return img
+
+
+def _encode_webp(img: Image.Image) -> bytes:
+    buf = io.BytesIO()
+    img.save(buf, "WEBP", quality=WEBP_QUALITY, method=6)
+    return buf.getvalue()
+
+
+def _fit(img: Image.Image, max_w: int, max_h: int) -> Image.Image:
+    scale = min(max_w / img.width, max_h / img.height)
+    if scale >= 1:
+        return img
+    return img.resize((max(1, round(img.width * scale)), max(1, round(img.height * scale))), Image.Resampling.LANCZOS)
+
+
+def logo_to_webp(data: bytes) -> bytes:
+    """Проверяет логотип и возвращает его в WebP (не больше LOGO_MAX_SIZE по стороне)."""
+    img = _open_image(data)
+    w, h = img.size
+    if not 0.9 <= w / h <= 1.1:
+        raise ImageRejected(f"Логотип должен быть квадратным, а у этого {w}x{h}.")
+    if min(w, h) < LOGO_MIN_SIZE:
+        raise ImageRejected(f"Логотип слишком маленький ({w}x{h}), нужно от {LOGO_MIN_SIZE}x{LOGO_MIN_SIZE}.")
+    return _encode_webp(_fit(img, LOGO_MAX_SIZE, LOGO_MAX_SIZE))
+
+
+def screenshot_to_webp(data: bytes) -> bytes:
+    """Проверяет скриншот и возвращает его в WebP (не больше SCREENSHOT_MAX_SIZE)."""
+    img = _open_image(data)
+    w, h = img.size
+    min_w, min_h = SCREENSHOT_MIN_SIZE
+    if w >= h:
+        raise ImageRejected(f"Скриншот должен быть вертикальным, а у этого {w}x{h}.")
+    if w < min_w or h < min_h:
+        raise ImageRejected(f"Скриншот слишком маленький ({w}x{h}), нужно от {min_w}x{min_h}.")
+    return _encode_webp(_fit(img, *SCREENSHOT_MAX_SIZE))
+
+
+@lru_cache(maxsize=1)
+def _categorizer():
+    return compile_rules()
+
+
+def guess_category(title: str, description: str) -> str:
+    row = {"title": title, "description": description, "category": "Утилиты"}
+    return _categorizer().classify(row) or "Утилиты"
+
+
+async def _download_image(message) -> bytes:
+    """Байты картинки из фото (самый крупный размер) или документа-картинки."""
+    if message.photo:
+        source = message.photo[-1]
+    else:
+        source = message.document
+        if source.file_size and source.file_size > MAX_IMAGE_BYTES:
+            raise ImageRejected(f"Файл больше {MAX_IMAGE_BYTES // (1024 * 1024)} МБ.")
+    tg_file = await source.get_file()
+    return bytes(await tg_file.download_as_bytearray())
+
+
+def _draft(context: ContextTypes.DEFAULT_TYPE) -> dict:
+    return context.user_data.setdefault("draft", {})
+
+
+async def _ask(update: Update, context: ContextTypes.DEFAULT_TYPE, state: int) -> int:
+    _draft(context)["state"] = state
+    await update.message.reply_text(PROMPTS[state])
+    return state
+
+
+async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Обрабатывает /start: начинает анкету заново."""
+    context.user_data["draft"] = {"screenshots": [], "message_ids": []}
+    await update.message.reply_text(START_TEXT)
+    return await _ask(update, context, BOT_LINK)
+
+
+async def bot_link(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    m = BOT_LINK_RE.match(update.message.text.strip())
+    if not m:
+        await update.message.reply_text("Не похоже на ссылку на бота. " + PROMPTS[BOT_LINK])
+        return BOT_LINK
+    idminiapp = m.group(1).lower()
+    if await asyncio.to_thread(mainbd.find_channel_by_bot, idminiapp):
+        await update.message.reply_text("Это приложение уже есть в каталоге. Пришлите ссылку на другого бота или /cancel.")
+        return BOT_LINK
+    _draft(context)["idminiapp"] = idminiapp
+    return await _ask(update, context, TITLE)
+
+
+async def title(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    text = " ".join(update.message.text.split())
+    if not 2 <= len(text) <= 100:
+        await update.message.reply_text("Название — от 2 до 100 символов.")
+        return TITLE
+    _draft(context)["title"] = text
+    return await _ask(update, context, DESCRIPTION)
+
+
+async def description(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    text = update.message.text.strip()
+    if not 10 <= len(text) <= 4000:
+        await update.message.reply_text("Описание — от 10 до 4000 символов.")
+        return DESCRIPTION
+    _draft(context)["description"] = text
+    return await _ask(update, context, LOGO)
+
+
+async def logo(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    message = update.message
+    try:
+        webp = await asyncio.to_thread(logo_to_webp, await _download_image(message))
+    except ImageRejected as e:
+        await message.reply_text(f"{e} {PROMPTS[LOGO]}")
+        return LOGO
+    draft = _draft(context)
+    draft["logo"] = webp
+    draft["message_ids"].append(message.message_id)
+    return await _ask(update, context, SCREENSHOTS)
+
+
+async def screenshot(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    message = update.message
+    draft = _draft(context)
+    if len(draft["screenshots"]) >= MAX_SCREENSHOTS:
+        await message.reply_text(f"Уже {MAX_SCREENSHOTS} скриншотов — это максимум. /done — дальше.")
+        return SCREENSHOTS
+    try:
+        webp = await asyncio.to_thread(screenshot_to_webp, await _download_image(message))
+    except ImageRejected as e:
+        await message.reply_text(str(e))
+        return SCREENSHOTS
+    draft["screenshots"].append(webp)
+    draft["message_ids"].append(message.message_id)
+    # На альбом отвечаем один раз
+    if message.media_group_id is None or message.media_group_id != draft.get("media_group_id"):
+        draft["media_group_id"] = message.media_group_id
+        await message.reply_text("Скриншот принят. Пришлите ещё или /done.")
+    return SCREENSHOTS
+
+
+async def screenshots_done(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    count = len(_draft(context)["screenshots"])
+    if update.message.text.startswith("/done") and not count:
+        await update.message.reply_text("Скриншотов пока нет. Пришлите их или /skip.")
+        return SCREENSHOTS
+    return await _ask(update, context, APP_URL)
+
+
+async def app_url(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    text = update.message.text.strip()
+    if not APP_URL_RE.match(text):
+        await update.message.reply_text("Ссылка не подходит. " + PROMPTS[APP_URL])
+        return APP_URL
+    _draft(context)["url"] = text
+    return await _ask(update, context, CONTACT)
+
+
+def _free_name(name: str, suffix: str) -> str:
+    """Имя файла в logo&screens; занятое чужим файлом дополняется suffix."""
+    if not os.path.exists(mainbd.get_icon_path(name)):
+        return name
+    stem, ext = os.path.splitext(name)
+    return f"{stem}_{suffix}{ext}"
+
+
+def _write_files(files: dict) -> None:
+    for name, data in files.items():
+        path = mainbd.get_icon_path(name)
+        with open(path + ".tmp", "wb") as f:
+            f.write(data)
+        os.replace(path + ".tmp", path)
+
+
+def remove_files(pending: dict) -> None:
+    """Удаляет логотип и скриншоты отклонённой заявки."""
+    for name in filter(None, (pending["icon"],) + split_screenshots(pending["screenshots_path"])):
+        try:
+            os.remove(mainbd.get_icon_path(name))
+        except FileNotFoundError:
+            pass
+
+
+async def contact(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    message = update.message
+    m = CONTACT_RE.match(message.text.strip())
+    if not m:
+        await message.reply_text("Нужен юзернейм вида @username.")
+        return CONTACT
+    draft = context.user_data.pop("draft")
+    user = message.from_user
+    slug = draft["idminiapp"]
+    files = {_free_name(f"{slug}_logo.webp", str(user.id)): draft["logo"]}
+    for i, data in enumerate(draft["screenshots"], 1):
+        files[_free_name(f"{slug}_scr_{i}.webp", str(user.id))] = data
+    names = list(files)
+    row = {
+        "idminiapp": slug,
+        "title": draft["title"],
+        "description": draft["description"],
+        "icon": names[0],
+        "url": draft["url"],
+        "category": guess_category(draft["title"], draft["description"]),
+        "screenshots_path": join_screenshots(names[1:]),
+        "contact": "@" + m.group(1),
+        "submitted_by": f"{user.full_name} (@{user.username}) id={user.id}",
+    }
+    pending_id = await asyncio.to_thread(pending_channels.add_pending_channel, row)
+    if pending_id is None:
+        await message.reply_text("Заявка на это приложение уже на рассмотрении. Спасибо!")
+        return ConversationHandler.END
+    try:
+        await asyncio.to_thread(_write_files, files)
+    except OSError:
+        logger.exception("Не удалось сохранить картинки заявки %s", pending_id)
+        await asyncio.to_thread(pending_channels.reject_pending_channel, pending_id)
+        await asyncio.to_thread(remove_files, row)
+        await message.reply_text("Не удалось сохранить заявку, попробуйте позже: /start")
+        return ConversationHandler.END
+
+    summary = (
+        f"Новая заявка #{pending_id} от {row['submitted_by']}, связь: {row['contact']}\n\n"
+        f"{row['title']} ({row['idminiapp']}), категория: {row['category']}\n"
+        f"{row['url']}\n\n{row['description']}\n\n"
+        f"Скриншотов: {len(names) - 1}. Добавить: /approve {pending_id}, отклонить: /reject {pending_id}"
+    )
+    context.bot_data["queue"].enqueue(
+        chat_id=message.chat_id,
+        message_id=draft["message_ids"],
+        owner_ids=context.bot_data["owner_ids"],
+        text=summary,
+        forward=True,
+    )
+    await message.reply_text("Спасибо! Ваша заявка отправлена, мы свяжемся с вами при необходимости.")
+    return ConversationHandler.END
+
+
+async def reprompt(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Ответ не того типа (например, текст вместо картинки): повторяем вопрос, состояние не меняется."""
+    state = _draft(context).get("state", BOT_LINK)
+    await update.message.reply_text("Ожидался другой ответ. " + PROMPTS[state])
+
+
+async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    context.user_data.pop("draft", None)
+    await update.message.reply_text("Заявка отменена. Начать заново — /start")
+    return ConversationHandler.END
+
+
+async def pending(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    rows = await asyncio.to_thread(pending_channels.get_pending_channels)
+    if not rows:
+        await update.message.reply_text("Заявок нет.")
+        return
+    lines = [f"#{r['id']} {r['title']} ({r['idminiapp']}), {r['category']}, {r['contact']}" for r in rows]
+    await update.message.reply_text("\n".join(lines[:100]) + "\n\n/approve all — добавить все")
+
+
+async def approve(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    args = context.args or []
+    if args == ["all"]:
+        ids = None
+    else:
+        try:
+            ids = [int(a.lstrip("#")) for a in args]
+        except ValueError:
+            ids = []
+        if not ids:
+            await update.message.reply_text("Использование: /approve 12 13 или /approve all")
+            return
+    report = await asyncio.to_thread(pending_channels.approve_pending_channels, ids)
+    added = [f"#{pid} {idminiapp}" for pid, idminiapp, ok in report if ok]
+    skipped = [f"#{pid} {idminiapp}" for pid, idminiapp, ok in report if not ok]
+    text = f"Добавлено в каталог: {len(added)}"
+    if added:
+        text += "\n" + ", ".join(added)
+    if skipped:
+        text += "\nУже есть в каталоге, оставлены в заявках: " + ", ".join(skipped)
+    if not report:
+        text = "Таких заявок нет."
+    await update.message.reply_text(text)
+
+
+async def reject(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    try:
+        pending_id = int((context.args or [""])[0].lstrip("#"))
+    except ValueError:
+        await update.message.reply_text("Использование: /reject 12")
+        return
+    row = await asyncio.to_thread(pending_channels.reject_pending_channel, pending_id)
+    if row is None:
+        await update.message.reply_text("Такой заявки нет.")
+        return
+    await asyncio.to_thread(remove_files, row)
+    await update.message.reply_text(f"Заявка #{pending_id} ({row['idminiapp']}) отклонена.")
+
+
+def intake_handlers(owner_ids) -> list:
+    """Обработчики анкеты и команд владельцев; регистрировать раньше обработчика свободных сообщений."""
+    text = filters.TEXT & ~filters.COMMAND
+    image = filters.PHOTO | filters.Document.IMAGE
+    owners = filters.User(user_id=owner_ids)
+    conversation = ConversationHandler(
+        entry_points=[CommandHandler("start", start)],
+        states={
+            BOT_LINK: [MessageHandler(text, bot_link)],
+            TITLE: [MessageHandler(text, title)],
+            DESCRIPTION: [MessageHandler(text, description)],
+            LOGO: [MessageHandler(image, logo)],
+            SCREENSHOTS: [MessageHandler(image, screenshot),
+                          CommandHandler(["done", "skip"], screenshots_done)],
+            APP_URL: [MessageHandler(text, app_url)],
+            CONTACT: [MessageHandler(text, contact)],
+        },
+        fallbacks=[
+            CommandHandler("cancel", cancel),
+            CommandHandler("start", start),
+            # Иначе сообщение не по шагу ушло бы владельцам как свободная заявка
+            MessageHandler(filters.ALL & ~filters.COMMAND, reprompt),
+        ],
+        conversation_timeout=CONVERSATION_TIMEOUT,
+    )
+    return [
+        conversation,
+        CommandHandler("pending", pending, filters=owners),
+        CommandHandler("approve", approve, filters=owners),
+        CommandHandler("reject", reject, filters=owners),
+    ]
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Нагрузочный прогон bot.py без Telegram: синтетические апдейты от многих пользователей
+прогоняются через настоящие обработчики, а Bot API заменён заглушкой MockBotAPI с задержкой
+на каждый запрос (как сетевой round-trip). Для каждого значения --workers печатается время
+и пропускная способность, а также проверяется, что апдейты каждого пользователя обработаны по порядку.
+Отдельно прогоняется доставка владельцам (DeliveryWorker) через заглушку, у которой часть запросов
+падает с сетевой ошибкой: заявки должны дойти до каждого владельца в порядке поступления, несмотря на повторы.
+Очередь заявок пишется во временный файл, bot_queue.db не трогается.
+
+Запуск: python3 bot_loadtest.py [--users 200] [--messages 5] [--latency 0.05] [--workers 1 4 16 64] [--failure-rate 0.2]
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import os
+import random
+import tempfile
+import time
+
+from telegram import Update
+from telegram.request import BaseRequest
+
+from bot import build_application, post_init, post_stop
+from bot_queue import DeliveryWorker, RateLimiter, SubmissionQueue
+
+OWNER_IDS = [1, 2]
+FIRST_USER_ID = 1000
+
+
+class MockBotAPI(BaseRequest):
+    """Отвечает на методы Bot API правдоподобным JSON после задержки latency секунд."""
+
+    def __init__(self, latency: float = 0.05):
+        self.latency = latency
+        self.calls = {}
+        self.replies = 0
+        self.reply_times = {}
+        self.replies_done = asyncio.Event()
+        self.expected_replies = None
+        self._message_ids = itertools.count(10 ** 6)
+
+    @property
+    def read_timeout(self):
+        return None
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    def _message(self, chat_id) -> dict:
+        return {"message_id": next(self._message_ids), "date": int(time.time()),
+                "chat": {"id": int(chat_id), "type": "private"}}
+
+    async def do_request(self, url, method, request_data=None, **kwargs):
+        api_method = url.rsplit("/", 1)[-1]
+        params = request_data.parameters if request_data else {}
+        self.calls[api_method] = self.calls.get(api_method, 0) + 1
+        await asyncio.sleep(self.latency)
+        if api_method == "getMe":
+            result = {"id": 42, "is_bot": True, "first_name": "Mock", "username": "mock_bot"}
+        elif api_method in ("sendMessage", "forwardMessage"):
+            result = self._message(params["chat_id"])
+            if int(params["chat_id"]) >= FIRST_USER_ID:
+                self.reply_times.setdefault(int(params["chat_id"]), []).append(time.time())
+                self.replies += 1
+                if self.replies == self.expected_replies:
+                    self.replies_done.set()
+        elif api_method == "forwardMessages":
+            result = [{"message_id": next(self._message_ids)} for _ in json.loads(params["message_ids"])]
+        else:
+            result = True
+        return 200, json.dumps({"ok": True, "result": result}).encode()
+
+
+class FlakyBot:
+    """Заглушка бота для DeliveryWorker: запрос с вероятностью failure_rate падает с сетевой ошибкой."""
+
+    def __init__(self, failure_rate: float, seed: int = 0):
+        self.failure_rate = failure_rate
+        self.random = random.Random(seed)
+        self.failures = 0
+        self.delivered = {}
+
+    async def send_message(self, chat_id, text):
+        if self.random.random() < self.failure_rate:
+            self.failures += 1
+            raise ConnectionError("injected failure")
+        self.delivered.setdefault(chat_id, []).append(int(text))
+
+
+def synthetic_updates(users: int, messages: int) -> list:
+    """Апдейты вперемешку: i-е сообщение каждого пользователя, затем (i+1)-е и т.д."""
+    updates = []
+    update_id = itertools.count(1)
+    for i in range(messages):
+        for u in range(users):
+            user_id = FIRST_USER_ID + u
+            updates.append({
+                "update_id": next(update_id),
+                "message": {
+                    "message_id": i + 1,
+                    "date": int(time.time()),
+                    "chat": {"id": user_id, "type": "private"},
+                    "from": {"id": user_id, "is_bot": False, "first_name": f"User{u}", "username": f"user{u}"},
+                    "text": f"Заявка {i + 1} от пользователя {u}: https://t.me/app{u}_bot",
+                },
+            })
+    return updates
+
+
+def check_order(queue_path: str, reply_times: dict) -> int:
+    """
+    Число пользователей, чьё следующее сообщение начало обрабатываться раньше, чем бот ответил
+    на предыдущее (заявка ставится в очередь в начале обработки, ответ — в конце).
+    """
+    queue = SubmissionQueue(queue_path)
+    created = {}
+    for chat_id, created_at in queue.conn.execute("SELECT chat_id, created_at FROM submissions ORDER BY id"):
+        created.setdefault(chat_id, []).append(created_at)
+    queue.close()
+    broken = 0
+    for chat_id, times in created.items():
+        replies = sorted(reply_times.get(chat_id, []))
+        if any(later < reply for later, reply in zip(times[1:], replies)):
+            broken += 1
+    return broken
+
+
+async def run(workers: int, users: int, messages: int, latency: float) -> dict:
+    api = MockBotAPI(latency)
+    with tempfile.TemporaryDirectory() as tmp:
+        queue_path = os.path.join(tmp, "queue.db")
+        app = build_application("42:MOCK", OWNER_IDS, workers=workers, queue_path=queue_path, request=api)
+        raw = synthetic_updates(users, messages)
+        api.expected_replies = len(raw)
+        await app.initialize()
+        await post_init(app)
+        await app.start()
+        started = time.perf_counter()
+        for data in raw:
+            await app.update_queue.put(Update.de_json(data, app.bot))
+        await api.replies_done.wait()
+        elapsed = time.perf_counter() - started
+        await app.stop()
+        await post_stop(app)
+        await app.shutdown()
+        broken = check_order(queue_path, api.reply_times)
+    return {"workers": workers, "updates": len(raw), "seconds": elapsed, "out_of_order": broken}
+
+
+async def run_delivery(users: int, messages: int, failure_rate: float) -> dict:
+    """
+    Доставка users * messages заявок владельцам OWNER_IDS при failure_rate упавших запросов.
+    Время очереди сдвигается на секунду за проход, поэтому повтор упавшей заявки наступает через несколько
+    проходов, а более поздние заявки того же владельца за это время уже готовы — их нельзя отдать раньше.
+    """
+    logging.getLogger("bot_queue").setLevel(logging.ERROR)  # предупреждения о каждом повторе не нужны
+    bot = FlakyBot(failure_rate)
+    with tempfile.TemporaryDirectory() as tmp:
+        queue = SubmissionQueue(os.path.join(tmp, "queue.db"))
+        clock = time.time()
+        for n in range(users * messages):
+            queue.enqueue(FIRST_USER_ID + n % users, n + 1, OWNER_IDS, text=str(n), now=clock)
+        worker = DeliveryWorker(bot, queue, RateLimiter(per_chat_interval=0, global_rate=1e9))
+        passes = 0
+        started = time.perf_counter()
+        while queue.pending_count():
+            await worker.drain_once(clock)
+            clock += 1.0
+            passes += 1
+        elapsed = time.perf_counter() - started
+        failed = queue.conn.execute("SELECT COUNT(*) FROM deliveries WHERE failed = 1").fetchone()[0]
+        queue.close()
+    out_of_order = sum(1 for texts in bot.delivered.values() if texts != sorted(texts))
+    return {"deliveries": sum(map(len, bot.delivered.values())), "failures": bot.failures, "failed": failed,
+            "passes": passes, "seconds": elapsed, "out_of_order": out_of_order}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Нагрузочный прогон обработчиков бота на заглушке Bot API.")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--messages", type=int, default=5, help="сообщений от каждого пользователя")
+    parser.add_argument("--latency", type=float, default=0.05, help="задержка заглушки на запрос, сек")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--failure-rate", type=float, default=0.2,
+                        help="доля запросов доставки, падающих с ошибкой (0 — без прогона доставки)")
+    args = parser.parse_args(argv)
+
+    baseline = None
+    for workers in args.workers:
+        r = asyncio.run(run(workers, args.users, args.messages, args.latency))
+        rate = r["updates"] / r["seconds"]
+        baseline = baseline or rate
+        print(f"workers={workers:>3}: {r['updates']} апдейтов за {r['seconds']:.2f} с, "
+              f"{rate:.0f}/с (x{rate / baseline:.1f}), не по порядку: {r['out_of_order']}")
+    if args.failure_rate > 0:
+        r = asyncio.run(run_delivery(args.users, args.messages, args.failure_rate))
+        print(f"доставка с ошибками {args.failure_rate:.0%}: {r['deliveries']} доставок за {r['passes']} проходов "
+              f"({r['seconds']:.2f} с), ошибок {r['failures']}, не доставлено {r['failed']}, "
+              f"владельцев с нарушенным порядком: {r['out_of_order']} из {len(OWNER_IDS)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+"""
+Очередь заявок для bot.py.
+
+Заявка сразу записывается в SQLite (bot_queue.db рядом с ботом), и пользователь получает ответ,
+не дожидаясь рассылки. Доставку владельцам делает фоновый DeliveryWorker:
+- всем владельцам параллельно, каждому — по порядку поступления заявок;
+- с ограничением частоты на чат и на бота (RateLimiter);
+- при RetryAfter от Telegram чат ставится на паузу на указанное время, при сетевых ошибках —
+  повтор с экспоненциальной задержкой; прогресс хранится в БД, поэтому после перезапуска
+  доставка продолжается с того же шага.
+Части одного альбома (media_group_id) собираются в одну заявку и пересылаются одним forward_messages.
+
+Воркеру нужен только объект с методами send_message / forward_message / forward_messages,
+как у telegram.Bot, — для проверки подойдёт заглушка.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import time
+from datetime import timedelta
+from typing import Iterable, Optional, Sequence, Union
+
+try:
+    from telegram.error import BadRequest, Forbidden
+    PERMANENT_ERRORS = (BadRequest, Forbidden)
+except ImportError:
+    PERMANENT_ERRORS = ()
+
+logger = logging.getLogger(__name__)
+
+QUEUE_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bot_queue.db")
+ALBUM_WINDOW = 2.0          # сек: столько ждём остальные части альбома после последней пришедшей
+PER_CHAT_INTERVAL = 1.0     # сек между сообщениями в один чат
+GLOBAL_RATE = 25.0          # сообщений в секунду на бота (лимит Telegram — около 30)
+MAX_ATTEMPTS = 8
+MAX_BACKOFF = 300.0
+POLL_INTERVAL = 0.5
+KEEP_DONE_DAYS = 7
+
+# Шаги доставки одной заявки одному владельцу
+STEP_NEW, STEP_TEXT_SENT, STEP_DONE = 0, 1, 2
+
+
+class SubmissionQueue:
+    """Заявки и их доставка владельцам в SQLite."""
+
+    def __init__(self, path: str = QUEUE_DB):
+        self.conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA busy_timeout=5000")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS submissions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                chat_id INTEGER NOT NULL,
+                message_ids TEXT NOT NULL,
+                text TEXT,
+                forward INTEGER NOT NULL DEFAULT 0,
+                media_group_id TEXT,
+                ready_at REAL NOT NULL,
+                created_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_submissions_group ON submissions(chat_id, media_group_id);
+            CREATE TABLE IF NOT EXISTS deliveries (
+                submission_id INTEGER NOT NULL REFERENCES submissions(id) ON DELETE CASCADE,
+                owner_id INTEGER NOT NULL,
+                step INTEGER NOT NULL DEFAULT 0,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL DEFAULT 0,
+                failed INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                PRIMARY KEY (submission_id, owner_id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS idx_deliveries_pending ON deliveries(next_attempt_at) WHERE step < 2 AND failed = 0;
+            CREATE INDEX IF NOT EXISTS idx_deliveries_owner ON deliveries(owner_id, submission_id) WHERE step < 2 AND failed = 0;
+        """)
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def enqueue(self, chat_id: int, message_id: Union[int, Sequence[int]], owner_ids: Iterable[int],
+                text: Optional[str] = None, forward: bool = False, media_group_id: Optional[str] = None,
+                now: Optional[float] = None) -> bool:
+        """
+        Ставит сообщение в очередь. Часть альбома присоединяется к заявке того же альбома,
+        пока её доставка не началась. message_id — id сообщения или список id (пересылаются вместе).
+        Возвращает True для новой заявки (пользователю стоит ответить)
+        и False для следующих частей альбома.
+        """
+        now = time.time() if now is None else now
+        ids = [message_id] if isinstance(message_id, int) else list(message_id)
+        ready_at = now + (ALBUM_WINDOW if media_group_id else 0)
+        conn = self.conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            seen_group = False
+            if media_group_id:
+                rows = conn.execute("""
+                    SELECT s.id, s.message_ids, s.text,
+                           NOT EXISTS (SELECT 1 FROM deliveries d WHERE d.submission_id = s.id AND d.step > 0)
+                    FROM submissions s WHERE s.chat_id = ? AND s.media_group_id = ?
+                    ORDER BY s.id DESC
+                """, (chat_id, media_group_id)).fetchall()
+                seen_group = bool(rows)
+                if rows and rows[0][3]:
+                    sub_id, old_ids, old_text, _ = rows[0]
+                    conn.execute(
+                        "UPDATE submissions SET message_ids = ?, text = ?, forward = forward OR ?, ready_at = ? WHERE id = ?",
+                        (json.dumps(sorted(set(json.loads(old_ids)) | set(ids))), old_text or text, int(forward),
+                         ready_at, sub_id),
+                    )
+                    conn.execute("COMMIT")
+                    return False
+            cur = conn.execute("""
+                INSERT INTO submissions (chat_id, message_ids, text, forward, media_group_id, ready_at, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, (chat_id, json.dumps(ids), text, int(forward), media_group_id, ready_at, now))
+            conn.executemany(
+                "INSERT INTO deliveries (submission_id, owner_id) VALUES (?, ?)",
+                [(cur.lastrowid, owner_id) for owner_id in dict.fromkeys(owner_ids)],
+            )
+            conn.execute("COMMIT")
+            return not seen_group
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def due(self, now: Optional[float] = None, limit: int = 200) -> list:
+        """
+        Доставки, которые пора выполнять, в порядке поступления заявок. Заявка владельцу не выдаётся,
+        пока его более ранняя заявка ждёт повтора или остальных частей альбома, — иначе она обогнала бы ту.
+        """
+        now = time.time() if now is None else now
+        rows = self.conn.execute("""
+            SELECT d.submission_id, d.owner_id, d.step, d.attempts, s.chat_id, s.message_ids, s.text, s.forward
+            FROM deliveries d JOIN submissions s ON s.id = d.submission_id
+            WHERE d.step < 2 AND d.failed = 0 AND d.next_attempt_at <= ? AND s.ready_at <= ?
+              AND NOT EXISTS (
+                  SELECT 1 FROM deliveries e JOIN submissions t ON t.id = e.submission_id
+                  WHERE e.owner_id = d.owner_id AND e.submission_id < d.submission_id
+                    AND e.step < 2 AND e.failed = 0 AND (e.next_attempt_at > ? OR t.ready_at > ?)
+              )
+            ORDER BY d.submission_id
+            LIMIT ?
+        """, (now, now, now, now, limit)).fetchall()
+        keys = ("submission_id", "owner_id", "step", "attempts", "chat_id", "message_ids", "text", "forward")
+        items = [dict(zip(keys, row)) for row in rows]
+        for item in items:
+            item["message_ids"] = json.loads(item["message_ids"])
+        return items
+
+    def set_step(self, submission_id: int, owner_id: int, step: int) -> None:
+        self.conn.execute(
+            "UPDATE deliveries SET step = ?, last_error = NULL WHERE submission_id = ? AND owner_id = ?",
+            (step, submission_id, owner_id),
+        )
+
+    def retry_later(self, submission_id: int, owner_id: int, at: float, error: str, count_attempt: bool = True) -> None:
+        self.conn.execute("""
+            UPDATE deliveries SET next_attempt_at = ?, attempts = attempts + ?, last_error = ?
+            WHERE submission_id = ? AND owner_id = ?
+        """, (at, int(count_attempt), error, submission_id, owner_id))
+
+    def fail(self, submission_id: int, owner_id: int, error: str) -> None:
+        self.conn.execute(
+            "UPDATE deliveries SET failed = 1, last_error = ? WHERE submission_id = ? AND owner_id = ?",
+            (error, submission_id, owner_id),
+        )
+
+    def pending_count(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM deliveries WHERE step < 2 AND failed = 0").fetchone()[0]
+
+    def purge(self, older_than_days: float = KEEP_DONE_DAYS, now: Optional[float] = None) -> int:
+        """Удаляет давние заявки, доставленные всем владельцам."""
+        now = time.time() if now is None else now
+        conn = self.conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            old = "SELECT id FROM submissions WHERE created_at < ? AND NOT EXISTS " \
+                  "(SELECT 1 FROM deliveries d WHERE d.submission_id = submissions.id AND d.step < 2 AND d.failed = 0)"
+            cutoff = now - older_than_days * 86400
+            conn.execute(f"DELETE FROM deliveries WHERE submission_id IN ({old})", (cutoff,))
+            count = conn.execute(f"DELETE FROM submissions WHERE id IN ({old})", (cutoff,)).rowcount
+            conn.execute("COMMIT")
+            return count
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+
+class RateLimiter:
+    """
+    Не чаще одного сообщения в per_chat_interval секунд в каждый чат и не больше global_rate
+    сообщений в секунду всего. Время отправки резервируется под замком, ждём — без него,
+    поэтому разные чаты не мешают друг другу.
+    """
+
+    def __init__(self, per_chat_interval: float = PER_CHAT_INTERVAL, global_rate: float = GLOBAL_RATE):
+        self.per_chat_interval = per_chat_interval
+        self.global_interval = 1.0 / global_rate
+        self._chat_next = {}
+        self._global_next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, chat_id: int) -> None:
+        async with self._lock:
+            now = time.monotonic()
+            start = max(now, self._chat_next.get(chat_id, 0.0), self._global_next)
+            self._chat_next[chat_id] = start + self.per_chat_interval
+            self._global_next = start + self.global_interval
+        if start > now:
+            await asyncio.sleep(start - now)
+
+    def pause(self, chat_id: int, seconds: float) -> None:
+        """Пауза для чата (после RetryAfter)."""
+        until = time.monotonic() + seconds
+        self._chat_next[chat_id] = max(self._chat_next.get(chat_id, 0.0), until)
+
+
+def _retry_after_seconds(error: Exception) -> Optional[float]:
+    value = getattr(error, "retry_after", None)
+    if value is None:
+        return None
+    return value.total_seconds() if isinstance(value, timedelta) else float(value)
+
+
+class DeliveryWorker:
+    """Фоновая доставка заявок из SubmissionQueue владельцам."""
+
+    def __init__(self, bot, queue: SubmissionQueue, limiter: Optional[RateLimiter] = None,
+                 poll_interval: float = POLL_INTERVAL):
+        self.bot = bot
+        self.queue = queue
+        self.limiter = limiter or RateLimiter()
+        self.poll_interval = poll_interval
+
+    async def run(self) -> None:
+        """Работает до отмены задачи."""
+        self.queue.purge()
+        while True:
+            try:
+                delivered = await self.drain_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Ошибка в очереди заявок")
+                delivered = 0
+            if not delivered:
+                await asyncio.sleep(self.poll_interval)
+
+    async def drain_once(self, now: Optional[float] = None) -> int:
+        """Один проход по готовым доставкам: владельцы параллельно. Возвращает число завершённых доставок."""
+        by_owner = {}
+        for item in self.queue.due(now):
+            by_owner.setdefault(item["owner_id"], []).append(item)
+        if not by_owner:
+            return 0
+        results = await asyncio.gather(*(self._deliver_owner(items) for items in by_owner.values()))
+        return sum(results)
+
+    async def _deliver_owner(self, items: list) -> int:
+        done = 0
+        for item in items:
+            if not await self._deliver(item):
+                break  # остальные заявки этому владельцу due() выдаст только после этой, чтобы не нарушить порядок
+            done += 1
+        return done
+
+    async def _deliver(self, item: dict) -> bool:
+        owner_id, submission_id = item["owner_id"], item["submission_id"]
+        step = item["step"]
+        try:
+            if step == STEP_NEW:
+                if item["text"]:
+                    await self.limiter.acquire(owner_id)
+                    await self.bot.send_message(chat_id=owner_id, text=item["text"])
+                step = STEP_TEXT_SENT
+                self.queue.set_step(submission_id, owner_id, step)
+            if item["forward"]:
+                ids = item["message_ids"]
+                await self.limiter.acquire(owner_id)
+                if len(ids) == 1:
+                    await self.bot.forward_message(chat_id=owner_id, from_chat_id=item["chat_id"], message_id=ids[0])
+                else:
+                    await self.bot.forward_messages(chat_id=owner_id, from_chat_id=item["chat_id"], message_ids=ids)
+            self.queue.set_step(submission_id, owner_id, STEP_DONE)
+            return True
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self._handle_error(item, e)
+            return False
+
+    def _handle_error(self, item: dict, error: Exception) -> None:
+        owner_id, submission_id = item["owner_id"], item["submission_id"]
+        now = time.time()
+        retry_after = _retry_after_seconds(error)
+        if retry_after is not None:
+            self.limiter.pause(owner_id, retry_after)
+            self.queue.retry_later(submission_id, owner_id, now + retry_after, repr(error), count_attempt=False)
+            logger.warning("Флуд-лимит для %s: пауза %.0f с", owner_id, retry_after)
+            return
+        attempts = item["attempts"] + 1
+        if isinstance(error, PERMANENT_ERRORS) or attempts >= MAX_ATTEMPTS:
+            self.queue.fail(submission_id, owner_id, repr(error))
+            logger.error("Заявка %s не доставлена %s: %r", submission_id, owner_id, error)
+            return
+        delay = min(MAX_BACKOFF, 2.0 ** attempts)
+        self.queue.retry_later(submission_id, owner_id, now + delay, repr(error))
+        logger.warning("Заявка %s для %s: %r, повтор через %.0f с", submission_id, owner_id, error, delay)
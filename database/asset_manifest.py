@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Манифест файлов logo&screens и asset_variants: хэш содержимого и размер каждого файла,
+проверка ссылок каталога и план загрузки только изменившихся файлов.
+
+- asset_manifest.json — все файлы: путь, хэш (BLAKE2b-128, как в image_cache), размер, используется ли каталогом;
+- отчёт: файлы, на которые никто не ссылается (сироты), и ссылки icon/screenshots_path на несуществующие файлы;
+- asset_upload_plan.json — что загрузить и что удалить по сравнению с uploaded_assets.json
+  (его ведёт scripts/upload-assets-to-blob.mjs после каждой загрузки).
+Хэши берутся из image_cache.db, если у файла не изменились размер и mtime; остальные файлы
+хэшируются параллельно через mmap.
+
+Запуск: cd database && python3 asset_manifest.py [--list] [--workers N]
+Затем: node --env-file=.env.local scripts/upload-assets-to-blob.mjs
+"""
+
+import argparse
+import json
+import os
+import time
+
+import query_profile
+from asset_variants import get_asset_variants
+from image_cache import file_hashes
+from mainbd import ICONS_FOLDER, get_icon_path, iter_channel_records
+
+BASE_DIR = os.path.dirname(os.path.abspath(ICONS_FOLDER))
+VARIANTS_DIR = os.path.join(BASE_DIR, "asset_variants")
+MANIFEST_FILE = os.path.join(BASE_DIR, "asset_manifest.json")
+UPLOADED_FILE = os.path.join(BASE_DIR, "uploaded_assets.json")
+PLAN_FILE = os.path.join(BASE_DIR, "asset_upload_plan.json")
+MANIFEST_FORMAT = 1
+# Имя в хранилище: оригиналы — как есть (ASSETS_BASE + имя), копии — в подпапке
+VARIANTS_PREFIX = "variants/"
+ASSET_EXTENSIONS = (".webp", ".png", ".jpg", ".jpeg")
+
+
+def _list_files(folder: str) -> list:
+    if not os.path.isdir(folder):
+        return []
+    return sorted(n for n in os.listdir(folder) if n.lower().endswith(ASSET_EXTENSIONS))
+
+
+def catalogue_references() -> dict:
+    """{имя файла: множество idminiapp}, для icon и screenshots_path (внешние URL не считаются)."""
+    refs = {}
+    for ch in iter_channel_records(columns="idminiapp, icon, screenshots_path"):
+        names = list(ch.screenshots)
+        if ch.icon and not ch.icon.startswith(("http://", "https://")):
+            names.append(ch.icon)
+        for name in names:
+            refs.setdefault(name, set()).add(ch.idminiapp)
+    return refs
+
+
+def build_manifest(workers: int = None) -> tuple:
+    """Возвращает (манифест, висячие ссылки {имя: idminiapp})."""
+    refs = catalogue_references()
+    originals = _list_files(ICONS_FOLDER)
+    variant_files = _list_files(VARIANTS_DIR)
+
+    files = {}
+    rel_icons = os.path.relpath(ICONS_FOLDER, BASE_DIR)
+    for name, (h, size) in file_hashes(originals, ICONS_FOLDER, workers=workers).items():
+        files[f"{rel_icons}/{name}"] = {
+            "pathname": name, "hash": h, "size": size, "referenced": name in refs,
+        }
+
+    # Копия нужна, если нужен её оригинал
+    wanted_variants = {
+        v[0] for variants in get_asset_variants(n for n in refs if os.path.exists(get_icon_path(n))).values()
+        for variant, v in variants.items() if variant != "original"
+    }
+    rel_variants = os.path.relpath(VARIANTS_DIR, BASE_DIR)
+    for name, (h, size) in file_hashes(variant_files, VARIANTS_DIR, workers=workers).items():
+        files[f"{rel_variants}/{name}"] = {
+            "pathname": VARIANTS_PREFIX + name, "hash": h, "size": size, "referenced": name in wanted_variants,
+        }
+
+    dangling = {name: sorted(ids) for name, ids in refs.items() if not os.path.exists(get_icon_path(name))}
+    manifest = {
+        "format": MANIFEST_FORMAT,
+        "generated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "files": files,
+    }
+    return manifest, dangling
+
+
+def upload_plan(manifest: dict, uploaded: dict) -> dict:
+    """
+    Разница с уже загруженным (uploaded: {pathname: {"hash", "url"}}):
+    upload — используемые файлы, которых нет в хранилище или у которых изменился хэш;
+    delete — загруженные ранее файлы, которые каталогу больше не нужны.
+    """
+    wanted = {}
+    for path, entry in manifest["files"].items():
+        if entry["referenced"]:
+            wanted[entry["pathname"]] = {"path": path, "hash": entry["hash"], "size": entry["size"]}
+    upload = [
+        {"pathname": pathname, **entry}
+        for pathname, entry in sorted(wanted.items())
+        if uploaded.get(pathname, {}).get("hash") != entry["hash"]
+    ]
+    delete = [
+        {"pathname": pathname, "url": state.get("url")}
+        for pathname, state in sorted(uploaded.items()) if pathname not in wanted
+    ]
+    return {"generated_at": manifest["generated_at"], "upload": upload, "delete": delete}
+
+
+def _write_json(path: str, data) -> None:
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Манифест файлов изображений и план загрузки.")
+    parser.add_argument("--list", action="store_true", help="вывести сирот и висячие ссылки поимённо")
+    parser.add_argument("--workers", type=int, default=None, help="потоков для хэширования")
+    parser.add_argument("--profile", action="store_true", help="сводка по SQL-запросам при выходе (query_profile)")
+    args = parser.parse_args(argv)
+    if args.profile:
+        query_profile.enable()
+
+    if not os.path.isdir(ICONS_FOLDER):
+        print("Папка с иконками/скринами не найдена:", ICONS_FOLDER)
+        return
+
+    manifest, dangling = build_manifest(workers=args.workers)
+    _write_json(MANIFEST_FILE, manifest)
+
+    files = manifest["files"]
+    orphans = [path for path, e in files.items() if not e["referenced"]]
+    total = sum(e["size"] for e in files.values())
+    print(f"Файлов: {len(files)}, {total // (1024 * 1024)} МБ -> {os.path.basename(MANIFEST_FILE)}")
+    print(f"Без ссылок из каталога: {len(orphans)} ({sum(files[p]['size'] for p in orphans) // 1024} КБ)")
+    print(f"Ссылок на отсутствующие файлы: {len(dangling)}")
+    if args.list:
+        for path in orphans:
+            print(f"  сирота: {path}")
+        for name, ids in sorted(dangling.items()):
+            print(f"  нет файла: {name} (idminiapp: {', '.join(ids)})")
+
+    uploaded = {}
+    if os.path.exists(UPLOADED_FILE):
+        with open(UPLOADED_FILE, encoding="utf-8") as f:
+            uploaded = json.load(f)
+    plan = upload_plan(manifest, uploaded)
+    _write_json(PLAN_FILE, plan)
+    size = sum(item["size"] for item in plan["upload"])
+    print(f"К загрузке: {len(plan['upload'])} ({size // 1024} КБ), к удалению: {len(plan['delete'])} "
+          f"-> {os.path.basename(PLAN_FILE)}")
+
+
+if __name__ == "__main__":
+    main()
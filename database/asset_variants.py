@@ -0,0 +1,45 @@
+"""
+Уменьшенные копии иконок и скриншотов: таблица asset_variants в telegram_channels.db.
+
+Пишет её optimize_assets.py (файлы копий — в папке asset_variants/), читают export_snapshot.py
+и asset_manifest.py. Вариант "original" — сам файл из logo&screens.
+
+Использование:
+    variants = get_asset_variants(["notcoin.webp"])   # {"notcoin.webp": {"icon64": (файл, 64, 64, 1834), ...}}
+"""
+
+import dbpool
+from mainbd import DB_NAME
+
+
+def _ensure_schema(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS asset_variants (
+            name TEXT NOT NULL,
+            variant TEXT NOT NULL,
+            file TEXT NOT NULL,
+            width INTEGER,
+            height INTEGER,
+            bytes INTEGER,
+            source_hash TEXT,
+            PRIMARY KEY (name, variant)
+        ) WITHOUT ROWID
+    """)
+
+
+dbpool.register_schema(_ensure_schema)
+
+
+def get_asset_variants(names) -> dict:
+    """{имя файла: {вариант: (файл, ширина, высота, байты)}} для файлов из logo&screens."""
+    names = list(dict.fromkeys(names))
+    result = {}
+    with dbpool.connection(DB_NAME) as conn:
+        for i in range(0, len(names), 500):  # лимит параметров SQLite
+            chunk = names[i:i + 500]
+            for name, variant, file, width, height, size in conn.execute(
+                f"SELECT name, variant, file, width, height, bytes FROM asset_variants "
+                f"WHERE name IN ({', '.join('?' * len(chunk))})", chunk
+            ):
+                result.setdefault(name, {})[variant] = (file, width, height, size)
+    return result
@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+"""
+Подсказки поиска по названиям приложений: префиксное дерево (trie) в компактных массивах.
+
+Названия приводятся к одному виду (canonical): нижний регистр, кириллица — транслитом в латиницу,
+без диакритики и знаков, поэтому «Коин», «coin» и «KOIN» сходятся в один ключ «koin». Ключи — название
+с начала каждого слова («portals market», «market»), не длиннее MAX_KEY_LENGTH.
+Запрос проверяется как есть, а если такого префикса нет — в другой раскладке («ntktuhfv» -> «телеграм»;
+это считается одной опечаткой); если ни один вариант не нашёлся как префикс, ищутся префиксы на расстоянии
+Левенштейна до max_distance() — тоже сначала для запроса как есть и сначала с одной опечаткой (первая буква
+должна совпасть, на оба варианта проверяется не больше FUZZY_NODES узлов — так время запроса ограничено).
+Подсказки — по возрастанию числа опечаток, затем по рейтингу: приложения пронумерованы по убыванию rating,
+и у больших узлов лучшие SUGGEST_LIMIT номеров посчитаны заранее.
+
+Дерево хранится в нескольких массивах (array/bytes), в том же виде, что и в файле для фронтенда
+(export_index, формат — см. FORMAT и src/utils/autocomplete.ts).
+
+Использование:
+    index = Autocomplete.from_db()
+    index.suggest("notkoin")   # [idminiapp, ...] — Notcoin первым
+
+Запуск: из папки database:
+    python3 autocomplete.py export [--out ../public/autocomplete.bin]
+    python3 autocomplete.py suggest notkoin
+"""
+import argparse
+import os
+import struct
+import sys
+import time
+import unicodedata
+from array import array
+
+import query_profile
+from mainbd import get_all_channels
+
+INDEX_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "public", "autocomplete.bin")
+MAGIC = b"MMAC"
+# Заголовок: MAGIC, версия формата, SUGGEST_LIMIT, приложений, узлов, записей, узлов с top, байт ids
+FORMAT = 1
+HEADER = struct.Struct("<4s7I")
+SUGGEST_LIMIT = 10
+MAX_KEY_LENGTH = 32
+# Ключи — с начала не более чем стольких слов названия
+MAX_WORDS = 6
+# Узлам, у которых в поддереве больше записей, лучшие приложения считаются заранее
+SCAN_LIMIT = 32
+# Больше стольких узлов поиск с опечатками не проверяет — на оба варианта запроса вместе
+# (длинные запросы с цифрами ветвятся сильнее всего)
+FUZZY_NODES = 1000
+_NONE = 0xFFFFFFFF
+
+TRANSLIT = {
+    "а": "a", "б": "b", "в": "v", "г": "g", "д": "d", "е": "e", "ё": "e", "ж": "zh", "з": "z", "и": "i",
+    "й": "y", "к": "k", "л": "l", "м": "m", "н": "n", "о": "o", "п": "p", "р": "r", "с": "s", "т": "t",
+    "у": "u", "ф": "f", "х": "h", "ц": "ts", "ч": "ch", "ш": "sh", "щ": "sch", "ъ": "", "ы": "y", "ь": "",
+    "э": "e", "ю": "yu", "я": "ya",
+}
+# Сочетания, которые транслит и латинские названия пишут по-разному («мажор» — «major», «коин» — «coin»)
+FOLD = (("zh", "j"), ("ph", "f"), ("ck", "k"), ("c", "k"), ("q", "k"), ("w", "v"), ("x", "ks"), ("y", "i"))
+_LAYOUT_EN = "qwertyuiop[]asdfghjkl;'zxcvbnm,.`"
+_LAYOUT_RU = "йцукенгшщзхъфывапролджэячсмитьбюё"
+LAYOUT = {**dict(zip(_LAYOUT_EN, _LAYOUT_RU)), **dict(zip(_LAYOUT_RU, _LAYOUT_EN))}
+
+
+def canonical(text: str) -> str:
+    """
+    Вид для ключей и запросов: a-z, 0-9 и одиночные пробелы, с заменами FOLD.
+    Тот же алгоритм — canonical() в src/utils/autocomplete.ts: меняете здесь — меняйте и там.
+    """
+    text = "".join(TRANSLIT.get(ch, ch) for ch in (text or "").lower())
+    # Диакритика — только блок U+0300–U+036F, как и на фронтенде
+    text = "".join(ch for ch in unicodedata.normalize("NFKD", text) if not "\u0300" <= ch <= "\u036f")
+    text = " ".join("".join(ch if "a" <= ch <= "z" or "0" <= ch <= "9" else " " for ch in text).split())
+    for old, new in FOLD:
+        text = text.replace(old, new)
+    return text
+
+
+def swap_layout(text: str) -> str:
+    """Текст, набранный не в той раскладке: латиница <-> кириллица по клавишам ЙЦУКЕН/QWERTY."""
+    return "".join(LAYOUT.get(ch, ch) for ch in (text or "").lower())
+
+
+def title_keys(title: str) -> list:
+    """Ключи названия: с начала каждого из первых MAX_WORDS слов, не длиннее MAX_KEY_LENGTH."""
+    words = canonical(title).split()
+    return [" ".join(words[i:])[:MAX_KEY_LENGTH] for i in range(min(len(words), MAX_WORDS))]
+
+
+def max_distance(query: str) -> int:
+    """Допустимое число опечаток для запроса такой длины."""
+    return 0 if len(query) < 4 else 1 if len(query) < 9 else 2
+
+
+class Autocomplete:
+    """
+    Дерево в массивах. Узлы пронумерованы в прямом порядке обхода: node — буква chars[node], поддерево —
+    узлы node..subtree_end[node], первый потомок — node + 1, следующий брат — subtree_end[потомка].
+    Записи поддерева (номера приложений) — post_ids[post_start[node]:post_start[subtree_end[node]]].
+    На узел — 9 байт, отдельных массивов рёбер нет.
+    """
+
+    def __init__(self, ids, chars, subtree_end, post_start, post_ids, top, limit):
+        self.ids = ids
+        self.chars = chars
+        self.subtree_end = subtree_end
+        self.post_start = post_start
+        self.post_ids = post_ids
+        self.top = top
+        self.limit = limit
+
+    @classmethod
+    def build(cls, apps, limit: int = SUGGEST_LIMIT) -> "Autocomplete":
+        """apps — (idminiapp, название) в порядке ранжирования (лучшие первыми)."""
+        ids, postings = [], {}
+        for item, (idminiapp, title) in enumerate(apps):
+            ids.append(idminiapp)
+            for key in title_keys(title):
+                postings.setdefault(key, []).append(item)
+
+        # Отсортированные ключи дают узлы в прямом порядке обхода: путь предыдущего ключа — стек
+        chars, subtree_end = bytearray(b"\0"), array("I", [0])
+        post_start, post_ids = array("I", [0]), array("I")
+        path, prev = [0], ""
+        for key in sorted(postings):
+            common = 0
+            for a, b in zip(prev, key):
+                if a != b:
+                    break
+                common += 1
+            while len(path) > common + 1:
+                subtree_end[path.pop()] = len(chars)
+            for ch in key[common:]:
+                path.append(len(chars))
+                chars.append(ord(ch))
+                subtree_end.append(0)
+                post_start.append(len(post_ids))
+            post_ids.extend(sorted(set(postings[key])))
+            prev = key
+        while path:
+            subtree_end[path.pop()] = len(chars)
+        post_start.append(len(post_ids))
+
+        top = {}
+        for node in range(len(chars)):
+            start, end = post_start[node], post_start[subtree_end[node]]
+            if end - start > SCAN_LIMIT:
+                top[node] = sorted(set(post_ids[start:end]))[:limit]
+        return cls(ids, bytes(chars), subtree_end, post_start, post_ids, top, limit)
+
+    @classmethod
+    def from_db(cls, limit: int = SUGGEST_LIMIT) -> "Autocomplete":
+        """Индекс по каталогу; ранжирование — по rating, при равенстве — по idminiapp."""
+        rows = sorted(get_all_channels("idminiapp, title, rating"), key=lambda r: (-(r[2] or 0), r[0]))
+        return cls.build([(idminiapp, title) for idminiapp, title, _ in rows], limit)
+
+    def _child(self, node: int, ch: int):
+        child, end = node + 1, self.subtree_end[node]
+        while child < end:
+            if self.chars[child] == ch:
+                return child
+            child = self.subtree_end[child]
+        return None
+
+    def _find(self, key: bytes):
+        node = 0
+        for ch in key:
+            node = self._child(node, ch)
+            if node is None:
+                return None
+        return node
+
+    def _best(self, node: int) -> list:
+        """Лучшие номера приложений в поддереве узла."""
+        best = self.top.get(node)
+        if best is None:
+            best = sorted(set(self.post_ids[self.post_start[node]:self.post_start[self.subtree_end[node]]]))
+        return best[:self.limit]
+
+    def _fuzzy(self, key: bytes, max_dist: int, budget: int = FUZZY_NODES) -> tuple:
+        """
+        ({узел: расстояние}, остаток budget) для узлов, чей путь отличается от key не больше чем на max_dist
+        правок; проверяется не больше budget узлов.
+        Первая буква должна совпасть: опечатки в ней редки, а обход сужается до одной ветви дерева.
+        Таблица Левенштейна считается по строкам (строка — узел на глубине depth) и только в полосе
+        depth ± max_dist: за её пределами расстояние всё равно больше max_dist.
+        """
+        m = len(key)
+        found = {}
+        start = self._child(0, key[0])
+        if start is None:
+            return found, budget
+        far = max_dist + 1
+        # Строка узла start: его буква совпала с key[0]
+        stack = [(start, 1, [1] + [min(j - 1, far) for j in range(1, m + 1)])]
+        while stack and budget:
+            node, depth, row = stack.pop()
+            if row[m] <= max_dist:
+                if row[m] < found.get(node, far):
+                    found[node] = row[m]
+                if min(row) >= row[m]:
+                    continue  # глубже расстояние не уменьшится — поддерево уже учтено
+            depth += 1
+            lo, hi = max(1, depth - max_dist), min(m, depth + max_dist)
+            child, end = node + 1, self.subtree_end[node]
+            while child < end and budget:
+                budget -= 1
+                ch = self.chars[child]
+                next_row = [far] * (m + 1)
+                if depth <= max_dist:
+                    next_row[0] = depth
+                for j in range(lo, hi + 1):
+                    # min(...) из четырёх значений — без вызова функции: это самый частый код обхода
+                    cost = row[j - 1] + (key[j - 1] != ch)
+                    other = row[j] + 1
+                    if other < cost:
+                        cost = other
+                    other = next_row[j - 1] + 1
+                    if other < cost:
+                        cost = other
+                    next_row[j] = cost if cost < far else far
+                if min(next_row) <= max_dist:
+                    stack.append((child, depth, next_row))
+                child = self.subtree_end[child]
+        return found, budget
+
+    def suggest(self, query: str, limit: int = None) -> list:
+        """
+        idminiapp подсказок: префиксы запроса, если их нет — префиксы запроса в другой раскладке (как одна
+        опечатка), если нет и их — префиксы с опечатками, тоже сначала для запроса как есть. Меньше опечаток —
+        выше, при равенстве — выше рейтинг. На поиск с опечатками у обоих вариантов вместе FUZZY_NODES узлов.
+        """
+        limit = min(limit or self.limit, self.limit)
+        variants = [(canonical(query).encode("ascii"), 0)]
+        swapped = swap_layout(query).strip()
+        # С ь, ъ, ы русские слова не начинаются — значит, раскладка была верной
+        if swapped and swapped[0] not in "ьъы":
+            variants.append((canonical(swapped).encode("ascii"), 1))
+        variants = [(key, penalty) for key, penalty in variants if key]
+        best = {}
+
+        def add(node: int, rank: int) -> None:
+            for item in self._best(node):
+                if rank < best.get(item, rank + 1):
+                    best[item] = rank
+
+        for key, penalty in variants:
+            node = self._find(key)
+            if node is not None:
+                add(node, penalty)
+                break
+        # Сначала одна опечатка, две — только если с одной ничего нет: узкая полоса раскрывает намного меньше узлов
+        budget = FUZZY_NODES
+        for key, penalty in variants:
+            for max_dist in range(1, max_distance(key) + 1):
+                if best or not budget:
+                    break
+                found, budget = self._fuzzy(key, max_dist, budget)
+                for node, dist in found.items():
+                    add(node, dist + penalty)
+        ranked = sorted(best, key=lambda item: (best[item], item))
+        return [self.ids[item] for item in ranked[:limit]]
+
+    def to_bytes(self) -> bytes:
+        """Файл индекса: заголовок HEADER и массивы (uint32 little-endian, каждый выровнен на 4 байта)."""
+        ids = "\n".join(self.ids).encode("utf-8")
+        top_nodes = sorted(self.top)
+        top_items = array("I")
+        for node in top_nodes:
+            items = self.top[node]
+            top_items.extend(items + [_NONE] * (self.limit - len(items)))
+        sections = [ids, self.chars]
+        for values in (self.subtree_end, self.post_start, self.post_ids, array("I", top_nodes), top_items):
+            values = array("I", values)
+            if sys.byteorder == "big":
+                values.byteswap()
+            sections.append(values.tobytes())
+        header = HEADER.pack(MAGIC, FORMAT, self.limit, len(self.ids), len(self.chars), len(self.post_ids),
+                             len(top_nodes), len(ids))
+        return header + b"".join(s + b"\0" * (-len(s) % 4) for s in sections)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "Autocomplete":
+        magic, version, limit, items, nodes, postings, tops, ids_len = HEADER.unpack_from(data)
+        if magic != MAGIC or version != FORMAT:
+            raise ValueError("Не файл индекса подсказок или другая версия формата")
+        offset = HEADER.size
+
+        def take(size: int, uint32: bool = True):
+            nonlocal offset
+            chunk = data[offset:offset + size * (4 if uint32 else 1)]
+            offset += len(chunk) + (-len(chunk) % 4)
+            if not uint32:
+                return bytes(chunk)
+            values = array("I", chunk)
+            if sys.byteorder == "big":
+                values.byteswap()
+            return values
+
+        ids = take(ids_len, uint32=False).decode("utf-8").split("\n") if items else []
+        chars = take(nodes, uint32=False)
+        subtree_end, post_start, post_ids = take(nodes), take(nodes + 1), take(postings)
+        top_nodes, top_items = take(tops), take(tops * limit)
+        top = {
+            node: [item for item in top_items[i * limit:(i + 1) * limit] if item != _NONE]
+            for i, node in enumerate(top_nodes)
+        }
+        return cls(ids, chars, subtree_end, post_start, post_ids, top, limit)
+
+
+def export_index(path: str = INDEX_FILE) -> dict:
+    """Строит индекс по каталогу и записывает файл для фронтенда. Возвращает размеры."""
+    index = Autocomplete.from_db()
+    data = index.to_bytes()
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+    return {"apps": len(index.ids), "nodes": len(index.subtree_end), "bytes": len(data)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Подсказки поиска по названиям приложений.")
+    parser.add_argument("--profile", action="store_true", help="сводка по SQL-запросам при выходе (query_profile)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export_parser = commands.add_parser("export", help="записать файл индекса для фронтенда")
+    export_parser.add_argument("--out", default=INDEX_FILE)
+    suggest_parser = commands.add_parser("suggest", help="подсказки для запроса")
+    suggest_parser.add_argument("query")
+    args = parser.parse_args(argv)
+    if args.profile:
+        query_profile.enable()
+
+    if args.command == "export":
+        stats = export_index(args.out)
+        print(f"Индекс: {stats['apps']} приложений, {stats['nodes']} узлов, {stats['bytes'] // 1024} КБ -> {args.out}")
+    else:
+        started = time.perf_counter()
+        index = Autocomplete.from_db()
+        built = time.perf_counter()
+        result = index.suggest(args.query)
+        print(f"Индекс за {built - started:.2f} с, запрос за {(time.perf_counter() - built) * 1000:.3f} мс")
+        for idminiapp in result:
+            print(f"  {idminiapp}")
+
+
+if __name__ == "__main__":
+    main()
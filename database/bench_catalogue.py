@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Синтетический каталог для benchmark.py: N приложений (telegram_channels.db), отзывы к ним (reviews.db)
+и WebP-файлы иконок и скриншотов (logo&screens/) в отдельной папке — рабочие базы не трогаются.
+
+Состав похож на настоящий каталог:
+- ~2% названий повторяют более раннее (часть — другим регистром или с эмодзи) — для remove_duplicate_channels;
+- ~5% приложений с повтором имени в screenshots_path — для dedupe_screenshots;
+- ~10% скриншотов — аномалии (квадратные, белые, однотонные) — для filter_anomaly_screenshots.
+Уникальных картинок немного (пул), а каждый файл — картинка из пула с уникальным хвостом после
+данных WebP: декодируется так же, но хэш у всех файлов разный, и кэш image_cache не срезает работу.
+
+Запуск: cd database && python3 bench_catalogue.py --size 10000 --out /tmp/minimarket-bench/10000
+"""
+
+import argparse
+import io
+import json
+import os
+import random
+import time
+
+try:
+    from PIL import Image, ImageDraw
+except ImportError:
+    print("Установите Pillow: python3 -m pip install Pillow")
+    raise
+
+# Увеличьте при изменении состава каталога: benchmark.py перегенерирует сохранённые каталоги
+GENERATOR_VERSION = 1
+MARKER_FILE = "catalogue.json"
+
+SCREENSHOT_POOL = 300
+ANOMALY_POOL = 30
+ICON_POOL = 100
+SCREENSHOTS_PER_APP = 3
+REVIEWS_PER_APP = 3          # в среднем
+DUPLICATE_TITLE_SHARE = 0.02
+DUPLICATE_SCREENSHOT_SHARE = 0.05
+ANOMALY_SHARE = 0.10
+
+CATEGORIES = ("Игры", "Утилиты", "Нейросети", "Финансы", "Подарки")
+WORDS = (
+    "tap coin game wallet crypto farm quest battle puzzle ai chat bot gift market swap stake token "
+    "music photo video news shop trade pet city race hero card lottery vpn translate notes "
+    "игра монеты кошелёк ферма квест битва головоломка нейросеть чат подарки магазин обмен токен "
+    "музыка фото видео новости питомец город гонки герой карты лотерея перевод заметки"
+).split()
+
+
+def _webp(img: Image.Image) -> bytes:
+    buf = io.BytesIO()
+    img.save(buf, "WEBP", quality=50)
+    return buf.getvalue()
+
+
+def _screenshot(rng: random.Random) -> bytes:
+    img = Image.new("RGB", (240, 420), tuple(rng.randrange(256) for _ in range(3)))
+    draw = ImageDraw.Draw(img)
+    for _ in range(12):
+        x, y = rng.randrange(240), rng.randrange(420)
+        draw.rectangle([x, y, x + rng.randrange(20, 120), y + rng.randrange(10, 80)],
+                       fill=tuple(rng.randrange(256) for _ in range(3)))
+    for _ in range(6):
+        draw.text((rng.randrange(200), rng.randrange(400)), f"Lorem ipsum {rng.randrange(999)}", fill=(0, 0, 0))
+    return _webp(img)
+
+
+def _anomaly(rng: random.Random, i: int) -> bytes:
+    kind = i % 3
+    if kind == 0:  # иконка вместо скриншота
+        img = Image.new("RGB", (300, 300), tuple(rng.randrange(256) for _ in range(3)))
+        ImageDraw.Draw(img).ellipse([50, 50, 250, 250], fill=(255, 255, 255))
+    elif kind == 1:  # пустой белый экран
+        img = Image.new("RGB", (240, 420), (252, 252, 252))
+    else:  # однотонная заглушка
+        img = Image.new("RGB", (240, 420), tuple(rng.randrange(256) for _ in range(3)))
+    return _webp(img)
+
+
+def _icon(rng: random.Random) -> bytes:
+    img = Image.new("RGB", (128, 128), tuple(rng.randrange(256) for _ in range(3)))
+    ImageDraw.Draw(img).rectangle([32, 32, 96, 96], fill=tuple(rng.randrange(256) for _ in range(3)))
+    return _webp(img)
+
+
+def _title(rng: random.Random) -> str:
+    return " ".join(w.capitalize() for w in rng.sample(WORDS, rng.randint(1, 3))) + f" {rng.randrange(10 ** 6)}"
+
+
+def _variant_title(rng: random.Random, title: str) -> str:
+    """Повтор названия: как есть, другим регистром или с эмодзи."""
+    return rng.choice((title, title.upper(), f"  {title} 🚀"))
+
+
+def build_rows(size: int, seed: int = 1) -> list:
+    """Строки channels для bulk_add_channels и имена файлов в них."""
+    rng = random.Random(seed)
+    rows = []
+    for i in range(size):
+        slug = f"app{i:06d}_bot"
+        title = _title(rng)
+        if rows and rng.random() < DUPLICATE_TITLE_SHARE:
+            title = _variant_title(rng, rng.choice(rows)["title"].strip())
+        screenshots = [f"{slug}_scr_{k}.webp" for k in range(1, SCREENSHOTS_PER_APP + 1)]
+        if rng.random() < DUPLICATE_SCREENSHOT_SHARE:
+            screenshots.append(screenshots[0])
+        rows.append({
+            "idminiapp": slug,
+            "title": title,
+            "description": " ".join(rng.choice(WORDS) for _ in range(rng.randint(15, 40))),
+            "icon": f"{slug}_logo.webp",
+            "url": f"https://t.me/{slug}/?startapp",
+            "is_verified": rng.random() < 0.1,
+            "rating": round(rng.uniform(3, 5), 1),
+            "category": rng.choice(CATEGORIES),
+            "screenshots_path": ";".join(screenshots),
+        })
+    return rows
+
+
+def write_assets(rows: list, assets_dir: str, seed: int = 1) -> int:
+    """Пишет иконки и скриншоты приложений. Возвращает число файлов."""
+    rng = random.Random(seed)
+    screenshots = [_screenshot(rng) for _ in range(SCREENSHOT_POOL)]
+    anomalies = [_anomaly(rng, i) for i in range(ANOMALY_POOL)]
+    icons = [_icon(rng) for _ in range(ICON_POOL)]
+    os.makedirs(assets_dir, exist_ok=True)
+    written = 0
+    for row in rows:
+        names = [(row["icon"], rng.choice(icons))]
+        for name in dict.fromkeys(row["screenshots_path"].split(";")):
+            pool = anomalies if rng.random() < ANOMALY_SHARE else screenshots
+            names.append((name, rng.choice(pool)))
+        for name, data in names:
+            with open(os.path.join(assets_dir, name), "wb") as f:
+                f.write(data)
+                f.write(b"\0BENCH" + name.encode())  # уникальный хэш при тех же пикселях
+            written += 1
+    return written
+
+
+def generate(size: int, out_dir: str, seed: int = 1) -> dict:
+    """
+    Создаёт каталог в out_dir: telegram_channels.db, reviews.db, logo&screens/ и catalogue.json.
+    Пути задаются через MAINBD_* до импорта mainbd, поэтому вызывать в отдельном процессе.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    paths = {
+        "MAINBD_DB_PATH": os.path.join(out_dir, "telegram_channels.db"),
+        "MAINBD_REVIEWS_PATH": os.path.join(out_dir, "reviews.db"),
+        "MAINBD_ASSETS_DIR": os.path.join(out_dir, "logo&screens"),
+    }
+    for path in paths.values():
+        if os.path.isfile(path):
+            os.remove(path)
+    os.environ.update(paths)
+    import dbpool
+    import mainbd
+    import reviews
+
+    started = time.perf_counter()
+    rows = build_rows(size, seed)
+    mainbd.bulk_add_channels(rows)
+    files = write_assets(rows, paths["MAINBD_ASSETS_DIR"], seed)
+
+    rng = random.Random(seed + 1)
+    review_rows = [
+        (row["idminiapp"], f"user{rng.randrange(10 ** 5)}", rng.choices((1, 2, 3, 4, 5), (1, 1, 2, 4, 6))[0],
+         " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 20))))
+        for row in rows for _ in range(rng.randint(0, 2 * REVIEWS_PER_APP))
+    ]
+    with dbpool.transaction(reviews.REVIEWS_DB) as conn:
+        conn.executemany("INSERT INTO reviews (idminiapp, username, rating, text) VALUES (?, ?, ?, ?)", review_rows)
+    dbpool.close_all()
+
+    info = {
+        "generator_version": GENERATOR_VERSION,
+        "size": size,
+        "seed": seed,
+        "reviews": len(review_rows),
+        "files": files,
+        "seconds": round(time.perf_counter() - started, 2),
+        **paths,
+    }
+    with open(os.path.join(out_dir, MARKER_FILE), "w", encoding="utf-8") as f:
+        json.dump(info, f, ensure_ascii=False, indent=1)
+    return info
+
+
+def load_marker(out_dir: str):
+    """Описание готового каталога или None, если его нет или он от другой версии генератора."""
+    try:
+        with open(os.path.join(out_dir, MARKER_FILE), encoding="utf-8") as f:
+            info = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return info if info.get("generator_version") == GENERATOR_VERSION else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Генерирует синтетический каталог для бенчмарков.")
+    parser.add_argument("--size", type=int, required=True, help="число приложений")
+    parser.add_argument("--out", required=True, help="папка каталога")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+    info = generate(args.size, args.out, args.seed)
+    print(f"Каталог {args.size}: отзывов {info['reviews']}, файлов {info['files']}, {info['seconds']} с -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
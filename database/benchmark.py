@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+"""
+Бенчмарки слоя данных (mainbd, reviews, events, autocomplete) и скриптов обслуживания на синтетических каталогах
+из bench_catalogue.py (по умолчанию 1k, 10k и 100k приложений).
+
+Каждый замер идёт в отдельном процессе на свежей копии баз (и с пустым image_cache.db), поэтому
+замеры не влияют друг на друга, а пиковая память (ru_maxrss) относится только к нему.
+Для каждого замера: число операций, время, операций в секунду, задержка p50/p99/max и пиковая RSS
+процесса и его дочерних процессов (пулы в filter_anomaly_screenshots и т.п.).
+Результаты пишутся в bench_results/<коммит>.json; --compare сравнивает с прошлым файлом.
+
+Запуск: cd database && python3 benchmark.py [--sizes 1000 10000] [--cases get_channel search_channels]
+        [--workers N] [--timeout 900] [--compare bench_results/abc1234.json]
+Требуется: pip install Pillow numpy
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import platform
+import random
+import resource
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+import bench_catalogue
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.path.join(BASE_DIR, "bench_results")
+DATA_DIR = os.path.join(tempfile.gettempdir(), "minimarket-bench")
+RESULTS_FORMAT = 1
+DEFAULT_SIZES = (1000, 10000, 100000)
+DEFAULT_TIMEOUT = 900
+
+
+# --- Замеры. Выполняются в дочернем процессе с MAINBD_* на копию каталога; возвращают задержки операций ---
+
+def _ids(size: int) -> list:
+    return [f"app{i:06d}_bot" for i in range(size)]
+
+
+def _timed(calls) -> list:
+    latencies = []
+    for call in calls:
+        started = time.perf_counter()
+        call()
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def _run_main(module_name: str, argv: list) -> list:
+    module = __import__(module_name)
+    with contextlib.redirect_stdout(io.StringIO()):
+        return _timed([lambda: module.main(argv)])
+
+
+def case_get_channel(size, rng, workers):
+    import mainbd
+    return _timed(lambda i=i: mainbd.get_channel(i) for i in rng.choices(_ids(size), k=2000))
+
+
+def case_add_channel(size, rng, workers):
+    import mainbd
+    return _timed(
+        (lambda i=i: mainbd.add_channel(f"new{i:06d}_bot", f"New app {i}", "bench", screenshots_path="a.webp"))
+        for i in range(500)
+    )
+
+
+def case_update_channel(size, rng, workers):
+    import mainbd
+    return _timed(
+        (lambda i=i, n=n: mainbd.update_channel(i, title=f"Renamed {n}", rating=4.5))
+        for n, i in enumerate(rng.sample(_ids(size), min(500, size)))
+    )
+
+
+def case_delete_channel(size, rng, workers):
+    import mainbd
+    return _timed((lambda i=i: mainbd.delete_channel(i)) for i in rng.sample(_ids(size), min(500, size)))
+
+
+def case_search_channels(size, rng, workers):
+    import mainbd
+    # Подстрока по всей таблице; 10% запросов — кусок слова из середины
+    queries = [rng.choice(bench_catalogue.WORDS) if rng.random() > 0.1 else rng.choice(bench_catalogue.WORDS)[1:4]
+               for _ in range(200)]
+    return _timed((lambda q=q: mainbd.search_channels(q)) for q in queries)
+
+
+def case_search_channels_ranked(size, rng, workers):
+    import mainbd
+    # 10% запросов ничего не находят: время промаха не должно зависеть от размера каталога
+    queries = [rng.choice(bench_catalogue.WORDS) if rng.random() > 0.1 else rng.choice(bench_catalogue.WORDS)[1:4]
+               for _ in range(200)]
+    return _timed((lambda q=q: mainbd.search_channels_ranked(q)) for q in queries)
+
+
+def case_get_all_channels(size, rng, workers):
+    import mainbd
+    return _timed(mainbd.get_all_channels for _ in range(5))
+
+
+def case_get_review_stats(size, rng, workers):
+    import reviews
+    return _timed((lambda i=i: reviews.get_review_stats(i)) for i in rng.choices(_ids(size), k=2000))
+
+
+def case_dedupe_screenshots(size, rng, workers):
+    return _run_main("dedupe_screenshots", [])
+
+
+def case_dedupe_screenshots_near(size, rng, workers):
+    return _run_main("dedupe_screenshots", ["--near", "--workers", str(workers)])
+
+
+def case_filter_anomaly_screenshots(size, rng, workers):
+    return _run_main("filter_anomaly_screenshots", ["--workers", str(workers)])
+
+
+def case_filter_anomaly_screenshots_warm(size, rng, workers):
+    """Повторный запуск: метрики уже в image_cache.db (первый прогон не замеряется, его правки откатываются)."""
+    import dbpool
+    import mainbd
+    with dbpool.connection(mainbd.DB_NAME) as conn:
+        before = conn.execute("SELECT idminiapp, screenshots_path FROM channels").fetchall()
+    _run_main("filter_anomaly_screenshots", ["--workers", str(workers)])
+    with dbpool.transaction(mainbd.DB_NAME) as conn:
+        conn.executemany("UPDATE channels SET screenshots_path = ? WHERE idminiapp = ?", [(p, i) for i, p in before])
+    return _run_main("filter_anomaly_screenshots", ["--workers", str(workers)])
+
+
+def case_remove_duplicate_channels(size, rng, workers):
+    return _run_main("remove_duplicate_channels", [])
+
+
+def case_remove_duplicate_channels_fuzzy(size, rng, workers):
+    return _run_main("remove_duplicate_channels", ["--fuzzy"])
+
+
+def case_pipeline(size, rng, workers):
+    """Все шаги pipeline.py, кроме перевода (нужна сеть), за один проход."""
+    return _run_main("pipeline", ["--stages", "dedupe-title", "screenshots", "anomalies", "categories",
+                                  "--fuzzy-titles", "--workers", str(workers)])
+
+
+def _event_ids(size, count, rng):
+    import events
+    return events.synthetic_events(_ids(size), count, time.time() - 86400, 86400, seed=rng.randrange(1 << 30))
+
+
+def case_ingest_events(size, rng, workers):
+    """Запись событий через EventBuffer: задержка record(), включая сброс пачки в том же потоке."""
+    import events
+    buffer = events.EventBuffer(max_delay=None)
+    latencies = _timed((lambda e=e: buffer.record(*e)) for e in _event_ids(size, 200000, rng))
+    return latencies + _timed([buffer.close])
+
+
+def case_ingest_events_per_commit(size, rng, workers):
+    """Для сравнения с ingest_events: коммит на каждое событие."""
+    import dbpool
+    import events
+
+    def insert(event):
+        with dbpool.transaction(events.EVENTS_DB) as conn:
+            conn.execute("INSERT INTO events (idminiapp, kind, ts) VALUES (?, ?, ?)", event)
+    return _timed((lambda e=e: insert(e)) for e in _event_ids(size, 5000, rng))
+
+
+def case_rollup_events(size, rng, workers):
+    """rollup() 200k новых событий и перенос баллов в channels.trending."""
+    import events
+    with events.EventBuffer(max_delay=None, max_events=10000) as buffer:
+        for event in _event_ids(size, 200000, rng):
+            buffer.record(*event)
+    return _timed([events.rollup, events.write_trending])
+
+
+def _keystrokes(size, rng, count=300):
+    """Запросы по мере набора случайных названий каталога: по буквам, с опечаткой и в другой раскладке."""
+    import autocomplete
+    import bench_catalogue
+    queries = []
+    for row in rng.sample(bench_catalogue.build_rows(size), min(count, size)):
+        title = row["title"].lower()
+        typed = rng.choice((title, title[:2] + title[3:], autocomplete.swap_layout(title)))
+        queries += [typed[:n] for n in range(1, min(len(typed), 12) + 1)]
+    return queries
+
+
+def _typos(size, rng, count=300):
+    """Префиксы названий каталога длиной 4–12 с неверной последней буквой: точного префикса нет, нужен поиск с опечатками."""
+    import autocomplete
+    import bench_catalogue
+    queries = []
+    for row in rng.sample(bench_catalogue.build_rows(size), min(count, size)):
+        key = autocomplete.canonical(row["title"])[:rng.randint(4, 12)]
+        if len(key) >= 4:
+            queries.append(key[:-1] + rng.choice([ch for ch in "abdefghijklmnoprstuvz" if ch != key[-1]]))
+    return queries
+
+
+def case_autocomplete_build(size, rng, workers):
+    import autocomplete
+    return _timed([autocomplete.Autocomplete.from_db])
+
+
+def case_autocomplete_suggest(size, rng, workers):
+    """Подсказка на каждое нажатие клавиши."""
+    import autocomplete
+    index = autocomplete.Autocomplete.from_db()
+    return _timed((lambda q=q: index.suggest(q)) for q in _keystrokes(size, rng))
+
+
+def case_autocomplete_suggest_typo(size, rng, workers):
+    """Подсказка на запрос с опечаткой в последней букве — худший случай: поиск по обеим раскладкам."""
+    import autocomplete
+    index = autocomplete.Autocomplete.from_db()
+    return _timed((lambda q=q: index.suggest(q)) for q in _typos(size, rng))
+
+
+CASES = {name[len("case_"):]: func for name, func in globals().items() if name.startswith("case_")}
+
+
+# --- Запуск ---
+
+def percentile(sorted_values: list, p: float) -> float:
+    """Перцентиль методом ближайшего ранга."""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, max(0, math.ceil(p * len(sorted_values)) - 1))]
+
+
+def summarize(latencies: list) -> dict:
+    values = sorted(latencies)
+    total = sum(values)
+    return {
+        "ops": len(values),
+        "seconds": round(total, 4),
+        "ops_per_s": round(len(values) / total, 2) if total else None,
+        "p50_ms": round(percentile(values, 0.50) * 1000, 3),
+        "p99_ms": round(percentile(values, 0.99) * 1000, 3),
+        "max_ms": round(values[-1] * 1000, 3) if values else 0.0,
+    }
+
+
+def run_case_here(name: str, size: int, workers: int) -> dict:
+    """Выполняется в дочернем процессе (--run-case)."""
+    latencies = CASES[name](size, random.Random(size), workers)
+    result = summarize(latencies)
+    # ru_maxrss в Linux — в КиБ, в macOS — в байтах
+    unit = 1 if sys.platform == "darwin" else 1024
+    result["peak_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * unit / 2 ** 20, 1)
+    result["children_peak_rss_mb"] = round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * unit / 2 ** 20, 1)
+    return result
+
+
+def ensure_catalogue(size: int, data_dir: str) -> dict:
+    out = os.path.join(data_dir, str(size))
+    info = bench_catalogue.load_marker(out)
+    if info and info["size"] == size:
+        return info
+    print(f"Генерация каталога на {size} приложений...")
+    subprocess.run([sys.executable, os.path.join(BASE_DIR, "bench_catalogue.py"), "--size", str(size), "--out", out],
+                   check=True)
+    return bench_catalogue.load_marker(out)
+
+
+def run_case(name: str, info: dict, workers: int, timeout: int) -> dict:
+    """Копирует базы каталога во временную папку и выполняет замер в отдельном процессе."""
+    with tempfile.TemporaryDirectory(prefix="bench-") as work:
+        env = dict(os.environ)
+        env["MAINBD_DB_PATH"] = os.path.join(work, "telegram_channels.db")
+        env["MAINBD_REVIEWS_PATH"] = os.path.join(work, "reviews.db")
+        env["MAINBD_EVENTS_PATH"] = os.path.join(work, "events.db")
+        # Файлы не меняются — ссылка вместо копии; image_cache.db окажется в work (родитель папки с файлами)
+        env["MAINBD_ASSETS_DIR"] = os.path.join(work, "logo&screens")
+        shutil.copyfile(info["MAINBD_DB_PATH"], env["MAINBD_DB_PATH"])
+        shutil.copyfile(info["MAINBD_REVIEWS_PATH"], env["MAINBD_REVIEWS_PATH"])
+        os.symlink(info["MAINBD_ASSETS_DIR"], env["MAINBD_ASSETS_DIR"])
+        cmd = [sys.executable, os.path.abspath(__file__), "--run-case", name,
+               "--sizes", str(info["size"]), "--workers", str(workers)]
+        try:
+            proc = subprocess.run(cmd, env=env, cwd=BASE_DIR, capture_output=True, text=True, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            return {"status": "timeout", "timeout_s": timeout}
+    if proc.returncode != 0:
+        return {"status": "error", "error": proc.stderr.strip().splitlines()[-1:]}
+    return {"status": "ok", **json.loads(proc.stdout.strip().splitlines()[-1])}
+
+
+def git_commit() -> str:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=BASE_DIR,
+                               capture_output=True, text=True).stdout.strip()
+        return commit + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _format(result: dict) -> str:
+    if result["status"] != "ok":
+        return result["status"]
+    return (f"{result['ops']:>5} оп. {result['seconds']:>9.3f} с {result['ops_per_s'] or 0:>10.1f} оп/с "
+            f"p50 {result['p50_ms']:>9.3f} мс p99 {result['p99_ms']:>9.3f} мс "
+            f"RSS {result['peak_rss_mb']:>6.1f} МБ (+{result['children_peak_rss_mb']:.1f})")
+
+
+def compare(old_path: str, results: list) -> None:
+    with open(old_path, encoding="utf-8") as f:
+        old = json.load(f)
+    before = {(r["size"], r["case"]): r for r in old["results"] if r["status"] == "ok"}
+    print(f"\nСравнение с {old.get('commit')} ({os.path.basename(old_path)}): p50 и пропускная способность")
+    common = [(r, before[(r["size"], r["case"])]) for r in results
+              if r["status"] == "ok" and (r["size"], r["case"]) in before]
+    if not common:
+        print("  общих замеров нет")
+    for r, b in common:
+        p50 = (r["p50_ms"] / b["p50_ms"] - 1) * 100 if b["p50_ms"] else 0.0
+        rate = (r["ops_per_s"] / b["ops_per_s"] - 1) * 100 if b["ops_per_s"] and r["ops_per_s"] else 0.0
+        print(f"  {r['size']:>7} {r['case']:<38} p50 {p50:+7.1f}%  оп/с {rate:+7.1f}%")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмарки mainbd и скриптов обслуживания.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES), help="размеры каталогов")
+    parser.add_argument("--cases", nargs="+", choices=sorted(CASES), default=list(CASES), help="какие замеры")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="процессов для скриптов с пулом")
+    parser.add_argument("--timeout", type=int, default=DEFAULT_TIMEOUT, help="предел на один замер, сек")
+    parser.add_argument("--data-dir", default=DATA_DIR, help="где хранить сгенерированные каталоги")
+    parser.add_argument("--out", default=None, help="файл результатов (по умолчанию bench_results/<коммит>.json)")
+    parser.add_argument("--compare", metavar="JSON", help="сравнить с прошлым файлом результатов")
+    parser.add_argument("--run-case", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.run_case:
+        print(json.dumps(run_case_here(args.run_case, args.sizes[0], args.workers)))
+        return
+
+    commit = git_commit()
+    results = []
+    for size in args.sizes:
+        info = ensure_catalogue(size, args.data_dir)
+        print(f"\nКаталог {size}: отзывов {info['reviews']}, файлов {info['files']}")
+        for name in args.cases:
+            result = {"size": size, "case": name, **run_case(name, info, args.workers, args.timeout)}
+            results.append(result)
+            print(f"  {name:<38} {_format(result)}")
+
+    out = args.out or os.path.join(RESULTS_DIR, f"{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump({
+            "format": RESULTS_FORMAT,
+            "commit": commit,
+            "generated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "workers": args.workers,
+            "generator_version": bench_catalogue.GENERATOR_VERSION,
+            "results": results,
+        }, f, ensure_ascii=False, indent=1)
+    print(f"\nРезультаты: {out}")
+    if args.compare:
+        compare(args.compare, results)
+
+
+if __name__ == "__main__":
+    main()
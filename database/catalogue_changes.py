@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Журнал изменений каталога (channel_changes): текущая версия, изменения после версии, сжатие журнала.
+Журнал пишут триггеры на channels, поэтому в нём видны и правки скриптов обслуживания, и правки из SQLiteStudio.
+Таблицу и триггеры создаёт этот модуль (при первом подключении к БД): catalogue_version и changes_since
+импортируются отсюда.
+
+Запуск: из папки database:
+    python3 catalogue_changes.py                    # текущая версия и размер журнала
+    python3 catalogue_changes.py --since 120        # что изменилось после версии 120
+    python3 catalogue_changes.py --compact [--max-age-days 30]
+"""
+import argparse
+from typing import Optional
+
+import dbpool
+import query_profile
+from mainbd import CHANNEL_COLUMNS, DB_NAME
+
+_NOW_SQL = "strftime('%Y-%m-%d %H:%M:%f', 'now')"
+# Столбцы channels, изменение которых попадает в channel_changes
+_TRACKED_FIELDS = ("title", "description", "short_description", "icon", "url", "is_verified", "rating",
+                   "category", "screenshots_path")
+
+
+def _ensure_schema(conn):
+    # version — AUTOINCREMENT: номера не переиспользуются и после compact_changes
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS channel_changes (
+            version INTEGER PRIMARY KEY AUTOINCREMENT,
+            idminiapp TEXT NOT NULL,
+            op TEXT NOT NULL,
+            changed_at TEXT DEFAULT ({_NOW_SQL})
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_channel_changes_idminiapp ON channel_changes(idminiapp, version)")
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS channel_changes_ai AFTER INSERT ON channels BEGIN
+            INSERT INTO channel_changes (idminiapp, op) VALUES (new.idminiapp, 'I');
+        END
+    """)
+    # Только изменения данных: служебные title_norm и changed_at (их пишут другие триггеры) не считаются
+    changed = " OR ".join(f"new.{c} IS NOT old.{c}" for c in _TRACKED_FIELDS)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS channel_changes_au AFTER UPDATE ON channels
+        WHEN new.idminiapp IS old.idminiapp AND ({changed})
+        BEGIN
+            INSERT INTO channel_changes (idminiapp, op) VALUES (new.idminiapp, 'U');
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS channel_changes_au_id AFTER UPDATE OF idminiapp ON channels
+        WHEN new.idminiapp IS NOT old.idminiapp
+        BEGIN
+            INSERT INTO channel_changes (idminiapp, op) VALUES (old.idminiapp, 'D');
+            INSERT INTO channel_changes (idminiapp, op) VALUES (new.idminiapp, 'I');
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS channel_changes_ad AFTER DELETE ON channels BEGIN
+            INSERT INTO channel_changes (idminiapp, op) VALUES (old.idminiapp, 'D');
+        END
+    """)
+
+
+dbpool.register_schema(_ensure_schema)
+
+
+# Версии не новее этой удалены из журнала compact_changes: клиентам с такой версией нужна полная выгрузка
+_CHANGES_FLOOR_KEY = "channel_changes_floor"
+
+
+def _catalogue_version(conn) -> int:
+    # sqlite_sequence хранит последний выданный version, даже если строки журнала уже удалены
+    row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'channel_changes'").fetchone()
+    return row[0] if row else 0
+
+
+def catalogue_version() -> int:
+    """Текущая версия каталога: растёт при каждом добавлении, изменении и удалении строки channels."""
+    with dbpool.connection(DB_NAME) as conn:
+        return _catalogue_version(conn)
+
+
+def changes_since(version: Optional[int], columns: str = CHANNEL_COLUMNS) -> dict:
+    """
+    Изменения каталога после версии version (её клиент получил в прошлый раз).
+    Возвращает {"version": текущая версия, "full": bool, "upserts": [строки в порядке columns], "deletes": [idminiapp]}.
+    Несколько изменений одной строки схлопываются: upserts — её текущее состояние, deletes — если её больше нет.
+    full=True — журнал за этот период уже сжат (или version=None, или она из будущего): upserts содержит весь каталог,
+    и клиент заменяет свою копию целиком.
+    """
+    with dbpool.transaction(DB_NAME) as conn:  # один снимок: версия и строки согласованы
+        current = _catalogue_version(conn)
+        floor = conn.execute("SELECT value FROM maintenance_state WHERE key = ?", (_CHANGES_FLOOR_KEY,)).fetchone()
+        floor = int(floor[0]) if floor else 0
+        if version is None or version < floor or version > current:
+            rows = conn.execute(f"SELECT {columns} FROM channels ORDER BY rowid").fetchall()
+            return {"version": current, "full": True, "upserts": rows, "deletes": []}
+        # Последняя операция по каждой строке (SQLite берёт op из строки с MAX(version))
+        latest = conn.execute(
+            "SELECT idminiapp, op, MAX(version) FROM channel_changes WHERE version > ? GROUP BY idminiapp",
+            (version,),
+        ).fetchall()
+        upsert_ids = [idminiapp for idminiapp, op, _ in latest if op != "D"]
+        deletes = [idminiapp for idminiapp, op, _ in latest if op == "D"]
+        upserts = []
+        for i in range(0, len(upsert_ids), 500):  # лимит параметров SQLite
+            chunk = upsert_ids[i:i + 500]
+            upserts += conn.execute(
+                f"SELECT {columns} FROM channels WHERE idminiapp IN ({', '.join('?' * len(chunk))}) ORDER BY rowid",
+                chunk,
+            ).fetchall()
+    return {"version": current, "full": False, "upserts": upserts, "deletes": deletes}
+
+
+def compact_changes(max_age_days: Optional[float] = 30) -> dict:
+    """
+    Сжимает журнал channel_changes: по каждой строке остаётся только последняя запись
+    (результат changes_since от этого не меняется), а записи старше max_age_days удаляются
+    совсем — клиенты с более старой версией получат full=True. max_age_days=None — только схлопывание.
+    Возвращает {"coalesced": удалено повторов, "expired": удалено старых, "floor": версия-граница}.
+    """
+    with dbpool.transaction(DB_NAME) as conn:
+        coalesced = conn.execute("""
+            DELETE FROM channel_changes WHERE version NOT IN (
+                SELECT MAX(version) FROM channel_changes GROUP BY idminiapp
+            )
+        """).rowcount
+        floor = conn.execute("SELECT value FROM maintenance_state WHERE key = ?", (_CHANGES_FLOOR_KEY,)).fetchone()
+        floor = int(floor[0]) if floor else 0
+        expired = 0
+        if max_age_days is not None:
+            cutoff = f"strftime('%Y-%m-%d %H:%M:%f', 'now', '-{float(max_age_days)} days')"
+            newest = conn.execute(f"SELECT MAX(version) FROM channel_changes WHERE changed_at < {cutoff}").fetchone()[0]
+            if newest is not None:
+                expired = conn.execute("DELETE FROM channel_changes WHERE version <= ?", (newest,)).rowcount
+                floor = max(floor, newest)
+                conn.execute("INSERT OR REPLACE INTO maintenance_state (key, value) VALUES (?, ?)",
+                             (_CHANGES_FLOOR_KEY, str(floor)))
+    return {"coalesced": coalesced, "expired": expired, "floor": floor}
+
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Версия каталога и журнал изменений channels.")
+    parser.add_argument("--since", type=int, help="показать изменения после этой версии")
+    parser.add_argument("--compact", action="store_true", help="сжать журнал")
+    parser.add_argument("--max-age-days", type=float, default=30,
+                        help="при --compact удалить записи старше стольких дней (0 — все; по умолчанию 30)")
+    parser.add_argument("--keep-history", action="store_true",
+                        help="при --compact только схлопнуть повторы, старые записи не удалять")
+    parser.add_argument("--profile", action="store_true", help="сводка по SQL-запросам при выходе (query_profile)")
+    args = parser.parse_args(argv)
+    if args.profile:
+        query_profile.enable()
+
+    if args.compact:
+        result = compact_changes(None if args.keep_history else args.max_age_days)
+        print(f"Схлопнуто повторов: {result['coalesced']}, удалено старых записей: {result['expired']}; "
+              f"клиентам с версией до {result['floor']} нужна полная выгрузка")
+    if args.since is not None:
+        delta = changes_since(args.since, columns="idminiapp, title")
+        if delta["full"]:
+            print(f"Журнал после версии {args.since} сжат: полная выгрузка, {len(delta['upserts'])} строк")
+        else:
+            for idminiapp, title in delta["upserts"]:
+                print(f"  + {idminiapp}: {title}")
+            for idminiapp in delta["deletes"]:
+                print(f"  - {idminiapp}")
+            print(f"Изменено {len(delta['upserts'])}, удалено {len(delta['deletes'])}")
+    with dbpool.connection(DB_NAME) as conn:
+        entries = conn.execute("SELECT COUNT(*) FROM channel_changes").fetchone()[0]
+    print(f"Версия каталога: {catalogue_version()}, записей в журнале: {entries}")
+
+
+if __name__ == "__main__":
+    main()
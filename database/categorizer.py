@@ -0,0 +1,159 @@
+"""
+Классификатор категорий по декларативным правилам (category_rules.json).
+
+Все ключевые слова всех правил собираются в один автомат Ахо–Корасик, регулярные выражения — в одно
+объединённое выражение на группу правил с одинаковыми условиями (fields, ids, when_category), поэтому
+каждая строка проверяется одним проходом по тексту на группу, сколько бы правил в ней ни было.
+Побеждает сработавшее правило с наибольшим priority.
+"""
+
+import json
+import os
+import re
+from collections import deque
+from typing import Dict, List, Optional
+
+RULES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "category_rules.json")
+DEFAULT_FIELDS = ("title", "description", "short_description")
+
+
+class AhoCorasick:
+    """Автомат Ахо–Корасик: находит все вхождения всех ключевых слов за один проход по тексту."""
+
+    __slots__ = ("_goto", "_fail", "_out")
+
+    def __init__(self, patterns: Dict[str, set]):
+        """patterns — {ключевое слово: множество меток}."""
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [set()]
+        for word, labels in patterns.items():
+            state = 0
+            for ch in word:
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(set())
+                state = nxt
+            self._out[state] |= labels
+        # Ссылки неудач строятся обходом в ширину; у детей корня ссылка — на корень
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                f = self._fail[state]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                self._fail[nxt] = self._goto[f].get(ch, 0)
+                self._out[nxt] |= self._out[self._fail[nxt]]
+
+    def labels(self, text: str) -> set:
+        """Метки всех ключевых слов, встретившихся в text."""
+        found = set()
+        state = 0
+        goto, fail, out = self._goto, self._fail, self._out
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                found |= out[state]
+        return found
+
+
+class Rule:
+    __slots__ = ("index", "name", "category", "priority", "fields", "ids", "when_category", "matches_all", "group")
+
+    def __init__(self, index: int, spec: dict):
+        self.index = index
+        self.name = spec.get("name", f"rule-{index}")
+        self.category = spec["category"]
+        self.priority = spec.get("priority", 0)
+        self.fields = tuple(spec.get("fields", DEFAULT_FIELDS))
+        self.ids = set(spec["ids"]) if "ids" in spec else None
+        self.when_category = set(spec["when_category"]) if "when_category" in spec else None
+        self.matches_all = not spec.get("keywords") and not spec.get("regexes")
+        # Правила одной группы проходят или не проходят проверки ids/when_category вместе
+        self.group = (
+            self.fields,
+            frozenset(self.ids) if self.ids is not None else None,
+            frozenset(self.when_category) if self.when_category is not None else None,
+        )
+
+
+class Categorizer:
+    """Скомпилированный набор правил."""
+
+    def __init__(self, specs: List[dict]):
+        self.rules = [Rule(i, spec) for i, spec in enumerate(specs)]
+        self.fields = sorted({f for r in self.rules for f in r.fields})
+        # Метка совпадения — номер правила
+        keywords: Dict[str, set] = {}
+        regex_parts: Dict[tuple, list] = {}
+        for rule, spec in zip(self.rules, specs):
+            for word in spec.get("keywords", ()):
+                keywords.setdefault(word.casefold(), set()).add(rule.index)
+            for pattern in spec.get("regexes", ()):
+                regex_parts.setdefault(rule.group, []).append((rule.priority, rule.index, pattern))
+        self._automaton = AhoCorasick(keywords) if keywords else None
+        # Альтернативы по убыванию priority внутри lookahead: на каждой позиции засчитывается
+        # только первая (самая приоритетная) сработавшая. Поэтому выражение — своё для каждой группы:
+        # у правил группы одни и те же проверки, и более приоритетная альтернатива не скроет правило,
+        # которое прошло бы проверки вместо неё. Именованные группы в самих regexes не используйте.
+        self._regexes = {}
+        for group, parts in regex_parts.items():
+            parts.sort(key=lambda p: -p[0])
+            regex = re.compile(
+                "(?=" + "|".join(f"(?P<g{i}>{pattern})" for i, (_, _, pattern) in enumerate(parts)) + ")",
+                re.IGNORECASE,
+            )
+            self._regexes[group] = (regex, [index for _, index, _ in parts])
+
+    def _regex_matched(self, group: tuple, text: str) -> set:
+        regex, labels = self._regexes[group]
+        return {labels[int(m.lastgroup[1:])] for m in regex.finditer(text)}
+
+    def classify(self, row: dict) -> Optional[str]:
+        """Категория по правилам для строки {idminiapp, category, title, description, ...} или None."""
+        rule = self.match(row)
+        return rule.category if rule else None
+
+    def match(self, row: dict) -> Optional[Rule]:
+        """Сработавшее правило с наибольшим priority или None."""
+        texts, keyword_hits, regex_hits = {}, {}, {}
+        best = None
+        for rule in self.rules:
+            if rule.ids is not None and row.get("idminiapp") not in rule.ids:
+                continue
+            if rule.when_category is not None and row.get("category") not in rule.when_category:
+                continue
+            if best is not None and rule.priority <= best.priority:
+                continue
+            if not rule.matches_all:
+                fields = rule.fields
+                if fields not in texts:
+                    texts[fields] = " \n ".join((row.get(f) or "") for f in fields).casefold()
+                if self._automaton is not None and fields not in keyword_hits:
+                    keyword_hits[fields] = self._automaton.labels(texts[fields])
+                if rule.index not in keyword_hits.get(fields, ()):
+                    if rule.group not in self._regexes:
+                        continue
+                    if rule.group not in regex_hits:
+                        regex_hits[rule.group] = self._regex_matched(rule.group, texts[fields])
+                    if rule.index not in regex_hits[rule.group]:
+                        continue
+            best = rule
+        return best
+
+
+def load_rules(path: str = RULES_FILE) -> dict:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def compile_rules(path: str = RULES_FILE) -> Categorizer:
+    return Categorizer(load_rules(path)["rules"])
@@ -0,0 +1,94 @@
+"""
+Запись канала (строка channels) для скриптов обслуживания.
+
+Channel хранит поля в __slots__ (без __dict__ на каждую строку), а список скриншотов разбирает
+из screenshots_path только при первом обращении и запоминает. split_screenshots / join_screenshots —
+единственное место, где определён формат screenshots_path: имена файлов через ";", пробелы по краям
+и пустые элементы отбрасываются.
+
+Использование:
+    for ch in mainbd.iter_channel_records(columns="idminiapp, screenshots_path"):
+        if len(ch.screenshots) > 3:
+            ...
+"""
+
+from typing import Iterable, Optional, Sequence, Tuple
+
+SCREENSHOTS_SEPARATOR = ";"
+
+FIELDS = (
+    "idminiapp", "title", "description", "icon", "url", "is_verified", "rating",
+    "category", "screenshots_path", "short_description",
+)
+
+
+def split_screenshots(screenshots_path: Optional[str]) -> Tuple[str, ...]:
+    """screenshots_path -> кортеж имён файлов."""
+    if not screenshots_path:
+        return ()
+    return tuple(p for p in (s.strip() for s in screenshots_path.split(SCREENSHOTS_SEPARATOR)) if p)
+
+
+def join_screenshots(names: Iterable[str]) -> str:
+    """Имена файлов -> screenshots_path в каноническом виде."""
+    return SCREENSHOTS_SEPARATOR.join(p for p in (n.strip() for n in names) if p)
+
+
+class Channel:
+    """Строка channels. Незапрошенные столбцы — None."""
+
+    __slots__ = FIELDS[:8] + ("_screenshots_path", "short_description", "_screenshots")
+
+    def __init__(self, idminiapp: str, title: Optional[str] = None, description: Optional[str] = None,
+                 icon: Optional[str] = None, url: Optional[str] = None, is_verified: Optional[int] = None,
+                 rating: Optional[float] = None, category: Optional[str] = None,
+                 screenshots_path: Optional[str] = None, short_description: Optional[str] = None):
+        self.idminiapp = idminiapp
+        self.title = title
+        self.description = description
+        self.icon = icon
+        self.url = url
+        self.is_verified = is_verified
+        self.rating = rating
+        self.category = category
+        self.short_description = short_description
+        self.screenshots_path = screenshots_path
+
+    @classmethod
+    def from_row(cls, row: Sequence, columns: Sequence[str] = FIELDS[:9]) -> "Channel":
+        """Запись из кортежа SELECT; columns — имена столбцов в порядке row."""
+        return cls(**dict(zip(columns, row)))
+
+    @property
+    def screenshots_path(self) -> Optional[str]:
+        return self._screenshots_path
+
+    @screenshots_path.setter
+    def screenshots_path(self, value: Optional[str]) -> None:
+        self._screenshots_path = value
+        self._screenshots = None
+
+    @property
+    def screenshots(self) -> Tuple[str, ...]:
+        """Имена файлов скриншотов (разбираются один раз)."""
+        if self._screenshots is None:
+            self._screenshots = split_screenshots(self._screenshots_path)
+        return self._screenshots
+
+    @screenshots.setter
+    def screenshots(self, names: Iterable[str]) -> None:
+        self.screenshots_path = join_screenshots(names)
+
+    def as_tuple(self) -> tuple:
+        """9 столбцов в порядке mainbd.CHANNEL_COLUMNS (как get_channel)."""
+        return tuple(getattr(self, f) for f in FIELDS[:9])
+
+    def __eq__(self, other):
+        if not isinstance(other, Channel):
+            return NotImplemented
+        return self.as_tuple() == other.as_tuple() and self.short_description == other.short_description
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"Channel(idminiapp={self.idminiapp!r}, title={self.title!r})"
@@ -0,0 +1,197 @@
+"""
+Менеджер подключений к SQLite для mainbd и скриптов обслуживания.
+
+Вместо connect/PRAGMA/close на каждый вызов держим одно долгоживущее подключение
+на поток (и на процесс — после fork подключение открывается заново).
+Схема проверяется один раз на процесс: модули регистрируют проверки через register_schema().
+
+Использование:
+    with connection() as conn:        # чтение, без явной транзакции
+        conn.execute("SELECT ...")
+    with transaction() as conn:       # запись: BEGIN ... COMMIT / ROLLBACK при ошибке
+        conn.execute("UPDATE ...")
+
+Подключение общее — не закрывайте его и не меняйте row_factory.
+"""
+
+import atexit
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional
+
+
+# БД из репозитория; путь можно переопределить переменной окружения (например, для синтетических каталогов)
+TRACKED_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "telegram_channels.db")
+DB_NAME = os.environ.get("MAINBD_DB_PATH") or TRACKED_DB
+
+# Режим журнала — постоянное свойство файла. Закоммиченная БД деплоится как есть (и читается роутом
+# /api/channels), поэтому её режим по умолчанию не трогаем; остальные БД переводим в WAL.
+# MAINBD_JOURNAL_MODE=WAL|DELETE|... задаёт режим для всех БД явно.
+JOURNAL_MODE = os.environ.get("MAINBD_JOURNAL_MODE")
+
+PRAGMAS = (
+    ("synchronous", "NORMAL"),
+    ("mmap_size", 256 * 1024 * 1024),
+    ("cache_size", -64 * 1024),  # отрицательное значение — в КиБ, т.е. 64 МиБ
+    ("temp_store", "MEMORY"),
+    ("busy_timeout", 5000),
+)
+
+_local = threading.local()
+_lock = threading.Lock()
+_all_connections: list = []
+_schema_hooks: list = []
+_schema_applied: dict = {}
+_generation = 0
+# Класс подключений: query_profile.enable() подменяет его на профилирующий
+_connection_factory = sqlite3.Connection
+
+
+def register_schema(hook: Callable[[sqlite3.Connection], None], db_path: Optional[str] = None) -> None:
+    """
+    Регистрирует проверку схемы hook(conn). Выполняется один раз на процесс для каждой БД,
+    при первом получении подключения (или при следующем, если зарегистрирована позже).
+    db_path — БД, для которой выполнять hook (вспомогательные базы вроде кэшей); без него — основная DB_NAME.
+    Другие файлы без своих хуков открываются как есть: схема каталога в них не создаётся.
+    """
+    entry = (hook, _resolve(db_path))
+    with _lock:
+        if entry not in _schema_hooks:
+            _schema_hooks.append(entry)
+
+
+def _hooks_for(path: str) -> list:
+    """Записи (hook, db_path) из _schema_hooks, которые относятся к БД path."""
+    return [entry for entry in _schema_hooks if entry[1] == path]
+
+
+def _resolve(db_path: Optional[str]) -> str:
+    return os.path.abspath(db_path or DB_NAME)
+
+
+def connect(db_path: Optional[str] = None) -> sqlite3.Connection:
+    """
+    Открывает новое (не общее) подключение с настроенными PRAGMA.
+    Закрывать его должен вызывающий код.
+    """
+    path = _resolve(db_path)
+    conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False, factory=_connection_factory)
+    journal_mode = JOURNAL_MODE or (None if path == TRACKED_DB else "WAL")
+    if journal_mode:
+        try:
+            conn.execute(f"PRAGMA journal_mode={journal_mode}")
+        except sqlite3.OperationalError:
+            # read-only файл или каталог — остаёмся в текущем режиме журнала
+            pass
+    for name, value in PRAGMAS:
+        conn.execute(f"PRAGMA {name}={value}")
+    return conn
+
+
+def _apply_schema(conn: sqlite3.Connection, path: str) -> None:
+    # Учитываем записи (hook, db_path), а не функции: один hook может быть зарегистрирован для нескольких БД
+    applied = _schema_applied.setdefault(path, set())
+    if len(applied) == len(_schema_hooks):
+        return
+    with _lock:
+        entries = _hooks_for(path)
+        # записи, которые к этой БД не относятся, тоже помечаем — чтобы не проверять их снова
+        applied.update(entry for entry in _schema_hooks if entry not in entries)
+        for entry in entries:
+            if entry in applied:
+                continue
+            conn.execute("BEGIN")
+            try:
+                entry[0](conn)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            applied.add(entry)
+
+
+def get_connection(db_path: Optional[str] = None) -> sqlite3.Connection:
+    """
+    Возвращает долгоживущее подключение текущего потока к db_path (по умолчанию DB_NAME).
+    Подключение работает в autocommit; для нескольких записей используйте transaction().
+    """
+    path = _resolve(db_path)
+    pid = os.getpid()
+    conns = getattr(_local, "conns", None)
+    if conns is None or getattr(_local, "pid", None) != pid or _local.generation != _generation:
+        # новый поток, дочерний процесс после fork или после close_all — открываем заново
+        conns = _local.conns = {}
+        _local.pid = pid
+        _local.generation = _generation
+        _local.depth = {}
+    conn = conns.get(path)
+    if conn is None:
+        conn = connect(path)
+        conns[path] = conn
+        with _lock:
+            _all_connections.append(conn)
+    _apply_schema(conn, path)
+    return conn
+
+
+@contextmanager
+def connection(db_path: Optional[str] = None) -> Iterator[sqlite3.Connection]:
+    """Контекстный менеджер: общее подключение потока без явной транзакции."""
+    yield get_connection(db_path)
+
+
+@contextmanager
+def transaction(db_path: Optional[str] = None, immediate: bool = False) -> Iterator[sqlite3.Connection]:
+    """
+    Контекстный менеджер транзакции: BEGIN при входе, COMMIT при выходе, ROLLBACK при исключении.
+    Вложенные вызовы присоединяются к внешней транзакции.
+    immediate — сразу взять блокировку записи (BEGIN IMMEDIATE): для транзакций, которые сначала читают,
+    а потом пишут по прочитанному, — иначе чужой коммит между ними даст SQLITE_BUSY вместо ожидания.
+    """
+    conn = get_connection(db_path)
+    path = _resolve(db_path)
+    depth = _local.depth.get(path, 0)
+    if depth == 0:
+        conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+    _local.depth[path] = depth + 1
+    try:
+        yield conn
+    except BaseException:
+        _local.depth[path] = depth
+        if depth == 0 and conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    _local.depth[path] = depth
+    if depth == 0:
+        conn.execute("COMMIT")
+
+
+def close_all() -> None:
+    """Закрывает все общие подключения (вызывается автоматически при выходе)."""
+    global _generation
+    with _lock:
+        _generation += 1
+        for conn in _all_connections:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        _all_connections.clear()
+        _schema_applied.clear()
+
+
+def set_connection_factory(factory) -> None:
+    """Класс для новых подключений (подкласс sqlite3.Connection); открытые общие подключения закрываются."""
+    global _connection_factory
+    _connection_factory = factory
+    close_all()
+
+
+atexit.register(close_all)
+
+# MAINBD_PROFILE=1 — профилировать все запросы процесса (см. query_profile.py)
+if os.environ.get("MAINBD_PROFILE"):
+    import query_profile
+    query_profile.enable()
@@ -1,47 +1,121 @@
 #!/usr/bin/env python3
 """
 Удаляет дубликаты скриншотов в БД и оставляет не более 3 скринов на одно приложение.
-Запуск: из папки database: python3 dedupe_screenshots.py
+Это шаг screenshots конвейера pipeline.py.
+Запуск: из папки database: python3 dedupe_screenshots.py [--dry-run]
+
+Режим --near: ищет почти-дубликаты по перцептивному хэшу (пережатые/уменьшенные копии одного экрана,
+в том числе у разных приложений), заменяет ссылки на лучшую по разрешению копию и печатает найденные кластеры.
+    python3 dedupe_screenshots.py --near [--threshold 6] [--dry-run] [--workers N]
+Для --near требуется: pip install Pillow numpy
 """
 
-from mainbd import get_connection, update_channel
+import argparse
+import os
+
+import query_profile
+from channel import join_screenshots, split_screenshots
+from mainbd import ICONS_FOLDER, bulk_update_channels, iter_channel_records
+from pipeline import Stage, run
 
 MAX_SCREENSHOTS_PER_APP = 3
 
 
-def normalize_screenshots_path(screenshots_path: str) -> str:
+def normalize_screenshots(names) -> str:
     """Убирает дубликаты, оставляет только первые MAX_SCREENSHOTS_PER_APP, порядок сохраняется."""
-    if not screenshots_path or not screenshots_path.strip():
-        return ""
-    parts = [p.strip() for p in screenshots_path.split(";") if p.strip()]
-    seen = set()
-    unique = []
-    for p in parts:
-        if p not in seen:
-            seen.add(p)
-            unique.append(p)
-        if len(unique) >= MAX_SCREENSHOTS_PER_APP:
-            break
-    return ";".join(unique)
-
-
-def main():
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("SELECT idminiapp, screenshots_path FROM channels WHERE screenshots_path IS NOT NULL AND screenshots_path != ''")
-    rows = cur.fetchall()
-    conn.close()
-
-    updated = 0
-    for idminiapp, old_path in rows:
-        new_path = normalize_screenshots_path(old_path or "")
-        if new_path != (old_path or "").strip():
-            if update_channel(idminiapp, screenshots_path=new_path):
-                updated += 1
-                print(f"{idminiapp}: было {len((old_path or '').split(';'))} скринов → стало {len(new_path.split(';'))}")
+    return join_screenshots(list(dict.fromkeys(names))[:MAX_SCREENSHOTS_PER_APP])
+
+
+def normalize_screenshots_path(screenshots_path: str) -> str:
+    return normalize_screenshots(split_screenshots(screenshots_path))
+
+
+class ScreenshotsStage(Stage):
+    """Шаг конвейера: без повторов и не больше MAX_SCREENSHOTS_PER_APP скриншотов у приложения."""
+
+    name = "screenshots"
+    columns = ("screenshots_path",)
+
+    def apply(self, row: dict):
+        path = (row["screenshots_path"] or "").strip()
+        if path:
+            new_path = normalize_screenshots_path(path)
+            if new_path != path:
+                row["screenshots_path"] = new_path
+
+
+def make_stage(args=None) -> ScreenshotsStage:
+    return ScreenshotsStage()
 
+
+def _load_records() -> list:
+    """Приложения со скриншотами (только idminiapp и screenshots_path)."""
+    return [ch for ch in iter_channel_records(columns="idminiapp, screenshots_path") if ch.screenshots]
+
+
+def dedupe_near(threshold: int, dry_run: bool = False, workers: int = None):
+    """
+    Почти-дубликаты: группы по dHash среди всех WebP в ICONS_FOLDER, ссылки — на лучшую копию группы.
+    Логотипы (иконки приложений и файлы *_logo) со скриншотами не объединяются.
+    """
+    import image_hash
+
+    names = sorted(n for n in os.listdir(ICONS_FOLDER) if n.lower().endswith(".webp"))
+    icons = {ch.icon for ch in iter_channel_records(columns="idminiapp, icon") if ch.icon}
+    kinds = {
+        name: "logo" if name in icons or os.path.splitext(name)[0].lower().endswith("_logo") else "screenshot"
+        for name in names
+    }
+    hashes = image_hash.get_hashes(names, workers=workers)
+    clusters = image_hash.find_clusters(hashes, threshold, kinds=kinds)
+    best = {name: cluster[0] for cluster in clusters if kinds[cluster[0]] == "screenshot" for name in cluster}
+
+    records = _load_records()
+    used_by = {}
+    for ch in records:
+        for name in ch.screenshots:
+            used_by.setdefault(name, set()).add(ch.idminiapp)
+
+    print(f"Файлов: {len(names)}, кластеров почти-дубликатов: {len(clusters)} (порог {threshold})")
+    for cluster in clusters:
+        keep = hashes[cluster[0]]
+        apps = sorted(set().union(*(used_by.get(n, set()) for n in cluster)))
+        print(f"\n  оставить {cluster[0]} ({keep['width']}x{keep['height']}), приложения: {', '.join(apps) or '—'}")
+        for name in cluster[1:]:
+            m = hashes[name]
+            dist = image_hash.hamming(m["dhash"], keep["dhash"])
+            print(f"    ~ {name} ({m['width']}x{m['height']}, расстояние {dist})")
+
+    changes = []
+    for ch in records:
+        new_path = normalize_screenshots(best.get(p, p) for p in ch.screenshots)
+        if new_path != ch.screenshots_path.strip():
+            changes.append({"idminiapp": ch.idminiapp, "screenshots_path": new_path})
+
+    if dry_run:
+        print(f"\n--dry-run: записей к обновлению: {len(changes)}")
+        return
+    updated = sum(1 for _, affected in bulk_update_channels(changes) if affected)
     print(f"\nОбновлено записей: {updated}")
 
 
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Удаляет дубликаты скриншотов в screenshots_path.")
+    parser.add_argument("--near", action="store_true", help="искать почти-дубликаты по перцептивному хэшу")
+    parser.add_argument("--threshold", type=int, default=6, help="макс. расстояние Хэмминга dHash для --near")
+    parser.add_argument("--dry-run", action="store_true", help="только отчёт, без записи в БД")
+    parser.add_argument("--workers", type=int, default=None, help="процессов для хэширования (--near)")
+    parser.add_argument("--profile", action="store_true", help="сводка по SQL-запросам при выходе (query_profile)")
+    args = parser.parse_args(argv)
+    if args.profile:
+        query_profile.enable()
+
+    if args.near:
+        dedupe_near(args.threshold, dry_run=args.dry_run, workers=args.workers)
+        return
+
+    run([ScreenshotsStage()], dry_run=args.dry_run, show_diff=True)
+
+
 if __name__ == "__main__":
     main()
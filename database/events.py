@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+"""
+События использования приложений (открытие, добавление в «Мои приложения») и рейтинг популярности.
+
+События копятся в памяти (EventBuffer) и пишутся в events.db пачками: одна транзакция на FLUSH_EVENTS
+событий или раз в FLUSH_SECONDS, а не коммит на каждый клик. Таблица events — журнал только на добавление.
+rollup() переносит новые события в счётчики event_counts (по часам и по дням для каждого idminiapp)
+и пересчитывает затухающий балл trending: вес события (KIND_WEIGHTS) уменьшается вдвое за
+TRENDING_HALF_LIFE. Балл записывается в channels.trending одним пакетом (mainbd.set_trending_scores),
+по нему сортирует mainbd.get_channels_page(order_by="trending").
+
+Использование:
+    with EventBuffer() as buffer:
+        buffer.record("24", "open")
+    record_event("24", "install")    # общий буфер процесса, сбрасывается при выходе
+
+Запуск: из папки database:
+    python3 events.py rollup [--no-write]                        # свернуть новые события, обновить channels.trending
+    python3 events.py top [-n 20]                                # самые популярные сейчас
+    python3 events.py simulate [--events 200000] [--threads 4]   # синтетическая нагрузка во временную БД
+"""
+import argparse
+import atexit
+import math
+import os
+import random
+import tempfile
+import threading
+import time
+from typing import Iterator, Optional
+
+import dbpool
+import query_profile
+from mainbd import get_all_channels, set_trending_scores
+
+EVENTS_DB = os.environ.get("MAINBD_EVENTS_PATH") or os.path.join(os.path.dirname(__file__), "events.db")
+
+# Вес события в балле trending
+KIND_WEIGHTS = {"open": 1.0, "install": 5.0}
+PERIODS = {"hour": 3600, "day": 86400}
+FLUSH_EVENTS = 1000
+FLUSH_SECONDS = 1.0
+TRENDING_HALF_LIFE = 24 * 3600
+# Баллы меньше этого считаются нулём и удаляются
+TRENDING_MIN = 0.01
+# Сколько хранить сырые события и почасовые счётчики (дневные — всегда)
+RAW_RETENTION = 7 * 86400
+HOURLY_RETENTION = 14 * 86400
+
+STATE_ROLLED_UP = "rolled_up_id"
+STATE_TRENDING_AT = "trending_at"
+
+
+def _ensure_schema(conn):
+    # AUTOINCREMENT: без него SQLite после очистки таблицы снова выдаёт id с 1, и новые события
+    # с id не больше отметки rolled_up_id свёртка бы пропускала
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            idminiapp TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            ts REAL NOT NULL
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS event_counts (
+            idminiapp TEXT NOT NULL,
+            period TEXT NOT NULL,
+            start INTEGER NOT NULL,
+            kind TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (idminiapp, period, start, kind)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_event_counts_period_start ON event_counts(period, start)")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS trending (
+            idminiapp TEXT PRIMARY KEY,
+            score REAL NOT NULL
+        ) WITHOUT ROWID
+    """)
+    conn.execute("CREATE TABLE IF NOT EXISTS events_state (key TEXT PRIMARY KEY, value TEXT)")
+
+
+dbpool.register_schema(_ensure_schema, EVENTS_DB)
+
+
+def _get_state(conn, key: str, default: float = 0) -> float:
+    row = conn.execute("SELECT value FROM events_state WHERE key = ?", (key,)).fetchone()
+    return float(row[0]) if row else default
+
+
+def _set_state(conn, key: str, value) -> None:
+    conn.execute("INSERT OR REPLACE INTO events_state (key, value) VALUES (?, ?)", (key, str(value)))
+
+
+class EventBuffer:
+    """
+    Буфер событий: record() только добавляет в список (потокобезопасно), запись — пачками через executemany
+    в одной транзакции. Пачка пишется, когда набралось max_events событий (в потоке, который её заполнил)
+    или прошло max_delay секунд (фоновый поток; None — без него). close() пишет остаток.
+    Если запись не удалась, пачка возвращается в буфер и уйдёт со следующей.
+    """
+
+    def __init__(self, db_path: str = EVENTS_DB, max_events: int = FLUSH_EVENTS,
+                 max_delay: Optional[float] = FLUSH_SECONDS):
+        self.db_path = db_path
+        self.max_events = max_events
+        self.flushed = 0
+        self.flushes = 0
+        self._pending = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        if max_delay:
+            self._thread = threading.Thread(target=self._run, args=(max_delay,), daemon=True)
+            self._thread.start()
+        atexit.register(self.close)
+
+    def record(self, idminiapp: str, kind: str = "open", ts: Optional[float] = None) -> None:
+        if kind not in KIND_WEIGHTS:
+            raise ValueError(f"Неизвестный тип события: {kind}")
+        with self._lock:
+            self._pending.append((idminiapp, kind, time.time() if ts is None else ts))
+            full = len(self._pending) >= self.max_events
+        if full:
+            self.flush()
+
+    def flush(self) -> int:
+        """Пишет накопленные события одной транзакцией. Возвращает их число."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return 0
+            try:
+                with dbpool.transaction(self.db_path) as conn:
+                    conn.executemany("INSERT INTO events (idminiapp, kind, ts) VALUES (?, ?, ?)", batch)
+            except Exception:
+                with self._lock:
+                    self._pending[:0] = batch
+                raise
+            self.flushed += len(batch)
+            self.flushes += 1
+            return len(batch)
+
+    def _run(self, max_delay: float) -> None:
+        while not self._stop.wait(max_delay):
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"⚠️  Запись событий: {e}")
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self.flush()
+        atexit.unregister(self.close)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+_default_buffer = None
+_default_lock = threading.Lock()
+
+
+def record_event(idminiapp: str, kind: str = "open", ts: Optional[float] = None) -> None:
+    """Записывает событие через общий буфер процесса (создаётся при первом вызове)."""
+    global _default_buffer
+    if _default_buffer is None:
+        with _default_lock:
+            if _default_buffer is None:
+                _default_buffer = EventBuffer()
+    _default_buffer.record(idminiapp, kind, ts)
+
+
+def _decay(seconds: float) -> float:
+    return 0.5 ** (max(seconds, 0) / TRENDING_HALF_LIFE)
+
+
+def rollup(now: Optional[float] = None, db_path: str = EVENTS_DB) -> dict:
+    """
+    Сворачивает события, записанные после прошлого запуска, в event_counts и trending; удаляет сырые
+    события старше RAW_RETENTION и почасовые счётчики старше HOURLY_RETENTION. Всё — одной транзакцией.
+    Балл trending на момент now: сумма весов событий, каждый уменьшен в 2 раза за TRENDING_HALF_LIFE
+    с середины своего часа. Возвращает {"events", "apps", "pruned"}.
+    """
+    now = time.time() if now is None else now
+    # IMMEDIATE: между чтением MAX(id) и записью счётчиков никто не должен вставить события
+    with dbpool.transaction(db_path, immediate=True) as conn:
+        last_id = int(_get_state(conn, STATE_ROLLED_UP))
+        max_id = conn.execute("SELECT IFNULL(MAX(id), 0) FROM events").fetchone()[0]
+        trending_at = _get_state(conn, STATE_TRENDING_AT, now)
+        now = max(now, trending_at)
+
+        for period, seconds in PERIODS.items():
+            # WHERE обязателен: без него SQLite принимает ON CONFLICT за часть JOIN
+            conn.execute(f"""
+                INSERT INTO event_counts (idminiapp, period, start, kind, count)
+                SELECT idminiapp, '{period}', CAST(ts / {seconds} AS INTEGER) * {seconds} AS bucket, kind, COUNT(*)
+                FROM events WHERE id > ? AND id <= ? GROUP BY idminiapp, bucket, kind
+                ON CONFLICT(idminiapp, period, start, kind) DO UPDATE SET count = count + excluded.count
+            """, (last_id, max_id))
+
+        # Старые баллы затухают одним множителем, новые события добавляются к ним
+        conn.execute("UPDATE trending SET score = score * ?", (_decay(now - trending_at),))
+        hour = PERIODS["hour"]
+        added = {}
+        events = 0
+        for idminiapp, kind, bucket, count in conn.execute(f"""
+            SELECT idminiapp, kind, CAST(ts / {hour} AS INTEGER) * {hour} AS bucket, COUNT(*)
+            FROM events WHERE id > ? AND id <= ? GROUP BY idminiapp, kind, bucket
+        """, (last_id, max_id)):
+            added[idminiapp] = added.get(idminiapp, 0) + KIND_WEIGHTS.get(kind, 0) * count * _decay(
+                now - min(bucket + hour / 2, now))
+            events += count
+        conn.executemany(
+            "INSERT INTO trending (idminiapp, score) VALUES (?, ?) "
+            "ON CONFLICT(idminiapp) DO UPDATE SET score = score + excluded.score",
+            added.items(),
+        )
+        conn.execute("DELETE FROM trending WHERE score < ?", (TRENDING_MIN,))
+
+        pruned = conn.execute("DELETE FROM events WHERE id <= ? AND ts < ?", (max_id, now - RAW_RETENTION)).rowcount
+        conn.execute("DELETE FROM event_counts WHERE period = 'hour' AND start < ?", (now - HOURLY_RETENTION,))
+        _set_state(conn, STATE_ROLLED_UP, max_id)
+        _set_state(conn, STATE_TRENDING_AT, now)
+    return {"events": events, "apps": len(added), "pruned": pruned}
+
+
+def get_trending(limit: Optional[int] = None, db_path: str = EVENTS_DB) -> list:
+    """[(idminiapp, балл), ...] по убыванию балла на момент последнего rollup()."""
+    with dbpool.connection(db_path) as conn:
+        return conn.execute("SELECT idminiapp, score FROM trending ORDER BY score DESC, idminiapp LIMIT ?",
+                            (-1 if limit is None else limit,)).fetchall()
+
+
+def get_event_counts(idminiapp: str, period: str = "day", since: Optional[float] = None,
+                     db_path: str = EVENTS_DB) -> list:
+    """[(начало периода, тип, число), ...] свёрнутых событий приложения по возрастанию времени."""
+    if period not in PERIODS:
+        raise ValueError(f"Неизвестный период: {period}")
+    with dbpool.connection(db_path) as conn:
+        return conn.execute(
+            "SELECT start, kind, count FROM event_counts WHERE idminiapp = ? AND period = ? AND start >= ? "
+            "ORDER BY start, kind", (idminiapp, period, since or 0)
+        ).fetchall()
+
+
+def write_trending(db_path: str = EVENTS_DB) -> int:
+    """Переносит баллы в channels.trending одной транзакцией. Возвращает число изменённых строк."""
+    return set_trending_scores({idminiapp: round(score, 4) for idminiapp, score in get_trending(db_path=db_path)})
+
+
+def synthetic_events(ids: list, count: int, start: float, span: float, seed: int = 1,
+                     install_share: float = 0.1) -> Iterator[tuple]:
+    """
+    Синтетические события (idminiapp, тип, ts) для нагрузочной проверки: популярность приложений
+    по закону Ципфа (немногие приложения собирают большую часть открытий), время равномерно растёт от start
+    до start + span.
+    """
+    rng = random.Random(seed)
+    order = list(ids)
+    rng.shuffle(order)
+    cum_weights, total = [], 0.0
+    for rank in range(len(order)):
+        total += 1 / (rank + 1) ** 1.1
+        cum_weights.append(total)
+    step = span / max(count, 1)
+    batch = 10000
+    for offset in range(0, count, batch):
+        n = min(batch, count - offset)
+        for i, idminiapp in enumerate(rng.choices(order, cum_weights=cum_weights, k=n), offset):
+            kind = "install" if rng.random() < install_share else "open"
+            yield idminiapp, kind, start + i * step
+
+
+def simulate(count: int, threads: int = 1, max_events: int = FLUSH_EVENTS, span: float = 86400,
+             db_path: Optional[str] = None) -> dict:
+    """
+    Пишет count синтетических событий из threads потоков через один буфер. Возвращает скорость записи.
+    db_path — БД для событий; по умолчанию временная, удаляется после прогона. EVENTS_DB не принимается:
+    синтетические события попали бы в trending и channels.trending.
+    """
+    if db_path is None:
+        with tempfile.TemporaryDirectory() as tmp:
+            return simulate(count, threads, max_events, span, os.path.join(tmp, "events.db"))
+    if os.path.abspath(db_path) == os.path.abspath(EVENTS_DB):
+        raise ValueError(f"simulate не пишет в рабочую {EVENTS_DB}: укажите другую БД")
+    dbpool.register_schema(_ensure_schema, db_path)
+    ids = [row[0] for row in get_all_channels("idminiapp")]
+    if not ids:
+        raise ValueError("Каталог пуст — не для кого генерировать события")
+    per_thread = math.ceil(count / threads)
+    buffer = EventBuffer(db_path, max_events=max_events)
+
+    def worker(n: int, seed: int) -> None:
+        for idminiapp, kind, ts in synthetic_events(ids, n, time.time() - span, span, seed):
+            buffer.record(idminiapp, kind, ts)
+
+    started = time.perf_counter()
+    pool = [threading.Thread(target=worker, args=(min(per_thread, count - i * per_thread), i + 1))
+            for i in range(threads) if count > i * per_thread]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    buffer.close()
+    seconds = time.perf_counter() - started
+    return {"events": buffer.flushed, "flushes": buffer.flushes, "seconds": seconds,
+            "per_second": buffer.flushed / seconds if seconds else 0.0}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="События использования приложений и рейтинг популярности.")
+    parser.add_argument("--profile", action="store_true", help="сводка по SQL-запросам при выходе (query_profile)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    rollup_parser = commands.add_parser("rollup", help="свернуть новые события и обновить channels.trending")
+    rollup_parser.add_argument("--no-write", action="store_true", help="не переносить баллы в channels.trending")
+    top_parser = commands.add_parser("top", help="самые популярные приложения сейчас")
+    top_parser.add_argument("-n", type=int, default=20)
+    simulate_parser = commands.add_parser("simulate", help="записать синтетические события и замерить скорость")
+    simulate_parser.add_argument("--events", type=int, default=200000)
+    simulate_parser.add_argument("--threads", type=int, default=4)
+    simulate_parser.add_argument("--batch", type=int, default=FLUSH_EVENTS, help="событий в пачке записи")
+    simulate_parser.add_argument("--span-hours", type=float, default=24, help="за какой срок до «сейчас» события")
+    simulate_parser.add_argument("--db", help="БД для событий (по умолчанию временная; рабочая events.db — нельзя)")
+    args = parser.parse_args(argv)
+    if args.profile:
+        query_profile.enable()
+
+    if args.command == "rollup":
+        started = time.perf_counter()
+        stats = rollup()
+        print(f"Свёрнуто событий: {stats['events']} ({stats['apps']} приложений), "
+              f"удалено старых: {stats['pruned']}, {time.perf_counter() - started:.2f} с")
+        if not args.no_write:
+            print(f"Обновлено channels.trending: {write_trending()}")
+    elif args.command == "top":
+        for idminiapp, score in get_trending(args.n):
+            print(f"  {score:10.2f}  {idminiapp}")
+    else:
+        try:
+            stats = simulate(args.events, args.threads, args.batch, args.span_hours * 3600, args.db)
+        except ValueError as e:
+            parser.error(str(e))
+        print(f"Записано событий: {stats['events']} за {stats['seconds']:.2f} с "
+              f"({stats['per_second']:.0f}/с, пачек: {stats['flushes']})")
+
+
+if __name__ == "__main__":
+    main()
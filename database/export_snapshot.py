@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Выгружает каталог в готовый снимок для /api/channels: API отдаёт файлы как есть, не открывая SQLite.
+
+В папку snapshot/ пишутся:
+- <хэш>.json (+ .json.gz, + .json.br при установленном brotli) — весь каталог в формате ответа API,
+  с уже собранными ссылками на иконки и скриншоты и на их уменьшенные копии (optimize_assets.py);
+- такие же файлы по каждой категории;
+- manifest.json — версия формата, ETag каждого файла, ASSETS_BASE и sha256 файла БД, по которому
+  API понимает, что снимок устарел (тогда он снова читает SQLite), и версия каталога
+  (catalogue_changes.catalogue_version) — с неё клиент продолжает синхронизацию через changes_since.
+Имена файлов — хэш содержимого, поэтому новая выгрузка не мешает уже идущим запросам;
+файлы, на которые не ссылаются два последних манифеста, удаляются.
+
+Запуск: из папки database: python3 export_snapshot.py [--out snapshot] [--no-brotli]
+ASSETS_BASE_URL / BLOB_STORE_URL / ASSET_VARIANTS_BASE_URL — как у API; перевыгрузите снимок после их смены,
+после правок БД и после optimize_assets.py.
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import time
+from urllib.parse import quote
+
+import dbpool
+import query_profile
+from channel import Channel
+from asset_variants import get_asset_variants
+from catalogue_changes import catalogue_version
+from mainbd import CHANNEL_COLUMNS, DB_NAME, iter_channel_records
+
+try:
+    import brotli
+except ImportError:  # pip install brotli — без него выгружаются только .json и .json.gz
+    brotli = None
+
+SNAPSHOT_FORMAT = 2
+SNAPSHOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "snapshot")
+DEFAULT_ASSETS_BASE = "https://raw.githubusercontent.com/rsn771/telegram-minimarket/main/database/logo%26screens/"
+DEFAULT_ICON = "https://api.dicebear.com/7.x/shapes/svg?seed=default"
+# Подпапка копий в Blob — как VARIANTS_PREFIX в asset_manifest.py
+VARIANTS_PREFIX = "variants/"
+
+
+def assets_base() -> str:
+    """Тот же порядок, что в src/app/api/channels/route.ts."""
+    for var in ("ASSETS_BASE_URL", "BLOB_STORE_URL"):
+        if var in os.environ:
+            return os.environ[var]
+    return DEFAULT_ASSETS_BASE
+
+
+def variants_base():
+    """
+    Откуда отдаются уменьшенные копии (тот же порядок, что в route.ts): ASSET_VARIANTS_BASE_URL;
+    иначе подпапка variants/ в Blob (её заполняет upload-assets-to-blob.mjs) или /api/static, если
+    картинки отдаются локально. None — копий по этому адресу нет (asset_variants/ не коммитится, поэтому
+    на GitHub raw их нет) — тогда в ответе только оригиналы.
+    """
+    if "ASSET_VARIANTS_BASE_URL" in os.environ:
+        return os.environ["ASSET_VARIANTS_BASE_URL"]
+    base = assets_base()
+    if not base:
+        return ""
+    if "ASSETS_BASE_URL" not in os.environ and "BLOB_STORE_URL" in os.environ:
+        return base + VARIANTS_PREFIX
+    return None
+
+
+def _asset_url(name: str, base: str) -> str:
+    # quote с таким safe совпадает с encodeURIComponent
+    encoded = quote(name, safe="-_.!~*'()")
+    return base + encoded if base else f"/api/static?file={encoded}"
+
+
+def icon_url(icon, base: str) -> str:
+    if not icon:
+        return DEFAULT_ICON
+    if icon.startswith(("http://", "https://")):
+        return icon
+    return _asset_url(icon, base)
+
+
+def _variant_url(file: str, base: str) -> str:
+    encoded = quote(file, safe="-_.!~*'()")
+    return base + encoded if base else f"/api/static?variant={encoded}"
+
+
+def variant_urls(name, variants: dict, base) -> dict:
+    """{вариант: URL} уменьшенных копий файла name (без "original"); {} — копий нет."""
+    if base is None or not name:
+        return {}
+    return {
+        variant: _variant_url(v[0], base)
+        for variant, v in sorted(variants.get(name, {}).items()) if variant != "original"
+    }
+
+
+def to_channel(ch: Channel, base: str, variants: dict = None, vbase=None) -> dict:
+    """
+    Запись канала -> объект ответа API (как toChannel в route.ts).
+    variants — get_asset_variants() по файлам канала, vbase — variants_base(): тогда добавляются
+    iconVariants ({icon64, icon128, icon256: URL}) и screenshotVariants ([{thumb, detail: URL}] по скриншотам).
+    """
+    channel = {
+        "id": str(ch.idminiapp),
+        "name": ch.title,
+        "category": ch.category if ch.category is not None else "Утилиты",
+        "icon": icon_url(ch.icon, base),
+        "url": ch.url or "",
+        "description": ch.description or "",
+        "rating": float(ch.rating or 0),
+        "isVerified": bool(ch.is_verified),
+        "screenshots": [_asset_url(name, base) for name in ch.screenshots],
+        "shortDescription": ch.short_description or "",
+    }
+    if variants:
+        icon = variant_urls(ch.icon, variants, vbase)
+        if icon:
+            channel["iconVariants"] = icon
+        screenshots = [variant_urls(name, variants, vbase) for name in ch.screenshots]
+        if any(screenshots):
+            channel["screenshotVariants"] = screenshots
+    return channel
+
+
+def source_digest(db_path: str) -> str:
+    """sha256 файла БД. По нему API сверяет снимок с БД (mtime после git checkout ничего не значит)."""
+    h = hashlib.sha256()
+    with open(db_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def write_variant(out_dir: str, channels: list, use_brotli: bool) -> dict:
+    """Пишет один JSON со сжатыми копиями; возвращает запись для манифеста."""
+    body = json.dumps(channels, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    digest = hashlib.sha256(body).hexdigest()[:32]
+    name = f"{digest}.json"
+    entry = {"file": name, "etag": f'"{digest}"', "count": len(channels), "size": len(body), "encodings": {}}
+    path = os.path.join(out_dir, name)
+    if not os.path.exists(path):
+        _write_atomic(path, body)
+    # mtime=0 — одинаковый вход даёт побайтно одинаковый .gz
+    gz = path + ".gz"
+    if not os.path.exists(gz):
+        _write_atomic(gz, gzip.compress(body, compresslevel=9, mtime=0))
+    entry["encodings"]["gzip"] = name + ".gz"
+    if use_brotli:
+        br = path + ".br"
+        if not os.path.exists(br):
+            _write_atomic(br, brotli.compress(body, quality=11))
+        entry["encodings"]["br"] = name + ".br"
+    return entry
+
+
+def _referenced(manifest: dict) -> set:
+    files = set()
+    for entry in [manifest.get("all")] + list(manifest.get("categories", {}).values()):
+        if entry:
+            files.add(entry["file"])
+            files.update(entry.get("encodings", {}).values())
+    return files
+
+
+def export_snapshot(out_dir: str = SNAPSHOT_DIR, use_brotli: bool = True) -> dict:
+    os.makedirs(out_dir, exist_ok=True)
+    use_brotli = use_brotli and brotli is not None
+    base = assets_base()
+    vbase = variants_base()
+
+    # Версия — до чтения строк: изменения, попавшие в выгрузку, клиент просто получит ещё раз
+    version = catalogue_version()
+    records = list(iter_channel_records(order_by="rowid", columns=CHANNEL_COLUMNS + ", short_description"))
+    variants = {}
+    if vbase is not None:
+        variants = get_asset_variants(
+            name for ch in records for name in [ch.icon, *ch.screenshots]
+            if name and not name.startswith(("http://", "https://"))
+        )
+    channels = [to_channel(ch, base, variants, vbase) for ch in records]
+    # Хэш — после закрытия подключений: WAL к этому моменту перенесён в основной файл
+    dbpool.close_all()
+    source = source_digest(DB_NAME)
+
+    by_category = {}
+    for channel in channels:
+        by_category.setdefault(channel["category"], []).append(channel)
+
+    manifest = {
+        "format": SNAPSHOT_FORMAT,
+        "generated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "source_sha256": source,
+        "catalogue_version": version,
+        "assets_base": base,
+        "variants_base": vbase,
+        "all": write_variant(out_dir, channels, use_brotli),
+        "categories": {
+            category: write_variant(out_dir, items, use_brotli)
+            for category, items in sorted(by_category.items())
+        },
+    }
+
+    manifest_path = os.path.join(out_dir, "manifest.json")
+    keep = _referenced(manifest)
+    if os.path.exists(manifest_path):
+        with open(manifest_path, encoding="utf-8") as f:
+            keep |= _referenced(json.load(f))
+    _write_atomic(manifest_path, json.dumps(manifest, ensure_ascii=False, indent=2).encode("utf-8"))
+
+    for name in os.listdir(out_dir):
+        if name.endswith((".json", ".json.gz", ".json.br")) and name != "manifest.json" and name not in keep:
+            os.remove(os.path.join(out_dir, name))
+    return manifest
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Выгружает каталог в снимок для /api/channels.")
+    parser.add_argument("--out", default=SNAPSHOT_DIR, help="папка снимка")
+    parser.add_argument("--no-brotli", action="store_true", help="не создавать .br")
+    parser.add_argument("--profile", action="store_true", help="сводка по SQL-запросам при выходе (query_profile)")
+    args = parser.parse_args(argv)
+    if args.profile:
+        query_profile.enable()
+
+    if not os.path.exists(DB_NAME):
+        print(f"БД не найдена: {DB_NAME}")
+        raise SystemExit(1)
+    if brotli is None and not args.no_brotli:
+        print("brotli не установлен — только gzip (pip install brotli)")
+
+    manifest = export_snapshot(args.out, use_brotli=not args.no_brotli)
+    entry = manifest["all"]
+    print(f"Снимок: {entry['count']} каналов, ETag {entry['etag']}, {entry['size'] // 1024} КБ JSON")
+    print(f"Категорий: {len(manifest['categories'])}; папка: {args.out}")
+
+
+if __name__ == "__main__":
+    main()
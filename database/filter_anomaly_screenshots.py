@@ -2,117 +2,220 @@
 """
 Удаляет из БД скриншоты-аномалии: иконки, пустые экраны, плейсхолдеры.
 После скрипта в Предпросмотре остаются только нормальные скрины; если все — аномалии, блок не показывается.
-Запуск: cd database && python3 filter_anomaly_screenshots.py
-Требуется: pip install Pillow
+Каждый файл декодируется один раз, метрики считаются через NumPy, файлы обрабатываются параллельно.
+Метрики кэшируются в image_cache.db: повторный запуск декодирует только новые и изменённые файлы.
+Это шаг anomalies конвейера pipeline.py.
+Запуск: cd database && python3 filter_anomaly_screenshots.py [--workers N] [--no-cache] [--dry-run]
+Требуется: pip install Pillow numpy
 """
 
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from collections import Counter
 
 try:
+    import numpy as np
     from PIL import Image
 except ImportError:
-    print("Установите Pillow: python3 -m pip install Pillow")
+    print("Установите Pillow и numpy: python3 -m pip install Pillow numpy")
     raise
 
-from mainbd import get_connection, update_channel, ICONS_FOLDER
+import image_cache
+import query_profile
+from channel import join_screenshots, split_screenshots
+from mainbd import ICONS_FOLDER
+from pipeline import Stage, run
 
 ICONS_PATH = Path(ICONS_FOLDER)
 MAX_SCREENSHOTS_PER_APP = 3
 
-
-def is_icon_like(image_path: Path, ratio_min: float = 0.8, ratio_max: float = 1.2) -> bool:
-    """Квадратное изображение — иконка, не скрин."""
+# Пороги аномалий
+ICON_RATIO_MIN = 0.8
+ICON_RATIO_MAX = 1.2
+MIN_SIDE = 200
+SAMPLE_SIZE = (80, 80)
+NEAR_WHITE_MIN = 240
+NEAR_WHITE_RATIO = 0.82
+MAX_UNIQUE_COLORS = 15
+DOMINANT_RATIO = 0.80
+# Версия метрик в image_cache: увеличьте при изменении analyze_image или порогов
+METRICS_VERSION = 2
+
+
+def analyze_image(image_path) -> dict:
+    """
+    Декодирует изображение один раз и считает все метрики:
+    width, height, near_white (доля почти белых пикселей), unique_colors, dominant (доля самого частого цвета).
+    Метрики цвета считаются на уменьшенной до 80x80 копии. При ошибке чтения — {"error": "..."}.
+    """
     try:
         with Image.open(image_path) as img:
             w, h = img.size
-            if h == 0:
-                return True
-            r = w / h
-            return ratio_min <= r <= ratio_max
-    except Exception:
+            metrics = {"width": w, "height": h}
+            if max(w, h) < MIN_SIDE:
+                return metrics
+            if img.mode not in ("RGB", "RGBA", "L", "P"):
+                img = img.convert("RGB")
+            if img.mode == "RGBA":
+                back = Image.new("RGB", img.size, (255, 255, 255))
+                back.paste(img, mask=img.split()[-1])
+                img = back
+            elif img.mode in ("L", "P"):
+                img = img.convert("RGB")
+            # Без reducing_gap: пороги подобраны по выборке полного LANCZOS
+            small = np.asarray(img.resize(SAMPLE_SIZE, Image.Resampling.LANCZOS), dtype=np.uint8)
+    except Exception as e:
+        return {"error": str(e)}
+
+    pixels = small.reshape(-1, 3)
+    n = len(pixels)
+    if n == 0:
+        return {**metrics, "near_white": 1.0, "unique_colors": 0, "dominant": 1.0}
+    # Цвет -> одно 24-битное число, гистограмма по уникальным цветам
+    codes = (pixels[:, 0].astype(np.uint32) << 16) | (pixels[:, 1].astype(np.uint32) << 8) | pixels[:, 2]
+    _, counts = np.unique(codes, return_counts=True)
+    metrics["near_white"] = float(np.count_nonzero((pixels >= NEAR_WHITE_MIN).all(axis=1))) / n
+    metrics["unique_colors"] = int(len(counts))
+    metrics["dominant"] = float(counts.max()) / n
+    return metrics
+
+
+def _is_placeholder_metrics(metrics: dict) -> bool:
+    if "error" in metrics or max(metrics["width"], metrics["height"]) < MIN_SIDE:
         return True
+    return (
+        metrics["near_white"] >= NEAR_WHITE_RATIO
+        or metrics["unique_colors"] <= MAX_UNIQUE_COLORS
+        or metrics["dominant"] >= DOMINANT_RATIO
+    )
 
 
-def is_placeholder_or_fake(image_path: Path) -> bool:
-    """Пустой экран, рамка телефона, иконка-символ (плейсхолдер)."""
+def is_anomaly_metrics(metrics: dict, ratio_min: float = ICON_RATIO_MIN, ratio_max: float = ICON_RATIO_MAX) -> bool:
+    """Решение по уже посчитанным метрикам analyze_image: иконка или плейсхолдер."""
+    if "error" in metrics:
+        return True
+    w, h = metrics["width"], metrics["height"]
+    if h == 0 or ratio_min <= w / h <= ratio_max:
+        return True
+    return _is_placeholder_metrics(metrics)
+
+
+def is_icon_like(image_path: Path, ratio_min: float = ICON_RATIO_MIN, ratio_max: float = ICON_RATIO_MAX) -> bool:
+    """Квадратное изображение — иконка, не скрин."""
     try:
         with Image.open(image_path) as img:
-            if img.mode not in ("RGB", "RGBA", "L", "P"):
-                img = img.convert("RGB")
             w, h = img.size
-            if max(w, h) < 200:
-                return True
-            small = img.copy()
-            if small.mode == "RGBA":
-                back = Image.new("RGB", small.size, (255, 255, 255))
-                back.paste(small, mask=small.split()[-1])
-                small = back
-            elif small.mode in ("L", "P"):
-                small = small.convert("RGB")
-            small = small.resize((80, 80), Image.Resampling.LANCZOS)
-            pixels = list(small.getdata())
-            n = len(pixels)
-            if n == 0:
-                return True
-            near_white = sum(1 for p in pixels if p[0] >= 240 and p[1] >= 240 and p[2] >= 240)
-            if near_white / n >= 0.82:
-                return True
-            unique = len(set(pixels))
-            if unique <= 15:
-                return True
-            cnt = Counter(pixels)
-            most = cnt.most_common(1)[0][1] if cnt else 0
-            if most / n >= 0.80:
-                return True
-            return False
     except Exception:
         return True
+    return h == 0 or ratio_min <= w / h <= ratio_max
 
 
-def is_anomaly(file_path: Path) -> bool:
-    return is_icon_like(file_path) or is_placeholder_or_fake(file_path)
-
+def is_placeholder_or_fake(image_path: Path) -> bool:
+    """Пустой экран, рамка телефона, иконка-символ (плейсхолдер)."""
+    return _is_placeholder_metrics(analyze_image(image_path))
 
-def main():
-    if not ICONS_PATH.exists():
-        print("Папка с иконками/скринами не найдена:", ICONS_PATH)
-        return
 
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute(
-        "SELECT idminiapp, screenshots_path FROM channels WHERE screenshots_path IS NOT NULL AND screenshots_path != ''"
-    )
-    rows = cur.fetchall()
-    conn.close()
-
-    updated = 0
-    removed_total = 0
-    for idminiapp, old_path in rows:
-        parts = [p.strip() for p in (old_path or "").split(";") if p.strip()]
-        if not parts:
-            continue
+def is_anomaly(file_path: Path) -> bool:
+    return is_anomaly_metrics(analyze_image(file_path))
+
+
+def analyze_files(names, workers: int = None) -> dict:
+    """
+    Считает метрики для списка имён файлов из ICONS_PATH параллельно (ProcessPoolExecutor).
+    workers=1 — без пула, в текущем процессе. Возвращает {имя: метрики + "anomaly"}.
+    """
+    names = list(names)
+    paths = [ICONS_PATH / name for name in names]
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(names) < 2:
+        results = map(analyze_image, paths)
+        return {name: {**m, "anomaly": is_anomaly_metrics(m)} for name, m in zip(names, results)}
+    chunksize = max(1, len(paths) // (workers * 8))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(analyze_image, paths, chunksize=chunksize)
+        return {name: {**m, "anomaly": is_anomaly_metrics(m)} for name, m in zip(names, results)}
+
+
+class AnomaliesStage(Stage):
+    """
+    Шаг конвейера: убирает из screenshots_path аномалии и ссылки на отсутствующие файлы,
+    оставляя не больше MAX_SCREENSHOTS_PER_APP. Метрики файлов пачки считаются в prepare параллельно,
+    каждый файл — один раз за прогон, даже если он упомянут у нескольких приложений.
+    """
+
+    name = "anomalies"
+    columns = ("screenshots_path",)
+
+    def __init__(self, workers: int = None, use_cache: bool = True):
+        self.workers = workers
+        self.use_cache = use_cache
+        self.metrics = {}
+        self.missing = set()
+        self.removed = 0
+
+    def prepare(self, rows: list) -> None:
+        referenced = {name for row in rows for name in split_screenshots(row["screenshots_path"])}
+        todo = sorted(name for name in referenced - self.metrics.keys() - self.missing)
+        names = [name for name in todo if (ICONS_PATH / name).exists()]
+        self.missing.update(set(todo) - set(names))
+        if not names:
+            return
+        if self.use_cache:
+            self.metrics.update(image_cache.get_features(
+                names, lambda todo: analyze_files(todo, workers=self.workers), kind="anomaly", version=METRICS_VERSION
+            ))
+        else:
+            self.metrics.update(analyze_files(names, workers=self.workers))
+
+    def apply(self, row: dict):
+        screenshots = split_screenshots(row["screenshots_path"])
+        if not screenshots:
+            return
         kept = []
-        for name in parts:
-            path = ICONS_PATH / name
-            if not path.exists():
+        for name in screenshots:
+            if name not in self.metrics:
                 continue
-            if is_anomaly(path):
-                removed_total += 1
+            if is_anomaly_metrics(self.metrics[name]):
+                self.removed += 1
                 continue
             kept.append(name)
             if len(kept) >= MAX_SCREENSHOTS_PER_APP:
                 break
-        new_path = ";".join(kept)
-        if new_path != (old_path or "").strip():
-            if update_channel(idminiapp, screenshots_path=new_path):
-                updated += 1
-                before = len(parts)
-                after = len(kept)
-                print(f"{idminiapp}: было {before} скринов → осталось {after}")
-
-    print(f"\nОбновлено записей: {updated}, удалено аномалий: {removed_total}")
+        new_path = join_screenshots(kept)
+        if new_path != row["screenshots_path"].strip():
+            row["screenshots_path"] = new_path
+
+    def report(self) -> list:
+        lines = [f"удалено аномалий: {self.removed}"]
+        if self.missing:
+            lines.append(f"ссылок на отсутствующие файлы: {len(self.missing)} (список: python3 asset_manifest.py --list)")
+        return lines
+
+
+def make_stage(args=None) -> AnomaliesStage:
+    return AnomaliesStage(workers=getattr(args, "workers", None), use_cache=not getattr(args, "no_cache", False))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Удаляет скриншоты-аномалии из screenshots_path.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="число процессов для анализа изображений (по умолчанию — число ядер)")
+    parser.add_argument("--no-cache", action="store_true", help="не использовать image_cache.db, декодировать все файлы")
+    parser.add_argument("--dry-run", action="store_true", help="только отчёт, без записи в БД")
+    parser.add_argument("--chunk", type=int, default=5000,
+                        help="приложений в пачке (файлы пачки анализируются одним пулом процессов)")
+    parser.add_argument("--profile", action="store_true", help="сводка по SQL-запросам при выходе (query_profile)")
+    args = parser.parse_args(argv)
+    if args.profile:
+        query_profile.enable()
+
+    if not ICONS_PATH.exists():
+        print("Папка с иконками/скринами не найдена:", ICONS_PATH)
+        return
+
+    run([AnomaliesStage(args.workers, use_cache=not args.no_cache)], dry_run=args.dry_run, chunk_size=args.chunk,
+        show_diff=True)
 
 
 if __name__ == "__main__":
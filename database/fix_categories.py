@@ -1,95 +1,116 @@
 #!/usr/bin/env python3
 """
+Переназначает категории по правилам из category_rules.json:
 - Удаляем категорию «Боты»: рассовываем приложения из неё по другим категориям.
 - Упоминания NFT / подарков в описании или названии -> категория «Подарки».
-- Дополнительно: подходящие категории по ключевым словам (подарки, игры, нейросети и т.д.).
+
+Все правила проверяются за один проход по строкам (см. categorizer.py), изменения пишутся одним пакетом.
+Это шаг categories конвейера pipeline.py.
+По умолчанию обрабатываются только строки, изменившиеся с прошлого запуска (столбец changed_at);
+если правила поменялись — все строки.
+Запуск: из папки database: python3 fix_categories.py [--full] [--dry-run] [--rules category_rules.json]
 """
+import argparse
+import hashlib
 import os
 import sys
-import sqlite3
-
-DB_NAME = os.path.join(os.path.dirname(__file__), "telegram_channels.db")
 
-# Бывшие «Боты» -> новая категория (по idminiapp или по смыслу)
-BOTS_TO_CATEGORY = {
-    "24": "Утилиты",   # Quattro VPN
-    "25": "Утилиты",   # Shadownet VPN
-    "26": "Игры",      # R1XON CHEATS
-    "27": "Утилиты",   # Velvet VPN
-    "41": "Утилиты",   # funstat / telelog
-    "42": "Утилиты",   # RSN bot
-    "43": "Утилиты",   # AppStops
-    "44": "Утилиты",   # Himera Search
-}
+import dbpool
+import query_profile
+from categorizer import RULES_FILE, Categorizer, load_rules
+from mainbd import DB_NAME, get_state, set_state
+from pipeline import Stage, run
+
+STATE_WATERMARK = "fix_categories.watermark"
+STATE_RULES_HASH = "fix_categories.rules_hash"
+
+
+class CategoriesStage(Stage):
+    """
+    Шаг конвейера: категория по первому сработавшему правилу categorizer.
+    После записи запоминает отметку changed_at и хэш правил — следующий запуск fix_categories.py
+    без --full проверит только строки, изменившиеся позже. Собственная запись категорий тоже сдвигает
+    changed_at (триггер), поэтому отметка переносится и через неё — но не дальше первой строки,
+    которую после начала прогона изменил кто-то другой.
+    """
+
+    name = "categories"
+
+    def __init__(self, rules_path: str = RULES_FILE):
+        with open(rules_path, "rb") as f:
+            self.rules_hash = hashlib.sha256(f.read()).hexdigest()
+        self.categorizer = Categorizer(load_rules(rules_path)["rules"])
+        self.columns = tuple(["category"] + [f for f in self.categorizer.fields if f not in ("idminiapp", "category")])
+        with dbpool.connection(DB_NAME) as conn:
+            self.new_watermark = conn.execute("SELECT MAX(changed_at) FROM channels").fetchone()[0]
+        self.changed = {}  # idminiapp -> значения self.columns, записанные шагом
+        self.per_rule = {}
+
+    def apply(self, row: dict):
+        rule = self.categorizer.match(row)
+        if rule is not None and rule.category != row["category"]:
+            row["category"] = rule.category
+            self.per_rule[rule.name] = self.per_rule.get(rule.name, 0) + 1
+            self.changed[row["idminiapp"]] = tuple(row[c] for c in self.columns)
+
+    def report(self) -> list:
+        return [f"правило {name}: {count}" for name, count in sorted(self.per_rule.items())]
+
+    def commit(self) -> None:
+        # Строки, изменённые после начала прогона, по порядку changed_at: отметка идёт через группы
+        # с одним changed_at, пока все их строки — наша запись с теми же значениями
+        watermark, pending = self.new_watermark, None
+        with dbpool.connection(DB_NAME) as conn:
+            for changed_at, idminiapp, *values in conn.execute(
+                f"SELECT changed_at, idminiapp, {', '.join(self.columns)} FROM channels "
+                "WHERE changed_at > ? ORDER BY changed_at", (self.new_watermark or "",)
+            ):
+                if changed_at != pending:
+                    if pending is not None:
+                        watermark = pending
+                    pending = changed_at
+                if self.changed.get(idminiapp) != tuple(values):
+                    pending = None
+                    break
+        if pending is not None:
+            watermark = pending
+        set_state(STATE_WATERMARK, watermark)
+        set_state(STATE_RULES_HASH, self.rules_hash)
+
+
+def make_stage(args=None) -> CategoriesStage:
+    return CategoriesStage(getattr(args, "rules", None) or RULES_FILE)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Переназначает категории приложений по правилам.")
+    parser.add_argument("--full", action="store_true", help="проверить все строки, а не только изменившиеся")
+    parser.add_argument("--dry-run", action="store_true", help="только отчёт, без записи")
+    parser.add_argument("--rules", default=RULES_FILE, help="файл правил")
+    parser.add_argument("--profile", action="store_true", help="сводка по SQL-запросам при выходе (query_profile)")
+    args = parser.parse_args(argv)
+    if args.profile:
+        query_profile.enable()
 
-
-def main():
     if not os.path.exists(DB_NAME):
         print(f"БД не найдена: {DB_NAME}")
         sys.exit(1)
 
-    conn = sqlite3.connect(DB_NAME)
-    conn.row_factory = sqlite3.Row
-    cur = conn.cursor()
-
-    # Проверяем наличие short_description
-    cur.execute("PRAGMA table_info(channels)")
-    cols = [r[1] for r in cur.fetchall()]
-    has_short = "short_description" in cols
-    desc_sel = "COALESCE(description,'')" + (" || ' ' || COALESCE(short_description,'')" if has_short else "")
-
-    updates = []
-
-    # 1) Всё, где в названии или описании есть nft -> Подарки
-    cur.execute(f"""
-        SELECT idminiapp, title, category FROM channels
-        WHERE LOWER(title || ' ' || {desc_sel}) LIKE '%nft%'
-    """)
-    for r in cur.fetchall():
-        if r["category"] != "Подарки":
-            updates.append((r["idminiapp"], "Подарки", f"NFT: {r['title'][:40]}"))
-    for idminiapp, cat, reason in updates:
-        cur.execute("UPDATE channels SET category = ? WHERE idminiapp = ?", (cat, idminiapp))
-    print(f"По ключу NFT -> Подарки обновлено: {len(updates)}")
-    updates.clear()
-
-    # 2) Подарки/gift в описании или названии -> Подарки (если ещё не)
-    cur.execute(f"""
-        SELECT idminiapp, title, category FROM channels
-        WHERE category != 'Подарки'
-        AND (LOWER(title) LIKE '%подарок%' OR LOWER(title) LIKE '%gift%'
-             OR LOWER({desc_sel}) LIKE '%подарок%' OR LOWER({desc_sel}) LIKE '%gift%'
-             OR LOWER({desc_sel}) LIKE '%nft%')
-    """)
-    for r in cur.fetchall():
-        updates.append((r["idminiapp"], "Подарки", r["title"][:40]))
-    for idminiapp, cat, _ in updates:
-        cur.execute("UPDATE channels SET category = ? WHERE idminiapp = ?", (cat, idminiapp))
-    print(f"По ключу подарки/gift -> Подарки обновлено: {len(updates)}")
-    updates.clear()
-
-    # 3) Бывшие «Боты» -> назначенные категории
-    for idminiapp, new_cat in BOTS_TO_CATEGORY.items():
-        cur.execute("UPDATE channels SET category = ? WHERE idminiapp = ? AND category = 'Боты'", (new_cat, idminiapp))
-        if cur.rowcount:
-            updates.append((idminiapp, new_cat))
-    print(f"Боты перераспределены: {len(updates)}")
-    updates.clear()
-
-    # 4) Оставшиеся с категорией «Боты» (на всякий случай) -> Утилиты
-    cur.execute("UPDATE channels SET category = 'Утилиты' WHERE category = 'Боты'")
-    if cur.rowcount:
-        print(f"Оставшиеся Боты -> Утилиты: {cur.rowcount}")
-
-    conn.commit()
+    stage = CategoriesStage(args.rules)
+    full = args.full or get_state(STATE_RULES_HASH) != stage.rules_hash
+    watermark = None if full else get_state(STATE_WATERMARK)
+    print("Проверяются " + ("все строки" if watermark is None else f"строки, изменённые с {watermark}"))
+    where = None if watermark is None else ("changed_at IS NULL OR changed_at > ?", (watermark,))
+    run([stage], dry_run=args.dry_run, show_diff=args.dry_run, where=where)
+    if args.dry_run:
+        return
 
     # Итог по категориям
-    cur.execute("SELECT category, COUNT(*) as cnt FROM channels GROUP BY category ORDER BY category")
+    with dbpool.connection(DB_NAME) as conn:
+        rows = conn.execute("SELECT category, COUNT(*) FROM channels GROUP BY category ORDER BY category").fetchall()
     print("\nКатегории после обновления:")
-    for r in cur.fetchall():
-        print(f"  {r['category']}: {r['cnt']}")
-
-    conn.close()
+    for category, count in rows:
+        print(f"  {category}: {count}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,192 @@
+"""
+Постоянный кэш признаков изображений из logo&screens.
+
+Хранится в отдельной SQLite-базе рядом с папкой (image_cache.db, в git не коммитится):
+- image_files    — имя файла -> размер, mtime и хэш содержимого;
+- image_features — хэш содержимого + вид признаков + версия алгоритма -> ширина, высота и метрики (JSON).
+
+Файл, у которого не изменились размер и mtime, не читается вовсе; если mtime изменился
+(например, после git checkout), файл перехэшируется, и при совпадении хэша признаки берутся из кэша.
+Одинаковые по содержимому файлы под разными именами декодируются один раз.
+
+Использование:
+    hashes = file_hashes(names)      # {имя: (хэш, размер)}, хэширование параллельно через mmap
+    features = get_features(names, compute=analyze_files, kind="anomaly", version=1)
+    width, height = cached_dimensions("notcoin_scr_1.webp") or (None, None)
+"""
+
+import hashlib
+import json
+import mmap
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+import dbpool
+from mainbd import ICONS_FOLDER
+
+CACHE_DB = os.path.join(os.path.dirname(os.path.abspath(ICONS_FOLDER)), "image_cache.db")
+
+
+def _ensure_schema(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS image_files (
+            name TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            hash TEXT NOT NULL
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS image_features (
+            hash TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            version INTEGER NOT NULL,
+            width INTEGER,
+            height INTEGER,
+            metrics TEXT NOT NULL,
+            PRIMARY KEY (hash, kind, version)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_image_files_hash ON image_files(hash)")
+
+
+dbpool.register_schema(_ensure_schema, CACHE_DB)
+
+
+def content_hash(path: str) -> str:
+    """BLAKE2b-128 содержимого файла (hex). Файл читается через mmap, без копирования в память процесса."""
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                h.update(data)
+    return h.hexdigest()
+
+
+def _memo_key(name: str, folder: str) -> str:
+    # Файлы logo&screens — по имени (как раньше), остальные папки — с именем папки
+    if os.path.abspath(folder) == os.path.abspath(ICONS_FOLDER):
+        return name
+    return f"{os.path.basename(os.path.normpath(folder))}/{name}"
+
+
+def file_hashes(names: Iterable[str], folder: str = ICONS_FOLDER, workers: Optional[int] = None) -> Dict[str, Tuple[str, int]]:
+    """
+    {имя: (хэш содержимого, размер)} для файлов из folder. Файл с прежними размером и mtime не читается;
+    остальные хэшируются параллельно в потоках (hashlib отпускает GIL). Отсутствующие файлы пропускаются.
+    """
+    names = list(dict.fromkeys(names))
+    keys = {name: _memo_key(name, folder) for name in names}
+    conn = dbpool.get_connection(CACHE_DB)
+    known = {row[0]: row[1:] for row in _select_in(
+        conn, "SELECT name, size, mtime_ns, hash FROM image_files WHERE name IN ({})", list(keys.values())
+    )}
+
+    result = {}
+    todo = []
+    for name in names:
+        try:
+            st = os.stat(os.path.join(folder, name))
+        except OSError:
+            continue
+        row = known.get(keys[name])
+        if row and row[0] == st.st_size and row[1] == st.st_mtime_ns:
+            result[name] = (row[2], st.st_size)
+        else:
+            todo.append((name, st))
+
+    if todo:
+        with ThreadPoolExecutor(max_workers=workers or min(8, (os.cpu_count() or 1) * 2)) as pool:
+            digests = list(pool.map(lambda item: content_hash(os.path.join(folder, item[0])), todo))
+        with dbpool.transaction(CACHE_DB) as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO image_files (name, size, mtime_ns, hash) VALUES (?, ?, ?, ?)",
+                [(keys[name], st.st_size, st.st_mtime_ns, h) for (name, st), h in zip(todo, digests)],
+            )
+        for (name, st), h in zip(todo, digests):
+            result[name] = (h, st.st_size)
+    return result
+
+
+def _select_in(conn, sql: str, keys: list, extra: tuple = ()) -> list:
+    """SELECT ... IN (...) пачками по 500 ключей (лимит параметров SQLite)."""
+    rows = []
+    for i in range(0, len(keys), 500):
+        part = keys[i:i + 500]
+        rows.extend(conn.execute(sql.format(", ".join("?" * len(part))), (*extra, *part)).fetchall())
+    return rows
+
+
+def get_features(names: Iterable[str], compute: Callable[[list], Dict[str, dict]], kind: str = "anomaly",
+                 version: int = 1, folder: str = ICONS_FOLDER) -> Dict[str, dict]:
+    """
+    Возвращает {имя: метрики} для файлов из folder, считая заново только новые и изменённые.
+    compute(names) -> {имя: метрики} вызывается один раз со списком файлов без актуальных признаков;
+    метрики — JSON-совместимый словарь (width/height, если есть, попадают в отдельные столбцы).
+    kind — вид признаков (например, "anomaly", "dhash"): у каждого свой кэш.
+    version — версия алгоритма: при её смене все признаки этого вида пересчитываются.
+    Отсутствующие файлы в результат не попадают.
+    """
+    hashes = {name: h for name, (h, _) in file_hashes(names, folder).items()}
+    conn = dbpool.get_connection(CACHE_DB)
+
+    unique_hashes = list(set(hashes.values()))
+    cached = {row[0]: json.loads(row[1]) for row in _select_in(
+        conn, "SELECT hash, metrics FROM image_features WHERE kind = ? AND version = ? AND hash IN ({})",
+        unique_hashes, (kind, version)
+    )}
+
+    # По одному представителю на каждый новый хэш
+    todo = {}
+    for name, h in hashes.items():
+        if h not in cached and h not in todo:
+            todo[h] = name
+    computed = compute(list(todo.values())) if todo else {}
+    feature_rows = []
+    for h, name in todo.items():
+        metrics = computed.get(name)
+        if metrics is None:
+            continue
+        cached[h] = metrics
+        feature_rows.append((h, kind, version, metrics.get("width"), metrics.get("height"), json.dumps(metrics)))
+
+    if feature_rows:
+        with dbpool.transaction(CACHE_DB) as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO image_features (hash, kind, version, width, height, metrics) VALUES (?, ?, ?, ?, ?, ?)",
+                feature_rows,
+            )
+    return {name: cached[h] for name, h in hashes.items() if h in cached}
+
+
+def read_cached(names: Iterable[str], kind: str = "anomaly", version: Optional[int] = None) -> Dict[str, dict]:
+    """
+    Читает признаки из кэша без открытия изображений и без проверки файлов на диске.
+    Возвращает {имя: {"width", "height", "hash", "metrics"}}; version=None — последняя версия.
+    """
+    names = list(dict.fromkeys(names))
+    conn = dbpool.get_connection(CACHE_DB)
+    rows = _select_in(conn, """
+        SELECT f.name, f.hash, x.width, x.height, x.metrics, x.version
+        FROM image_files f JOIN image_features x ON x.hash = f.hash
+        WHERE x.kind = ? AND f.name IN ({})
+        ORDER BY x.version
+    """, names, (kind,))
+    result = {}
+    for name, h, width, height, metrics, row_version in rows:
+        if version is not None and row_version != version:
+            continue
+        result[name] = {"width": width, "height": height, "hash": h, "metrics": json.loads(metrics)}
+    return result
+
+
+def cached_dimensions(name: str) -> Optional[tuple]:
+    """(ширина, высота) файла из кэша или None, если файл ещё не анализировался."""
+    row = dbpool.get_connection(CACHE_DB).execute("""
+        SELECT x.width, x.height
+        FROM image_files f JOIN image_features x ON x.hash = f.hash
+        WHERE f.name = ? AND x.width IS NOT NULL
+        LIMIT 1
+    """, (name,)).fetchone()
+    return tuple(row) if row else None
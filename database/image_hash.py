@@ -0,0 +1,149 @@
+"""
+Перцептивные хэши (dHash) изображений из logo&screens и поиск почти-дубликатов.
+
+dHash — 64 бита: изображение в оттенках серого уменьшается до 9x8, каждый бит — «левый пиксель ярче правого».
+Пережатые или уменьшенные копии одного экрана дают хэши с малым расстоянием Хэмминга.
+Поиск соседей — через multi-index hashing (HammingIndex): кандидаты берутся по точному совпадению
+одного из блоков хэша, поэтому кластеризация ~10k файлов обходится без сравнения каждого с каждым.
+Хэши кэшируются в image_cache (вид "dhash").
+Требуется: pip install Pillow numpy
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List
+
+import numpy as np
+from PIL import Image
+
+import image_cache
+from mainbd import ICONS_FOLDER
+
+DHASH_VERSION = 1
+# Порог по умолчанию: до 6 различающихся бит из 64 — тот же экран
+DEFAULT_THRESHOLD = 6
+# Почти однотонные картинки (пустые экраны) дают хэш из одних нулей/единиц — их не сравниваем
+MIN_HASH_BITS = 4
+
+
+def dhash(image_path) -> dict:
+    """Считает dHash файла. Возвращает {"dhash", "width", "height", "bytes"} или {"error": ...}."""
+    try:
+        with Image.open(image_path) as img:
+            w, h = img.size
+            gray = img.convert("L").resize((9, 8), Image.Resampling.LANCZOS, reducing_gap=3.0)
+            pixels = np.asarray(gray, dtype=np.int16)
+    except Exception as e:
+        return {"error": str(e)}
+    bits = (pixels[:, :-1] > pixels[:, 1:]).ravel()
+    value = int.from_bytes(np.packbits(bits).tobytes(), "big")
+    return {"dhash": value, "width": w, "height": h, "bytes": os.path.getsize(image_path)}
+
+
+def hash_files(names: Iterable[str], workers: int = None) -> Dict[str, dict]:
+    """dHash для файлов из ICONS_FOLDER параллельно; workers=1 — в текущем процессе."""
+    names = list(names)
+    paths = [os.path.join(ICONS_FOLDER, name) for name in names]
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(names) < 2:
+        return dict(zip(names, map(dhash, paths)))
+    chunksize = max(1, len(paths) // (workers * 8))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return dict(zip(names, pool.map(dhash, paths, chunksize=chunksize)))
+
+
+def get_hashes(names: Iterable[str], workers: int = None) -> Dict[str, dict]:
+    """dHash с кэшем: пересчитываются только новые и изменённые файлы."""
+    return image_cache.get_features(
+        names, lambda todo: hash_files(todo, workers=workers), kind="dhash", version=DHASH_VERSION
+    )
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+class HammingIndex:
+    """
+    Multi-index hashing для поиска 64-битных хэшей в радиусе radius.
+    Хэш режется на radius + 1 блоков; по принципу Дирихле у двух хэшей на расстоянии <= radius
+    хотя бы один блок совпадает точно. Поэтому кандидаты берутся из radius + 1 словарей по блокам
+    и только они проверяются точным расстоянием — без сравнения со всеми n хэшами.
+    """
+
+    __slots__ = ("radius", "_blocks", "_tables", "_items")
+
+    def __init__(self, radius: int, bits: int = 64):
+        self.radius = radius
+        count = radius + 1
+        # границы блоков: почти равные куски по bits / count бит
+        edges = [bits * i // count for i in range(count + 1)]
+        self._blocks = [(edges[i], (1 << (edges[i + 1] - edges[i])) - 1) for i in range(count)]
+        self._tables = [{} for _ in range(count)]
+        self._items = {}
+
+    def add(self, value: int, item) -> None:
+        items = self._items.get(value)
+        if items is None:
+            items = self._items[value] = []
+            for (shift, mask), table in zip(self._blocks, self._tables):
+                table.setdefault((value >> shift) & mask, []).append(value)
+        items.append(item)
+
+    def neighbours(self, value: int) -> List[tuple]:
+        """Различные хэши из индекса на расстоянии <= radius: список (хэш, расстояние)."""
+        seen = set()
+        found = []
+        for (shift, mask), table in zip(self._blocks, self._tables):
+            for candidate in table.get((value >> shift) & mask, ()):
+                if candidate in seen:
+                    continue
+                seen.add(candidate)
+                d = hamming(value, candidate)
+                if d <= self.radius:
+                    found.append((candidate, d))
+        return found
+
+    def search(self, value: int) -> List[tuple]:
+        """Все (элемент, расстояние) с расстоянием до value не больше radius."""
+        return [(item, d) for candidate, d in self.neighbours(value) for item in self._items[candidate]]
+
+
+def find_clusters(hashes: Dict[str, dict], threshold: int = DEFAULT_THRESHOLD,
+                  kinds: Dict[str, str] = None) -> List[List[str]]:
+    """
+    Группирует файлы вокруг лучшей копии (больше пикселей, затем байт): файлы перебираются от лучшего,
+    каждый ещё не распределённый становится первым в группе и забирает свободные файлы на расстоянии
+    <= threshold от себя. Цепочек нет: любой файл группы не дальше threshold от cluster[0].
+    kinds — {имя: вид}, например логотип или скриншот: файлы разных видов в одну группу не попадают.
+    Возвращает только группы из 2+ файлов; внутри группы — сначала лучшая копия.
+    """
+    usable = {
+        name: m for name, m in hashes.items()
+        if "dhash" in m and MIN_HASH_BITS <= m["dhash"].bit_count() <= 64 - MIN_HASH_BITS
+    }
+    index = HammingIndex(threshold)
+    for name, m in usable.items():
+        index.add(m["dhash"], name)
+    kinds = kinds or {}
+
+    def quality(n):
+        return -(usable[n]["width"] * usable[n]["height"]), -usable[n]["bytes"], n
+
+    assigned = set()
+    clusters = []
+    for leader in sorted(usable, key=quality):
+        if leader in assigned:
+            continue
+        assigned.add(leader)
+        kind = kinds.get(leader)
+        members = [
+            name for name, _ in index.search(usable[leader]["dhash"])
+            if name not in assigned and kinds.get(name) == kind
+        ]
+        if not members:
+            continue
+        assigned.update(members)
+        clusters.append([leader] + sorted(members, key=quality))
+    clusters.sort(key=lambda c: (-len(c), c[0]))
+    return clusters
@@ -1,17 +1,25 @@
 import sqlite3
 import os
+import re
 from typing import Optional
 
+import dbpool
+from channel import FIELDS as RECORD_FIELDS, Channel
 
-DB_NAME = os.path.join(os.path.dirname(__file__), "telegram_channels.db")
+
+DB_NAME = dbpool.DB_NAME
 
 # Папка с иконками и скриншотами (формат WebP). Лого и скрины в одной папке.
-ICONS_FOLDER = os.path.join(os.path.dirname(__file__), "logo&screens")
+# Переопределяется переменной MAINBD_ASSETS_DIR (как MAINBD_DB_PATH — для синтетических каталогов)
+ICONS_FOLDER = os.environ.get("MAINBD_ASSETS_DIR") or os.path.join(os.path.dirname(__file__), "logo&screens")
 
 
 def get_connection():
-    """Возвращает подключение к базе данных."""
-    return sqlite3.connect(DB_NAME)
+    """
+    Возвращает новое подключение к базе данных (закрывает вызывающий код).
+    Для частых запросов используйте общее подключение: dbpool.connection() / dbpool.transaction().
+    """
+    return dbpool.connect(DB_NAME)
 
 
 def get_icon_path(icon_filename: str) -> str:
@@ -32,73 +40,347 @@ def add_channel(idminiapp: str, title: str, description: str = "",
     screenshots_path — имена файлов скриншотов через ";", например: notcoin_scr_1.webp;notcoin_scr_2.webp;notcoin_scr_3.webp
     category — категория приложения (например: Утилиты, Игры, Финансы).
     """
-    conn = get_connection()
-    cursor = conn.cursor()
-    _ensure_columns(cursor)
     try:
-        cursor.execute("""
-            INSERT INTO channels (idminiapp, title, description, icon, url, is_verified, rating, category, screenshots_path)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (idminiapp, title, description, icon, url, 1 if is_verified else 0, rating, category, screenshots_path))
-        conn.commit()
+        with dbpool.transaction(DB_NAME) as conn:
+            conn.execute("""
+                INSERT INTO channels (idminiapp, title, description, icon, url, is_verified, rating, category, screenshots_path, title_norm)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (idminiapp, title, description, icon, url, 1 if is_verified else 0, rating, category, screenshots_path,
+                  normalize_title(title)))
         return True
     except sqlite3.IntegrityError:
         print(f"Канал с idminiapp '{idminiapp}' уже существует.")
         return False
-    finally:
-        conn.close()
+
+
+_NOW_SQL = "strftime('%Y-%m-%d %H:%M:%f', 'now')"
 
 
 def _ensure_columns(cursor):
-    """Добавляет столбцы category и screenshots_path, если их нет."""
-    cursor.execute("PRAGMA table_info(channels)")
-    names = {row[1] for row in cursor.fetchall()}
+    """
+    Таблица channels и её столбцы: добавляет недостающие, индексы и триггеры служебных title_norm и changed_at.
+    Зарегистрирована в dbpool: выполняется один раз на процесс, а не в каждом запросе.
+    Таблицы остальных функций создают модули, которые ими владеют: catalogue_changes.py (журнал изменений),
+    asset_variants.py, pending_channels.py, similar_channels.py.
+    """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS channels (
+            idminiapp TEXT PRIMARY KEY,
+            title TEXT NOT NULL,
+            description TEXT,
+            icon TEXT,
+            url TEXT,
+            is_verified INTEGER DEFAULT 0,
+            rating REAL DEFAULT 0,
+            category TEXT DEFAULT 'Утилиты',
+            screenshots_path TEXT
+        )
+    """)
+    names = {row[1] for row in cursor.execute("PRAGMA table_info(channels)").fetchall()}
     if "category" not in names:
         cursor.execute("ALTER TABLE channels ADD COLUMN category TEXT DEFAULT 'Утилиты'")
     if "screenshots_path" not in names:
         cursor.execute("ALTER TABLE channels ADD COLUMN screenshots_path TEXT")
+    if "short_description" not in names:
+        cursor.execute("ALTER TABLE channels ADD COLUMN short_description TEXT DEFAULT ''")
+    if "title_norm" not in names:
+        cursor.execute("ALTER TABLE channels ADD COLUMN title_norm TEXT")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_channels_title_norm ON channels(title_norm)")
+    # Другие клиенты (Node, SQLiteStudio) title_norm не знают: если title изменился, а title_norm нет —
+    # сбрасываем его в NULL, refresh_title_norms() пересчитает
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS channels_title_norm_au AFTER UPDATE OF title ON channels
+        WHEN new.title IS NOT old.title AND new.title_norm IS old.title_norm
+        BEGIN
+            UPDATE channels SET title_norm = NULL WHERE rowid = new.rowid;
+        END
+    """)
+    if "title_norm" not in names:
+        refresh_title_norms(cursor)
+    # changed_at — когда менялись данные, от которых зависит классификация (для инкрементальных прогонов)
+    if "changed_at" not in names:
+        cursor.execute("ALTER TABLE channels ADD COLUMN changed_at TEXT")
+        cursor.execute(f"UPDATE channels SET changed_at = {_NOW_SQL}")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_channels_changed_at ON channels(changed_at)")
+    # trending — популярность по событиям (events.py write_trending), затухающая со временем
+    if "trending" not in names:
+        cursor.execute("ALTER TABLE channels ADD COLUMN trending REAL DEFAULT 0")
+    # Индексы под постраничный обход iter_channels: выражения совпадают с _LISTING_ORDERS
+    for name, prefix in (("", ""), ("_category", "category, ")):
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_channels{name}_rating "
+                       f"ON channels({prefix}IFNULL(rating, 0) DESC, idminiapp)")
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_channels{name}_title "
+                       f"ON channels({prefix}IFNULL(title_norm, ''), idminiapp)")
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_channels{name}_trending "
+                       f"ON channels({prefix}IFNULL(trending, 0) DESC, idminiapp)")
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS channels_changed_at_ai AFTER INSERT ON channels BEGIN
+            UPDATE channels SET changed_at = {_NOW_SQL} WHERE rowid = new.rowid;
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS channels_changed_at_au
+        AFTER UPDATE OF title, description, short_description, category ON channels BEGIN
+            UPDATE channels SET changed_at = {_NOW_SQL} WHERE rowid = new.rowid;
+        END
+    """)
+
+
+def _ensure_state(cursor):
+    # Общее состояние скриптов обслуживания (fix_categories, similar_apps, граница журнала изменений)
+    cursor.execute("CREATE TABLE IF NOT EXISTS maintenance_state (key TEXT PRIMARY KEY, value TEXT)")
+
+
+def get_state(key: str, default: Optional[str] = None) -> Optional[str]:
+    """Значение из maintenance_state (состояние скриптов обслуживания между запусками)."""
+    with dbpool.connection(DB_NAME) as conn:
+        row = conn.execute("SELECT value FROM maintenance_state WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else default
+
+
+def set_state(key: str, value: Optional[str]) -> None:
+    with dbpool.transaction(DB_NAME) as conn:
+        conn.execute("INSERT OR REPLACE INTO maintenance_state (key, value) VALUES (?, ?)", (key, value))
+
+
+def normalize_title(title: Optional[str]) -> str:
+    """Ключ для поиска дубликатов: без пробелов по краям, без учёта регистра (и для кириллицы), пробелы схлопнуты."""
+    return " ".join((title or "").split()).casefold()
+
+
+def refresh_title_norms(conn=None) -> int:
+    """Заполняет title_norm там, где он NULL (новые строки от других клиентов). Возвращает число строк."""
+    if conn is None:
+        with dbpool.transaction(DB_NAME) as conn:
+            return refresh_title_norms(conn)
+    rows = conn.execute("SELECT rowid, title FROM channels WHERE title_norm IS NULL").fetchall()
+    conn.executemany("UPDATE channels SET title_norm = ? WHERE rowid = ?", [(normalize_title(t), r) for r, t in rows])
+    return len(rows)
+
+
+# Полнотекстовый индекс по title/description/short_description.
+# unicode61 приводит к нижнему регистру и кириллицу, и латиницу; remove_diacritics 2 — «é» == «e».
+FTS_TOKENIZER = "unicode61 remove_diacritics 2"
+# Веса bm25 для title, description, short_description: совпадение в названии важнее
+FTS_WEIGHTS = (10.0, 1.0, 3.0)
+_fts_available = True
+
+
+def _ensure_fts(cursor):
+    """
+    Создаёт FTS5-таблицу channels_fts (external content над channels) и триггеры синхронизации.
+    При первом создании индекс заполняется из существующих строк.
+    Индекс привязан к rowid: после VACUUM выполните rebuild_search_index.py.
+    """
+    global _fts_available
+    exists = cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'channels_fts'"
+    ).fetchone()
+    if not exists:
+        try:
+            cursor.execute(f"""
+                CREATE VIRTUAL TABLE channels_fts USING fts5(
+                    title, description, short_description,
+                    content='channels', content_rowid='rowid',
+                    tokenize='{FTS_TOKENIZER}', prefix='2 3'
+                )
+            """)
+        except sqlite3.OperationalError:
+            # SQLite собран без FTS5 — search_channels_ranked возвращает пустой список
+            _fts_available = False
+            return
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS channels_fts_ai AFTER INSERT ON channels BEGIN
+            INSERT INTO channels_fts(rowid, title, description, short_description)
+            VALUES (new.rowid, new.title, new.description, new.short_description);
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS channels_fts_ad AFTER DELETE ON channels BEGIN
+            INSERT INTO channels_fts(channels_fts, rowid, title, description, short_description)
+            VALUES ('delete', old.rowid, old.title, old.description, old.short_description);
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS channels_fts_au AFTER UPDATE OF title, description, short_description ON channels BEGIN
+            INSERT INTO channels_fts(channels_fts, rowid, title, description, short_description)
+            VALUES ('delete', old.rowid, old.title, old.description, old.short_description);
+            INSERT INTO channels_fts(rowid, title, description, short_description)
+            VALUES (new.rowid, new.title, new.description, new.short_description);
+        END
+    """)
+    if not exists:
+        cursor.execute("INSERT INTO channels_fts(channels_fts) VALUES ('rebuild')")
+
+
+dbpool.register_schema(_ensure_columns)
+dbpool.register_schema(_ensure_state)
+dbpool.register_schema(_ensure_fts)
+
+CHANNEL_COLUMNS = "idminiapp, title, description, icon, url, is_verified, rating, category, screenshots_path"
+
+
+CHANNEL_FIELDS = frozenset(c.strip() for c in CHANNEL_COLUMNS.split(",")) | {"short_description", "title_norm", "changed_at", "trending"}
+
+# order_by -> (выражение ключа, направление); второй ключ всегда idminiapp по возрастанию
+_LISTING_ORDERS = {
+    "rating": ("IFNULL(rating, 0)", "DESC"),
+    "trending": ("IFNULL(trending, 0)", "DESC"),
+    "title": ("IFNULL(title_norm, '')", "ASC"),
+    "idminiapp": (None, None),
+    "rowid": ("rowid", "ASC"),  # порядок добавления
+}
+
+
+def _projection(columns) -> list:
+    names = [c.strip() for c in columns.split(",")] if isinstance(columns, str) else list(columns)
+    unknown = [c for c in names if c not in CHANNEL_FIELDS]
+    if unknown or not names:
+        raise ValueError(f"Неизвестные столбцы: {', '.join(unknown) or '(пусто)'}")
+    return names
+
+
+def get_channels_page(category: Optional[str] = None, verified: Optional[bool] = None, order_by: str = "rating",
+                      after: Optional[tuple] = None, limit: int = 50, columns=CHANNEL_COLUMNS) -> tuple:
+    """
+    Одна страница каталога с поиском по ключу (keyset): WHERE ключ после курсора, без OFFSET,
+    поэтому любая страница читает из индекса только свои строки.
+    after — курсор из предыдущего вызова. Возвращает (строки, курсор следующей страницы или None).
+    columns — нужные столбцы (строка через запятую или список), например "idminiapp, title, icon, rating".
+    """
+    if order_by not in _LISTING_ORDERS:
+        raise ValueError(f"order_by: одно из {', '.join(_LISTING_ORDERS)}")
+    names = _projection(columns)
+    key, direction = _LISTING_ORDERS[order_by]
+
+    where, params = [], []
+    if category is not None:
+        where.append("category = ?")
+        params.append(category)
+    if verified is not None:
+        where.append("is_verified = ?")
+        params.append(1 if verified else 0)
+    if after is not None:
+        if key is None:
+            where.append("idminiapp > ?")
+            params.append(after[-1])
+        else:
+            op = "<" if direction == "DESC" else ">"
+            where.append(f"{key} {op}= ? AND ({key} {op} ? OR idminiapp > ?)")
+            params += [after[0], after[0], after[1]]
+
+    order = f"{key} {direction}, idminiapp" if key else "idminiapp"
+    selected = ", ".join(names + [f"{key} AS _cursor_key" if key else "NULL", "idminiapp AS _cursor_id"])
+    sql = f"SELECT {selected} FROM channels"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += f" ORDER BY {order} LIMIT ?"
+    with dbpool.connection(DB_NAME) as conn:
+        rows = conn.execute(sql, (*params, limit + 1)).fetchall()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = (rows[-1][-2], rows[-1][-1]) if key else (rows[-1][-1],)
+    return [row[:-2] for row in rows], next_cursor
+
+
+def iter_channels(category: Optional[str] = None, verified: Optional[bool] = None, order_by: str = "rating",
+                  after: Optional[tuple] = None, limit: Optional[int] = None, columns=CHANNEL_COLUMNS,
+                  page_size: int = 500):
+    """
+    Обходит каталог страницами по page_size строк (см. get_channels_page): в памяти одна страница,
+    между страницами подключение не держит открытый курсор. limit — сколько строк всего (None — все).
+    """
+    remaining = limit
+    while remaining is None or remaining > 0:
+        size = page_size if remaining is None else min(page_size, remaining)
+        rows, after = get_channels_page(category, verified, order_by, after, size, columns)
+        yield from rows
+        if remaining is not None:
+            remaining -= len(rows)
+        if after is None:
+            return
 
 
 def get_channel(idminiapp: str) -> Optional[tuple]:
     """Получает канал по idminiapp."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    _ensure_columns(cursor)
-    conn.commit()
-    cursor.execute(
-        "SELECT idminiapp, title, description, icon, url, is_verified, rating, category, screenshots_path FROM channels WHERE idminiapp = ?",
-        (idminiapp,)
-    )
-    result = cursor.fetchone()
-    conn.close()
-    return result
-
-
-def get_all_channels() -> list:
-    """Возвращает список всех каналов."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    _ensure_columns(cursor)
-    conn.commit()
-    cursor.execute("SELECT idminiapp, title, description, icon, url, is_verified, rating, category, screenshots_path FROM channels")
-    results = cursor.fetchall()
-    conn.close()
-    return results
+    with dbpool.connection(DB_NAME) as conn:
+        return conn.execute(
+            f"SELECT {CHANNEL_COLUMNS} FROM channels WHERE idminiapp = ?",
+            (idminiapp,)
+        ).fetchone()
+
+
+def find_channel_by_bot(username: str) -> Optional[str]:
+    """idminiapp канала, у которого idminiapp или ссылка (https://t.me/<username>/...) совпадает с ботом, или None."""
+    username = username.lower()
+    prefix = f"https://t.me/{username}/"
+    with dbpool.connection(DB_NAME) as conn:
+        row = conn.execute(
+            "SELECT idminiapp FROM channels WHERE idminiapp = ? OR SUBSTR(LOWER(url), 1, ?) = ? LIMIT 1",
+            (username, len(prefix), prefix),
+        ).fetchone()
+    return row[0] if row else None
+
+
+def get_channel_record(idminiapp: str, columns=CHANNEL_COLUMNS) -> Optional[Channel]:
+    """Канал по idminiapp как запись Channel."""
+    names = _record_projection(columns)
+    with dbpool.connection(DB_NAME) as conn:
+        row = conn.execute(f"SELECT {', '.join(names)} FROM channels WHERE idminiapp = ?", (idminiapp,)).fetchone()
+    return Channel.from_row(row, names) if row else None
+
+
+def iter_channel_records(category: Optional[str] = None, verified: Optional[bool] = None,
+                         order_by: str = "idminiapp", columns=CHANNEL_COLUMNS, page_size: int = 500):
+    """Как iter_channels, но отдаёт записи Channel (со screenshots, разбираемыми по требованию)."""
+    names = _record_projection(columns)
+    for row in iter_channels(category, verified, order_by, columns=names, page_size=page_size):
+        yield Channel.from_row(row, names)
+
+
+def _record_projection(columns) -> list:
+    names = _projection(columns)
+    if "idminiapp" not in names:
+        names.insert(0, "idminiapp")
+    unknown = [c for c in names if c not in RECORD_FIELDS]
+    if unknown:
+        raise ValueError(f"Нет в Channel: {', '.join(unknown)}")
+    return names
+
+
+def set_trending_scores(scores: dict) -> int:
+    """
+    Записывает channels.trending (см. events.py) одной транзакцией: scores — {idminiapp: балл},
+    у приложений не из scores — 0. Пишутся только изменившиеся значения. Возвращает число обновлённых строк.
+    Столбец не отслеживается журналом channel_changes и не трогает changed_at и поисковый индекс.
+    """
+    with dbpool.transaction(DB_NAME) as conn:
+        current = dict(conn.execute("SELECT idminiapp, trending FROM channels WHERE IFNULL(trending, 0) != 0"))
+        updates = [(score, idminiapp) for idminiapp, score in scores.items() if current.pop(idminiapp, 0) != score]
+        updates += [(0, idminiapp) for idminiapp in current]
+        return conn.executemany("UPDATE channels SET trending = ? WHERE idminiapp = ?", updates).rowcount
+
+
+def get_all_channels(columns: str = CHANNEL_COLUMNS) -> list:
+    """Возвращает список всех каналов (кортежи в порядке columns)."""
+    with dbpool.connection(DB_NAME) as conn:
+        return conn.execute(f"SELECT {columns} FROM channels ORDER BY rowid").fetchall()
 
 
 def update_channel(idminiapp: str, title: str = None, description: str = None,
                    icon: str = None, url: str = None, is_verified: bool = None, rating: float = None,
                    category: str = None, screenshots_path: str = None):
     """Обновляет данные канала."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
     updates = []
     params = []
     
     if title is not None:
         updates.append("title = ?")
         params.append(title)
+        updates.append("title_norm = ?")
+        params.append(normalize_title(title))
     if description is not None:
         updates.append("description = ?")
         params.append(description)
@@ -122,43 +404,184 @@ def update_channel(idminiapp: str, title: str = None, description: str = None,
         params.append(screenshots_path)
     
     if not updates:
-        conn.close()
         return False
     
     params.append(idminiapp)
-    cursor.execute(
-        f"UPDATE channels SET {', '.join(updates)} WHERE idminiapp = ?",
-        params
-    )
-    conn.commit()
-    affected = cursor.rowcount
-    conn.close()
-    return affected > 0
+    with dbpool.transaction(DB_NAME) as conn:
+        cursor = conn.execute(
+            f"UPDATE channels SET {', '.join(updates)} WHERE idminiapp = ?",
+            params
+        )
+    return cursor.rowcount > 0
 
 
 def delete_channel(idminiapp: str) -> bool:
     """Удаляет канал по idminiapp."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM channels WHERE idminiapp = ?", (idminiapp,))
-    conn.commit()
-    affected = cursor.rowcount
-    conn.close()
-    return affected > 0
+    with dbpool.transaction(DB_NAME) as conn:
+        cursor = conn.execute("DELETE FROM channels WHERE idminiapp = ?", (idminiapp,))
+    return cursor.rowcount > 0
+
+
+# Поля, которые можно передавать в bulk_update_channels / bulk_add_channels
+UPDATABLE_FIELDS = ("title", "description", "icon", "url", "is_verified", "rating", "category", "screenshots_path")
+
+
+def _chunks(rows: list, chunk_size: Optional[int]):
+    """Делит список на части по chunk_size (None — одна часть)."""
+    if not chunk_size:
+        yield rows
+        return
+    for i in range(0, len(rows), chunk_size):
+        yield rows[i:i + chunk_size]
+
+
+def _existing_ids(conn, ids: list) -> set:
+    """Какие из ids уже есть в channels (запросы по 500 — ниже лимита параметров SQLite)."""
+    found = set()
+    unique = list(dict.fromkeys(ids))
+    for i in range(0, len(unique), 500):
+        part = unique[i:i + 500]
+        placeholders = ", ".join("?" * len(part))
+        found.update(r[0] for r in conn.execute(
+            f"SELECT idminiapp FROM channels WHERE idminiapp IN ({placeholders})", part
+        ))
+    return found
+
+
+def bulk_update_channels(rows, chunk_size: Optional[int] = None) -> list:
+    """
+    Массовое обновление каналов в одной транзакции.
+    rows — итерируемое словарей вида {"idminiapp": "24", "screenshots_path": "...", ...};
+    значения None пропускаются, как в update_channel.
+    chunk_size — коммитить каждые N строк (None — один коммит на всё).
+    Возвращает список (idminiapp, affected) в порядке входных строк: affected — по rowcount UPDATE,
+    то есть строка есть и хотя бы одно значение в ней действительно изменилось.
+    """
+    rows = list(rows)
+    report = []
+    for chunk in _chunks(rows, chunk_size):
+        for row in chunk:
+            unknown = set(row) - set(UPDATABLE_FIELDS) - {"idminiapp"}
+            if unknown:
+                raise ValueError(f"Неизвестные поля: {', '.join(sorted(unknown))}")
+        with dbpool.transaction(DB_NAME) as conn:
+            # По запросу на строку: у executemany rowcount — только сумма по всем строкам.
+            # Текст запроса зависит лишь от набора полей, поэтому подготовленный запрос берётся из кэша соединения.
+            for row in chunk:
+                fields = tuple(f for f in UPDATABLE_FIELDS if row.get(f) is not None)
+                if not fields:
+                    report.append((row["idminiapp"], False))
+                    continue
+                values = [(1 if row[f] else 0) if f == "is_verified" else row[f] for f in fields]
+                sets = ", ".join(f"{f} = ?" for f in fields)
+                norm = []
+                if "title" in fields:
+                    sets += ", title_norm = ?"
+                    norm = [normalize_title(row["title"])]
+                # Строку с теми же значениями не переписываем: она не считается обновлённой и не трогает changed_at
+                changed = " OR ".join(f"{f} IS NOT ?" for f in fields)
+                cursor = conn.execute(
+                    f"UPDATE channels SET {sets} WHERE idminiapp = ? AND ({changed})",
+                    values + norm + [row["idminiapp"]] + values,
+                )
+                report.append((row["idminiapp"], cursor.rowcount > 0))
+    return report
+
+
+_ADD_DEFAULTS = {"description": "", "icon": "", "url": "", "is_verified": False, "rating": 0,
+                 "category": "Утилиты", "screenshots_path": ""}
+
+
+def _insert_channels(conn, rows: list) -> list:
+    """INSERT OR IGNORE строк-словарей в открытой транзакции. Возвращает [(idminiapp, added)]."""
+    existing = _existing_ids(conn, [row["idminiapp"] for row in rows])
+    params = []
+    report = []
+    for row in rows:
+        unknown = set(row) - set(UPDATABLE_FIELDS) - {"idminiapp"}
+        if unknown:
+            raise ValueError(f"Неизвестные поля: {', '.join(sorted(unknown))}")
+        values = {**_ADD_DEFAULTS, **row}
+        values["is_verified"] = 1 if values["is_verified"] else 0
+        params.append([values["idminiapp"]] + [values[f] for f in UPDATABLE_FIELDS]
+                      + [normalize_title(values["title"])])
+        # повтор idminiapp внутри пачки тоже не вставится
+        report.append((row["idminiapp"], row["idminiapp"] not in existing))
+        existing.add(row["idminiapp"])
+    conn.executemany(f"""
+        INSERT OR IGNORE INTO channels ({CHANNEL_COLUMNS}, title_norm)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, params)
+    return report
+
+
+def bulk_add_channels(rows, chunk_size: Optional[int] = None) -> list:
+    """
+    Массовое добавление каналов через executemany в одной транзакции.
+    rows — итерируемое словарей с ключами как у add_channel (idminiapp и title обязательны).
+    Уже существующие idminiapp пропускаются (INSERT OR IGNORE).
+    chunk_size — коммитить каждые N строк (None — один коммит на всё).
+    Возвращает список (idminiapp, added) в порядке входных строк.
+    """
+    rows = list(rows)
+    report = []
+    for chunk in _chunks(rows, chunk_size):
+        with dbpool.transaction(DB_NAME) as conn:
+            report.extend(_insert_channels(conn, chunk))
+    return report
+
+
+def _fts_query(query: str) -> str:
+    """Превращает пользовательский ввод в FTS5-запрос: все слова, каждое — как префикс."""
+    words = re.findall(r"\w+", query or "")
+    return " ".join('"' + w.replace('"', '""') + '"*' for w in words)
+
+
+def search_channels_ranked(query: str, limit: int = 20, offset: int = 0) -> list:
+    """
+    Полнотекстовый поиск по channels_fts с ранжированием bm25 и префиксным совпадением.
+    Возвращает кортежи: 9 столбцов канала (как get_channel), затем
+    название с подсветкой [..], фрагмент описания с подсветкой и ранг (меньше — релевантнее).
+    """
+    match = _fts_query(query)
+    if not match:
+        return []
+    with dbpool.connection(DB_NAME) as conn:
+        if not _fts_available:
+            return []
+        cols = ", ".join(f"c.{c.strip()}" for c in CHANNEL_COLUMNS.split(","))
+        return conn.execute(f"""
+            SELECT {cols},
+                   highlight(channels_fts, 0, '[', ']'),
+                   snippet(channels_fts, 1, '[', ']', '…', 16),
+                   bm25(channels_fts, ?, ?, ?) AS rank
+            FROM channels_fts
+            JOIN channels c ON c.rowid = channels_fts.rowid
+            WHERE channels_fts MATCH ?
+            ORDER BY rank
+            LIMIT ? OFFSET ?
+        """, (*FTS_WEIGHTS, match, limit, offset)).fetchall()
+
+
+def rebuild_search_index() -> int:
+    """Пересобирает channels_fts из channels (для старых БД, после VACUUM или ручных правок). Возвращает число строк."""
+    with dbpool.transaction(DB_NAME) as conn:
+        if not _fts_available:
+            return 0
+        conn.execute("INSERT INTO channels_fts(channels_fts) VALUES ('rebuild')")
+        conn.execute("INSERT INTO channels_fts(channels_fts) VALUES ('optimize')")
+        return conn.execute("SELECT COUNT(*) FROM channels").fetchone()[0]
 
 
 def search_channels(query: str) -> list:
-    """Поиск каналов по названию или описанию."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    _ensure_columns(cursor)
-    conn.commit()
+    """
+    Поиск каналов по подстроке в названии или описании (LIKE, без ранжирования и ограничения числа строк).
+    Поиск по словам с ранжированием — search_channels_ranked().
+    """
     search_pattern = f"%{query}%"
-    cursor.execute("""
-        SELECT idminiapp, title, description, icon, url, is_verified, rating, category, screenshots_path 
-        FROM channels 
-        WHERE title LIKE ? OR description LIKE ?
-    """, (search_pattern, search_pattern))
-    results = cursor.fetchall()
-    conn.close()
-    return results
+    with dbpool.connection(DB_NAME) as conn:
+        return conn.execute(f"""
+            SELECT {CHANNEL_COLUMNS}
+            FROM channels 
+            WHERE title LIKE ? OR description LIKE ?
+        """, (search_pattern, search_pattern)).fetchall()
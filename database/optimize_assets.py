@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Готовит уменьшенные WebP-копии иконок и скриншотов, чтобы витрина не грузила оригиналы:
+- иконки (channels.icon): icon64, icon128, icon256 — вписаны в квадрат;
+- скриншоты (screenshots_path): thumb 185x325 для списков и detail 370x650 для карточки.
+Копии пишутся в asset_variants/ под именем <хэш содержимого>_<вариант>.webp, их размеры и вес —
+в таблицу asset_variants (telegram_channels.db). Файлы кодируются параллельно; по кэшу image_cache.db
+повторный запуск обрабатывает только новые и изменённые оригиналы. Копия не крупнее оригинала
+сохраняется, только если весит заметно меньше, — иначе витрине отдаётся сам оригинал.
+Запуск: cd database && python3 optimize_assets.py [--workers N] [--force]
+Требуется: pip install Pillow
+"""
+
+import argparse
+import hashlib
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+try:
+    from PIL import Image
+except ImportError:
+    print("Установите Pillow: python3 -m pip install Pillow")
+    raise
+
+import asset_variants  # noqa: F401 — таблица asset_variants
+import dbpool
+import image_cache
+import query_profile
+from mainbd import DB_NAME, ICONS_FOLDER, iter_channel_records
+
+VARIANTS_DIR = os.path.join(os.path.dirname(os.path.abspath(ICONS_FOLDER)), "asset_variants")
+
+# вид файла -> вариант -> (макс. ширина, макс. высота, качество WebP)
+VARIANT_SPECS = {
+    "icon": {
+        "icon64": (64, 64, 82),
+        "icon128": (128, 128, 80),
+        "icon256": (256, 256, 80),
+    },
+    "screenshot": {
+        "thumb": (185, 325, 72),
+        "detail": (370, 650, 80),
+    },
+}
+# Копия в исходном размере нужна, только если она легче оригинала хотя бы на 10%
+MIN_SAVING = 0.9
+WEBP_METHOD = 6
+# Версия вариантов в image_cache: увеличьте при изменении VARIANT_SPECS или кодирования
+VARIANTS_VERSION = 1
+
+
+def variant_file(source_hash: str, variant: str) -> str:
+    return f"{source_hash}_{variant}.webp"
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def render_variants(path: str, kind: str, out_dir: str = VARIANTS_DIR) -> dict:
+    """
+    Декодирует файл один раз и пишет все варианты вида kind. Возвращает
+    {"hash", "width", "height", "bytes", "variants": {вариант: {"file", "width", "height", "bytes"}}}
+    или {"error": "..."}.
+    """
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+        source_hash = hashlib.blake2b(data, digest_size=16).hexdigest()  # как image_cache.content_hash
+        with Image.open(io.BytesIO(data)) as img:
+            img.load()
+            width, height = img.size
+            if img.mode not in ("RGB", "RGBA"):
+                img = img.convert("RGBA" if "A" in img.mode or "transparency" in img.info else "RGB")
+            variants = {}
+            for variant, (max_w, max_h, quality) in VARIANT_SPECS[kind].items():
+                scale = min(max_w / width, max_h / height, 1.0)
+                size = (max(1, round(width * scale)), max(1, round(height * scale)))
+                resized = img if size == img.size else img.resize(size, Image.Resampling.LANCZOS, reducing_gap=3.0)
+                buf = io.BytesIO()
+                resized.save(buf, "WEBP", quality=quality, method=WEBP_METHOD)
+                encoded = buf.getvalue()
+                if size == img.size and len(encoded) > len(data) * MIN_SAVING:
+                    continue
+                name = variant_file(source_hash, variant)
+                target = os.path.join(out_dir, name)
+                if not os.path.exists(target):
+                    _write_atomic(target, encoded)
+                variants[variant] = {"file": name, "width": size[0], "height": size[1], "bytes": len(encoded)}
+    except Exception as e:
+        return {"error": str(e)}
+    return {"hash": source_hash, "width": width, "height": height, "bytes": len(data), "variants": variants}
+
+
+def render_files(names, kind: str, workers: int = None) -> dict:
+    """Варианты для списка файлов из ICONS_FOLDER параллельно; workers=1 — в текущем процессе."""
+    names = list(names)
+    paths = [os.path.join(ICONS_FOLDER, name) for name in names]
+    render = partial(render_variants, kind=kind)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(names) < 2:
+        return dict(zip(names, map(render, paths)))
+    chunksize = max(1, len(paths) // (workers * 8))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return dict(zip(names, pool.map(render, paths, chunksize=chunksize)))
+
+
+def referenced_assets() -> dict:
+    """{вид: имена файлов}, на которые ссылается каталог (только существующие локальные файлы)."""
+    icons, screenshots = set(), set()
+    for ch in iter_channel_records(columns="idminiapp, icon, screenshots_path"):
+        if ch.icon and not ch.icon.startswith(("http://", "https://")):
+            icons.add(ch.icon)
+        screenshots.update(ch.screenshots)
+    return {
+        kind: sorted(n for n in names if os.path.isfile(os.path.join(ICONS_FOLDER, n)))
+        for kind, names in (("icon", icons), ("screenshot", screenshots))
+    }
+
+
+def build_variants(kind: str, names: list, workers: int = None, force: bool = False) -> dict:
+    compute = partial(render_files, kind=kind, workers=workers)
+    if force:
+        results = compute(names)
+    else:
+        results = image_cache.get_features(names, compute, kind=f"variants_{kind}", version=VARIANTS_VERSION)
+    # Кэш помнит результат, но папку с копиями могли очистить — такие файлы кодируем заново
+    missing = [
+        name for name, r in results.items()
+        if any(not os.path.exists(os.path.join(VARIANTS_DIR, v["file"])) for v in r.get("variants", {}).values())
+    ]
+    if missing:
+        results.update(compute(missing))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Готовит уменьшенные WebP-копии иконок и скриншотов.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="число процессов для кодирования (по умолчанию — число ядер)")
+    parser.add_argument("--force", action="store_true", help="перекодировать всё, не глядя в кэш")
+    parser.add_argument("--profile", action="store_true", help="сводка по SQL-запросам при выходе (query_profile)")
+    args = parser.parse_args(argv)
+    if args.profile:
+        query_profile.enable()
+
+    if not os.path.isdir(ICONS_FOLDER):
+        print("Папка с иконками/скринами не найдена:", ICONS_FOLDER)
+        return
+    os.makedirs(VARIANTS_DIR, exist_ok=True)
+
+    rows = []
+    keep = set()
+    for kind, names in referenced_assets().items():
+        results = build_variants(kind, names, workers=args.workers, force=args.force)
+        original_total = variant_total = errors = 0
+        smallest = next(iter(VARIANT_SPECS[kind]))
+        for name, r in results.items():
+            if "error" in r:
+                errors += 1
+                continue
+            rows.append((name, "original", name, r["width"], r["height"], r["bytes"], r["hash"]))
+            for variant, v in r["variants"].items():
+                rows.append((name, variant, v["file"], v["width"], v["height"], v["bytes"], r["hash"]))
+                keep.add(v["file"])
+            original_total += r["bytes"]
+            variant_total += r["variants"].get(smallest, {}).get("bytes", r["bytes"])
+        print(f"{kind}: файлов {len(results)}, ошибок {errors}; "
+              f"оригиналы {original_total // 1024} КБ -> {smallest} {variant_total // 1024} КБ")
+
+    with dbpool.transaction(DB_NAME) as conn:
+        conn.execute("DELETE FROM asset_variants")
+        conn.executemany("""
+            INSERT OR REPLACE INTO asset_variants (name, variant, file, width, height, bytes, source_hash)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, rows)
+
+    removed = 0
+    for name in os.listdir(VARIANTS_DIR):
+        if name.endswith(".webp") and name not in keep:
+            os.remove(os.path.join(VARIANTS_DIR, name))
+            removed += 1
+    print(f"Записей в asset_variants: {len(rows)}; удалено устаревших копий: {removed}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Заявки на добавление приложений: таблица pending_channels в telegram_channels.db.
+
+Заявки ставит бот (bot_intake.py), владелец одобряет или отклоняет их командами бота.
+Одобренные переносятся в channels через mainbd.bulk_add_channels в той же транзакции, что и удаление заявок.
+
+Использование:
+    pending_id = add_pending_channel({"idminiapp": "notcoin_bot", "title": "Notcoin", "submitted_by": "42"})
+    for pending_id, idminiapp, added in approve_pending_channels([pending_id]):
+        ...
+"""
+
+import sqlite3
+from typing import Optional
+
+import dbpool
+from mainbd import DB_NAME, bulk_add_channels
+
+_NOW_SQL = "strftime('%Y-%m-%d %H:%M:%f', 'now')"
+
+PENDING_FIELDS = ("idminiapp", "title", "description", "icon", "url", "category", "screenshots_path",
+                  "contact", "submitted_by")
+
+
+def _ensure_schema(conn):
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS pending_channels (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            idminiapp TEXT NOT NULL UNIQUE,
+            title TEXT NOT NULL,
+            description TEXT,
+            icon TEXT,
+            url TEXT,
+            category TEXT,
+            screenshots_path TEXT,
+            contact TEXT,
+            submitted_by TEXT,
+            created_at TEXT DEFAULT ({_NOW_SQL})
+        )
+    """)
+
+
+dbpool.register_schema(_ensure_schema)
+
+
+def add_pending_channel(row: dict) -> Optional[int]:
+    """
+    Ставит заявку (из бота) в pending_channels. Возвращает id заявки или None,
+    если заявка с таким idminiapp уже ждёт решения.
+    """
+    unknown = set(row) - set(PENDING_FIELDS)
+    if unknown:
+        raise ValueError(f"Неизвестные поля: {', '.join(sorted(unknown))}")
+    fields = [f for f in PENDING_FIELDS if f in row]
+    try:
+        with dbpool.transaction(DB_NAME) as conn:
+            cur = conn.execute(
+                f"INSERT INTO pending_channels ({', '.join(fields)}) VALUES ({', '.join('?' * len(fields))})",
+                [row[f] for f in fields],
+            )
+            return cur.lastrowid
+    except sqlite3.IntegrityError:
+        return None
+
+
+def get_pending_channels(ids=None) -> list:
+    """Заявки из pending_channels (все или по списку id) как словари, по порядку поступления."""
+    columns = ("id",) + PENDING_FIELDS + ("created_at",)
+    sql = f"SELECT {', '.join(columns)} FROM pending_channels"
+    params = []
+    if ids is not None:
+        params = [int(i) for i in ids]
+        sql += f" WHERE id IN ({', '.join('?' * len(params))})" if params else " WHERE 0"
+    with dbpool.connection(DB_NAME) as conn:
+        return [dict(zip(columns, row)) for row in conn.execute(sql + " ORDER BY id", params)]
+
+
+def approve_pending_channels(ids=None) -> list:
+    """
+    Переносит заявки (все или по списку id) в channels одной транзакцией.
+    Добавленные удаляются из pending_channels; заявки, чей idminiapp уже есть в каталоге, остаются.
+    Возвращает список (id заявки, idminiapp, added).
+    """
+    pending = get_pending_channels(ids)
+    if not pending:
+        return []
+    rows = [
+        {f: p[f] for f in ("idminiapp", "title", "description", "icon", "url", "category", "screenshots_path")
+         if p[f] is not None}
+        for p in pending
+    ]
+    with dbpool.transaction(DB_NAME) as conn:
+        report = bulk_add_channels(rows)  # присоединяется к этой транзакции
+        conn.executemany("DELETE FROM pending_channels WHERE id = ?",
+                         [(p["id"],) for p, (_, added) in zip(pending, report) if added])
+    return [(p["id"], idminiapp, added) for p, (idminiapp, added) in zip(pending, report)]
+
+
+def reject_pending_channel(pending_id: int) -> Optional[dict]:
+    """Удаляет заявку и возвращает её (чтобы вызывающий удалил файлы) или None, если её нет."""
+    found = get_pending_channels([pending_id])
+    if not found:
+        return None
+    with dbpool.transaction(DB_NAME) as conn:
+        conn.execute("DELETE FROM pending_channels WHERE id = ?", (pending_id,))
+    return found[0]
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Конвейер обслуживания каталога: один проход по channels через цепочку шагов и одна транзакция записи.
+
+Шаги (по порядку): dedupe-title (remove_duplicate_channels.py), screenshots (dedupe_screenshots.py),
+anomalies (filter_anomaly_screenshots.py), categories (fix_categories.py), translate
+(translate_descriptions_to_russian.py). Каждый скрипт описывает свой шаг — класс Stage — и без
+особых режимов запускает конвейер из одного этого шага.
+
+Строки читаются пачками по --chunk; для пачки шаги выполняются по очереди: сначала prepare по всей пачке
+(декодирование картинок, перевод — пакетно и параллельно), затем apply по каждой строке. Изменения всех
+шагов копятся и пишутся одной транзакцией в конце; --dry-run печатает их построчно и ничего не пишет.
+Запуск: из папки database: python3 pipeline.py [--stages dedupe-title screenshots ...] [--dry-run]
+"""
+import argparse
+import importlib
+import sys
+import time
+
+import dbpool
+import query_profile
+from mainbd import DB_NAME, UPDATABLE_FIELDS, bulk_update_channels
+
+# apply() возвращает DELETE, чтобы удалить строку (следующие шаги её уже не видят)
+DELETE = "delete"
+CHUNK_SIZE = 2000
+DIFF_WIDTH = 70
+
+# Имя шага -> модуль с make_stage(args) (импорт по требованию: у шагов разные зависимости)
+STAGE_MODULES = {
+    "dedupe-title": "remove_duplicate_channels",
+    "screenshots": "dedupe_screenshots",
+    "anomalies": "filter_anomaly_screenshots",
+    "categories": "fix_categories",
+    "translate": "translate_descriptions_to_russian",
+}
+
+
+class Stage:
+    """
+    Шаг конвейера. columns — столбцы channels, которые шаг читает и меняет (idminiapp есть всегда).
+    Строка — dict столбцов; apply меняет её на месте или возвращает DELETE.
+    """
+
+    name = ""
+    columns = ()
+
+    def prepare(self, rows: list) -> None:
+        """Пакетная подготовка пачки строк перед apply (по умолчанию ничего)."""
+
+    def apply(self, row: dict):
+        raise NotImplementedError
+
+    def report(self) -> list:
+        """Строки для итогового отчёта шага."""
+        return []
+
+    def commit(self) -> None:
+        """Вызывается после успешной записи (не при --dry-run): чекпоинты, состояние между запусками."""
+
+
+def load_stage(name: str, args=None) -> Stage:
+    """Шаг по имени из STAGE_MODULES; args — разобранные аргументы конвейера (для настроек шага)."""
+    module = importlib.import_module(STAGE_MODULES[name])
+    return module.make_stage(args)
+
+
+def _short(value) -> str:
+    text = repr(value)
+    return text if len(text) <= DIFF_WIDTH else text[:DIFF_WIDTH - 3] + "..."
+
+
+def run(stages: list, dry_run: bool = False, chunk_size: int = CHUNK_SIZE, show_diff: bool = None,
+        where: tuple = None) -> dict:
+    """
+    Прогоняет строки channels через stages и записывает итог одной транзакцией (если не dry_run).
+    show_diff — печатать изменения построчно (по умолчанию — при dry_run).
+    where — (условие SQL, параметры), чтобы пройти не все строки (например, только изменившиеся).
+    Возвращает {"updated", "deleted", "timings": {шаг: секунды}, "changes": [...], "deletes": [...]}.
+    """
+    show_diff = dry_run if show_diff is None else show_diff
+    columns = ["idminiapp"] + sorted({c for stage in stages for c in stage.columns} - {"idminiapp"})
+    timings = {"чтение": 0.0, **{stage.name: 0.0 for stage in stages}, "запись": 0.0}
+    per_stage = {stage.name: [0, 0] for stage in stages}  # изменено, удалено
+    changes, deletes = [], []
+    scanned = 0
+
+    with dbpool.connection(DB_NAME) as conn:
+        condition, params = where or ("1", ())
+        cursor = conn.execute(f"SELECT {', '.join(columns)} FROM channels WHERE {condition} ORDER BY rowid", params)
+        while True:
+            started = time.perf_counter()
+            chunk = cursor.fetchmany(chunk_size)
+            timings["чтение"] += time.perf_counter() - started
+            if not chunk:
+                break
+            scanned += len(chunk)
+            originals = [dict(zip(columns, values)) for values in chunk]
+            rows = [dict(row) for row in originals]
+            alive = list(range(len(rows)))
+            for stage in stages:
+                started = time.perf_counter()
+                stage.prepare([rows[i] for i in alive])
+                kept = []
+                for i in alive:
+                    row = rows[i]
+                    before = [row.get(c) for c in stage.columns]
+                    if stage.apply(row) == DELETE:
+                        per_stage[stage.name][1] += 1
+                        deletes.append((originals[i], stage.name))
+                        continue
+                    if [row.get(c) for c in stage.columns] != before:
+                        per_stage[stage.name][0] += 1
+                    kept.append(i)
+                alive = kept
+                timings[stage.name] += time.perf_counter() - started
+            for i in alive:
+                diff = {c: rows[i][c] for c in columns if c in UPDATABLE_FIELDS and rows[i][c] != originals[i][c]}
+                if diff:
+                    changes.append(({"idminiapp": rows[i]["idminiapp"], **diff}, originals[i]))
+
+    if show_diff:
+        for original, stage_name in deletes:
+            print(f"- {original['idminiapp']} ({stage_name}): {_short(original.get('title'))}")
+        for change, original in changes:
+            print(f"~ {change['idminiapp']}")
+            for field, value in change.items():
+                if field != "idminiapp":
+                    print(f"    {field}: {_short(original[field])} → {_short(value)}")
+
+    updated = 0
+    if not dry_run and (changes or deletes):
+        started = time.perf_counter()
+        # Удаления и обновления всех шагов — одним коммитом
+        with dbpool.transaction(DB_NAME) as conn:
+            conn.executemany("DELETE FROM channels WHERE idminiapp = ?", [(o["idminiapp"],) for o, _ in deletes])
+            updated = sum(1 for _, affected in bulk_update_channels(change for change, _ in changes) if affected)
+        timings["запись"] = time.perf_counter() - started
+    if not dry_run:
+        for stage in stages:
+            stage.commit()
+
+    print(f"\nПросмотрено строк: {scanned}")
+    for stage in stages:
+        changed, deleted = per_stage[stage.name]
+        print(f"  {stage.name}: изменено {changed}, удалено {deleted}, {timings[stage.name]:.2f} с")
+        for line in stage.report():
+            print(f"    {line}")
+    print(f"  чтение {timings['чтение']:.2f} с, запись {timings['запись']:.2f} с")
+    if dry_run:
+        print(f"--dry-run: к обновлению {len(changes)}, к удалению {len(deletes)}; ничего не записано.")
+    else:
+        print(f"Обновлено записей: {updated}, удалено: {len(deletes)}")
+    return {
+        "updated": updated,
+        "deleted": 0 if dry_run else len(deletes),
+        "timings": timings,
+        "changes": [change for change, _ in changes],
+        "deletes": [o["idminiapp"] for o, _ in deletes],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Один проход обслуживания каталога через цепочку шагов.")
+    parser.add_argument("--stages", nargs="+", choices=list(STAGE_MODULES), default=list(STAGE_MODULES),
+                        help="какие шаги выполнить (по умолчанию все; порядок всегда как в этом списке)")
+    parser.add_argument("--dry-run", action="store_true", help="только отчёт с изменениями, без записи")
+    parser.add_argument("--diff", action="store_true", help="печатать изменения построчно и без --dry-run")
+    parser.add_argument("--chunk", type=int, default=CHUNK_SIZE, help="строк в пачке")
+    parser.add_argument("--fuzzy-titles", type=float, nargs="?", const=0.8, default=None, metavar="THRESHOLD",
+                        help="dedupe-title: удалять и почти одинаковые названия (порог Жаккара, по умолчанию 0.8)")
+    parser.add_argument("--workers", type=int, default=None, help="процессов для анализа изображений (anomalies)")
+    parser.add_argument("--no-cache", action="store_true", help="anomalies: не использовать image_cache.db")
+    parser.add_argument("--rules", default=None, help="файл правил для categories")
+    parser.add_argument("--backend", default="google", help="переводчик для translate (google, mock)")
+    parser.add_argument("--rate", type=float, default=5.0, help="запросов к переводчику в секунду")
+    parser.add_argument("--concurrency", type=int, default=8, help="одновременных запросов к переводчику")
+    parser.add_argument("--profile", action="store_true", help="сводка по SQL-запросам при выходе (query_profile)")
+    args = parser.parse_args(argv)
+    if args.profile:
+        query_profile.enable()
+
+    # Порядок шагов — как в STAGE_MODULES, сколько бы раз и в каком порядке их ни перечислили
+    names = [name for name in STAGE_MODULES if name in args.stages]
+    try:
+        stages = [load_stage(name, args) for name in names]
+    except ImportError as e:
+        print(f"Не хватает зависимости для шага: {e}")
+        sys.exit(1)
+    run(stages, dry_run=args.dry_run, chunk_size=args.chunk, show_diff=args.diff or None)
+
+
+if __name__ == "__main__":
+    main()
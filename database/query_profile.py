@@ -0,0 +1,231 @@
+"""
+Профилирование запросов к SQLite через подключения dbpool.
+
+Включается переменной окружения MAINBD_PROFILE=1, флагом --profile у скриптов обслуживания
+или вызовом enable(). Пока профилирование выключено, dbpool открывает обычные sqlite3.Connection,
+и накладных расходов нет.
+
+Для каждого текста запроса собирается число выполнений, суммарное и максимальное время
+(execute вместе с чтением строк), число возвращённых строк и шагов виртуальной машины SQLite
+(по progress handler, в тысячах). Запросы дольше MAINBD_SLOW_MS (по умолчанию 100 мс) сразу
+пишутся в stderr вместе с EXPLAIN QUERY PLAN. Сводка печатается при выходе из процесса.
+
+Использование:
+    MAINBD_PROFILE=1 MAINBD_SLOW_MS=20 python3 fix_categories.py --full
+    python3 dedupe_screenshots.py --profile
+"""
+
+import atexit
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+import dbpool
+
+ENV_VAR = "MAINBD_PROFILE"
+SLOW_MS = float(os.environ.get("MAINBD_SLOW_MS", 100))
+# progress handler вызывается раз в PROGRESS_STEPS инструкций VDBE
+PROGRESS_STEPS = 1000
+_PLANNABLE = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE", "REPLACE")
+
+_stats = {}  # текст запроса -> [выполнений, сумма сек, максимум сек, строк, шагов/1000]
+_lock = threading.Lock()
+_enabled = False
+_report_registered = False
+
+
+def _normalize(sql: str) -> str:
+    return " ".join(sql.split())
+
+
+def _record(sql: str, seconds: float, rows: int, steps: int, cursor_conn, params) -> None:
+    key = _normalize(sql)
+    with _lock:
+        entry = _stats.get(key)
+        if entry is None:
+            entry = _stats[key] = [0, 0.0, 0.0, 0, 0]
+        entry[0] += 1
+        entry[1] += seconds
+        entry[2] = max(entry[2], seconds)
+        entry[3] += rows
+        entry[4] += steps
+    if seconds * 1000 >= SLOW_MS:
+        _log_slow(key, seconds, rows, cursor_conn, params)
+
+
+def _log_slow(sql: str, seconds: float, rows: int, conn, params) -> None:
+    lines = [f"[медленный запрос] {seconds * 1000:.1f} мс, строк {rows}: {sql[:500]}"]
+    if sql.lstrip().upper().startswith(_PLANNABLE):
+        try:
+            # Базовый курсор: сам EXPLAIN не должен попадать в статистику
+            plan = sqlite3.Cursor(conn).execute("EXPLAIN QUERY PLAN " + sql, params or ()).fetchall()
+            lines += [f"    {detail}" for *_, detail in plan]
+        except (sqlite3.Error, ValueError):
+            pass
+    print("\n".join(lines), file=sys.stderr)
+
+
+class ProfilingCursor(sqlite3.Cursor):
+    """Курсор, который замеряет каждый запрос от execute до последней прочитанной строки."""
+
+    _sql = None
+
+    def _start(self, sql: str, params) -> None:
+        self._finish()
+        self._sql, self._params = sql, params
+        self._elapsed, self._rows, self._steps = 0.0, 0, 0
+
+    def _finish(self) -> None:
+        if self._sql is not None:
+            sql, self._sql = self._sql, None
+            _record(sql, self._elapsed, self._rows, self._steps, self.connection, self._params)
+
+    def _timed(self, method, *args):
+        conn = self.connection
+        steps = conn._steps
+        started = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            self._elapsed += time.perf_counter() - started
+            self._steps += conn._steps - steps
+
+    def execute(self, sql, parameters=()):
+        self._start(sql, parameters)
+        self._timed(super().execute, sql, parameters)
+        if self.description is None:  # не SELECT: строк не будет
+            self._finish()
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        seq = list(seq_of_parameters)
+        self._start(sql, seq[0] if seq else ())
+        self._timed(super().executemany, sql, seq)
+        self._finish()
+        return self
+
+    def executescript(self, sql_script):
+        self._start(sql_script, None)
+        self._timed(super().executescript, sql_script)
+        self._finish()
+        return self
+
+    def fetchone(self):
+        row = self._timed(super().fetchone)
+        if row is None:
+            self._finish()
+        elif self._sql is not None:
+            self._rows += 1
+        return row
+
+    def fetchmany(self, size=None):
+        rows = self._timed(super().fetchmany, self.arraysize if size is None else size)
+        if self._sql is not None:
+            self._rows += len(rows)
+            if not rows:
+                self._finish()
+        return rows
+
+    def fetchall(self):
+        rows = self._timed(super().fetchall)
+        if self._sql is not None:
+            self._rows += len(rows)
+            self._finish()
+        return rows
+
+    def __next__(self):
+        try:
+            row = self._timed(super().__next__)
+        except StopIteration:
+            self._finish()
+            raise
+        if self._sql is not None:
+            self._rows += 1
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        # conn.execute(...).fetchone() бросает курсор, не дочитав: запрос учитываем здесь
+        try:
+            self._finish()
+        except Exception:
+            pass
+
+
+class ProfilingConnection(sqlite3.Connection):
+    """Подключение, все курсоры которого — ProfilingCursor; считает шаги VDBE."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._steps = 0
+        self.set_progress_handler(self._progress, PROGRESS_STEPS)
+
+    def _progress(self):
+        self._steps += 1
+        return 0
+
+    def cursor(self, factory=ProfilingCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self.cursor().executescript(sql_script)
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def enable(report_at_exit: bool = True) -> None:
+    """Включает профилирование для всех подключений dbpool (уже открытые переоткрываются)."""
+    global _enabled, _report_registered
+    if not _enabled:
+        _enabled = True
+        dbpool.set_connection_factory(ProfilingConnection)
+    if report_at_exit and not _report_registered:
+        _report_registered = True
+        atexit.register(print_summary)
+
+
+def reset() -> None:
+    with _lock:
+        _stats.clear()
+
+
+def summary() -> list:
+    """Статистика по запросам, по убыванию суммарного времени."""
+    with _lock:
+        items = [(sql, list(v)) for sql, v in _stats.items()]
+    rows = [
+        {"sql": sql, "count": count, "total_ms": total * 1000, "avg_ms": total * 1000 / count,
+         "max_ms": worst * 1000, "rows": rows, "ksteps": steps}
+        for sql, (count, total, worst, rows, steps) in items
+    ]
+    rows.sort(key=lambda r: r["total_ms"], reverse=True)
+    return rows
+
+
+def print_summary(limit: int = 20, file=None) -> None:
+    file = file or sys.stderr
+    rows = summary()
+    if not rows:
+        return
+    total = sum(r["total_ms"] for r in rows)
+    print(f"\nSQL: запросов {sum(r['count'] for r in rows)}, разных {len(rows)}, всего {total:.1f} мс", file=file)
+    print(f"{'всего мс':>10} {'раз':>7} {'сред. мс':>9} {'макс. мс':>9} {'строк':>9} {'kшагов':>8}  запрос", file=file)
+    for r in rows[:limit]:
+        sql = r["sql"] if len(r["sql"]) <= 100 else r["sql"][:97] + "..."
+        print(f"{r['total_ms']:>10.1f} {r['count']:>7} {r['avg_ms']:>9.3f} {r['max_ms']:>9.1f} "
+              f"{r['rows']:>9} {r['ksteps']:>8}  {sql}", file=file)
+    if len(rows) > limit:
+        print(f"... и ещё {len(rows) - limit}", file=file)
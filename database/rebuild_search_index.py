@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+"""
+Пересобирает полнотекстовый индекс channels_fts (FTS5) по названию и описаниям.
+Нужно для старых БД, после VACUUM или правок БД инструментами без поддержки FTS5.
+Запуск: из папки database: python3 rebuild_search_index.py
+Проверка поиска: python3 rebuild_search_index.py --search "vpn"
+--profile (первым аргументом) — сводка по SQL-запросам при выходе.
+"""
+import sys
+
+import query_profile
+from mainbd import rebuild_search_index, search_channels_ranked
+
+
+def main():
+    if sys.argv[1:2] == ["--profile"]:
+        del sys.argv[1]
+        query_profile.enable()
+    if len(sys.argv) >= 3 and sys.argv[1] == "--search":
+        query = " ".join(sys.argv[2:])
+        for row in search_channels_ranked(query):
+            idminiapp, title_hl, snippet, rank = row[0], row[9], row[10], row[11]
+            print(f"{rank:8.3f}  {idminiapp}: {title_hl} — {snippet}")
+        return
+
+    count = rebuild_search_index()
+    print(f"Индекс пересобран, строк: {count}")
+
+
+if __name__ == "__main__":
+    main()
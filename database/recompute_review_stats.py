@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Пересчитывает агрегаты отзывов (review_stats) с нуля. Обычно их поддерживают триггеры,
+пересчёт нужен после импорта отзывов или правок инструментами, которые триггеры обходят.
+С --sync-ratings средняя оценка записывается в channels.rating (приложения без отзывов не трогаются).
+Запуск: из папки database: python3 recompute_review_stats.py [--db reviews.db] [--sync-ratings]
+"""
+import argparse
+import os
+import sys
+
+import query_profile
+from mainbd import bulk_update_channels
+from reviews import REVIEWS_DB, get_all_review_stats, recompute_review_stats, register_db
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Пересчитывает агрегаты отзывов.")
+    parser.add_argument("--db", default=REVIEWS_DB, help="БД с таблицей reviews")
+    parser.add_argument("--sync-ratings", action="store_true", help="записать средние оценки в channels.rating")
+    parser.add_argument("--profile", action="store_true", help="сводка по SQL-запросам при выходе (query_profile)")
+    args = parser.parse_args(argv)
+    if args.profile:
+        query_profile.enable()
+
+    if not os.path.exists(args.db):
+        print(f"БД не найдена: {args.db}")
+        sys.exit(1)
+
+    register_db(args.db)
+    apps = recompute_review_stats(args.db)
+    print(f"Приложений с отзывами: {apps}")
+
+    if args.sync_ratings:
+        stats = get_all_review_stats(args.db)
+        changes = [{"idminiapp": idminiapp, "rating": s["average"]} for idminiapp, s in stats.items()]
+        updated = sum(1 for _, affected in bulk_update_channels(changes) if affected)
+        print(f"Рейтингов обновлено в channels: {updated}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,64 +2,182 @@
 """
 Находит дубликаты приложений по названию (title) и удаляет те, что добавлены позже.
 Оставляется запись с минимальным rowid (первая вставленная).
+
+Точные дубликаты — по индексированному столбцу title_norm (без пробелов по краям, без учёта регистра),
+одним SQL-запросом: для каждой лишней строки сразу известна оставляемая. Режим --fuzzy
+дополнительно ловит почти одинаковые названия («Notcoin» и «NotCoin 🚀»): кандидаты отбираются MinHash LSH
+по символьным n-граммам, поэтому не нужно сравнивать каждое название с каждым.
+Это шаг dedupe-title конвейера pipeline.py: строки проходят один раз, удаление — одной транзакцией.
+Запуск: из папки database: python3 remove_duplicate_channels.py [--fuzzy] [--threshold 0.8] [--dry-run]
 """
+import argparse
 import os
+import random
+import re
 import sys
+import zlib
+
+import dbpool
+import query_profile
+from mainbd import DB_NAME, normalize_title, refresh_title_norms
+from pipeline import DELETE, Stage, run
+
+# Параметры MinHash LSH: BANDS * ROWS хэш-функций; пара становится кандидатом, если совпала хотя бы одна полоса
+NGRAM = 3
+# Короче стольких букв и цифр n-грамм слишком мало («xRocket» и «Rocket» дают Жаккара 0.8) — такие
+# названия считаются похожими, только если fuzzy_key совпадает целиком
+MIN_FUZZY_LENGTH = 8
+BANDS = 16
+ROWS = 4
+_PRIME = (1 << 61) - 1
+_rng = random.Random(20240601)
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(BANDS * ROWS)]
+
+# Точные дубликаты и первая (по rowid) строка с тем же title_norm: группы — проходом по покрывающему
+# индексу idx_channels_title_norm, строки групп — поиском по нему же
+DUPLICATES_SQL = """
+    WITH groups AS (
+        SELECT title_norm, MIN(rowid) AS keep FROM channels
+        WHERE title_norm != '' GROUP BY title_norm HAVING COUNT(*) > 1
+    )
+    SELECT c.idminiapp, c.title, p.idminiapp, p.title
+    FROM groups AS g
+    JOIN channels AS c ON c.title_norm = g.title_norm AND c.rowid > g.keep
+    JOIN channels AS p ON p.rowid = g.keep
+"""
+
+
+def fuzzy_key(title: str) -> str:
+    """Только буквы и цифры в нижнем регистре: эмодзи, пунктуация и пробелы не влияют."""
+    return "".join(re.findall(r"[^\W_]+", (title or "").casefold()))
+
+
+def shingles(key: str) -> set:
+    if len(key) <= NGRAM:
+        return {key} if key else set()
+    return {key[i:i + NGRAM] for i in range(len(key) - NGRAM + 1)}
+
+
+def minhash(items: set) -> list:
+    hashed = [zlib.crc32(s.encode("utf-8")) for s in items]
+    return [min((a * h + b) % _PRIME for h in hashed) for a, b in _PERMUTATIONS]
+
+
+def jaccard(a: set, b: set) -> float:
+    return len(a & b) / len(a | b) if a or b else 1.0
 
-DB_NAME = os.path.join(os.path.dirname(__file__), "telegram_channels.db")
 
+class TitleDedupeStage(Stage):
+    """
+    Шаг конвейера: удаляет приложение, если раньше (по rowid) уже было такое же название,
+    а с fuzzy_threshold — и почти такое же. Кандидаты — оставшиеся (не удалённые) строки с совпавшей
+    полосой MinHash, подтверждаются совпадением fuzzy_key или, для ключей от MIN_FUZZY_LENGTH символов,
+    коэффициентом Жаккара по n-граммам.
+    """
+
+    name = "dedupe-title"
+    columns = ("title",)
+
+    def __init__(self, fuzzy_threshold: float = None):
+        self.threshold = fuzzy_threshold
+        self.duplicates = None  # idminiapp точного дубликата -> (idminiapp, title) оставляемой строки
+        self.exact_matches = []  # (удалённая строка, оставленная строка): (idminiapp, title)
+        self.buckets = {}  # (полоса, значения) -> [(fuzzy_key, n-граммы, idminiapp, title)] оставленных строк
+        self.exact = self.fuzzy = 0
+        self.fuzzy_matches = []  # (удалённая строка, оставленная строка): (idminiapp, title)
+
+    def prepare(self, rows: list) -> None:
+        if self.duplicates is None:
+            self.duplicates = self._find_duplicates()
+
+    def _find_duplicates(self) -> dict:
+        with dbpool.connection(DB_NAME) as conn:
+            duplicates = {
+                idminiapp: (keep_id, keep_title)
+                for idminiapp, _, keep_id, keep_title in conn.execute(DUPLICATES_SQL)
+            }
+            # title_norm, сброшенные другими клиентами при правке title, считаем в памяти (записываются
+            # в commit(), при --dry-run — нет); их группы собираем заново вместе со строками из индекса
+            stale = {}
+            for rowid, idminiapp, title in conn.execute(
+                    "SELECT rowid, idminiapp, title FROM channels WHERE title_norm IS NULL"):
+                norm = normalize_title(title)
+                if norm:
+                    stale.setdefault(norm, []).append((rowid, idminiapp, title))
+            for norm, extra in stale.items():
+                group = sorted(conn.execute(
+                    "SELECT rowid, idminiapp, title FROM channels WHERE title_norm = ?", (norm,)
+                ).fetchall() + extra)
+                _, keep_id, keep_title = group[0]
+                duplicates.pop(keep_id, None)
+                for _, idminiapp, _ in group[1:]:
+                    duplicates[idminiapp] = (keep_id, keep_title)
+        return duplicates
+
+    def apply(self, row: dict):
+        keep = self.duplicates.get(row["idminiapp"])
+        if keep:
+            self.exact += 1
+            self.exact_matches.append(((row["idminiapp"], row["title"]), keep))
+            return DELETE
+        if self.threshold is None or not normalize_title(row["title"]):
+            return None
+        fkey = fuzzy_key(row["title"])
+        grams = shingles(fkey)
+        if not grams:
+            return None
+        signature = minhash(grams)
+        bands = [(band, tuple(signature[band * ROWS:(band + 1) * ROWS])) for band in range(BANDS)]
+        # Сравниваем только с оставленными строками: цепочка «A ~ B ~ C» не удаляет C, не похожее на A
+        survivor = next((
+            (other_id, other_title)
+            for band in bands for other_key, other_grams, other_id, other_title in self.buckets.get(band, ())
+            if other_key == fkey or (
+                min(len(fkey), len(other_key)) >= MIN_FUZZY_LENGTH
+                and jaccard(grams, other_grams) >= self.threshold
+            )
+        ), None)
+        if survivor:
+            self.fuzzy += 1
+            self.fuzzy_matches.append(((row["idminiapp"], row["title"]), survivor))
+            return DELETE
+        for band in bands:
+            self.buckets.setdefault(band, []).append((fkey, grams, row["idminiapp"], row["title"]))
+        return None
+
+    def commit(self) -> None:
+        refresh_title_norms()
+
+    def report(self) -> list:
+        lines = [f"точных дубликатов: {self.exact}"]
+        for (idminiapp, title), (keep_id, keep_title) in self.exact_matches:
+            lines.append(f"  удалить {idminiapp} {title!r} = оставить {keep_id} {keep_title!r}")
+        if self.threshold is not None:
+            lines.append(f"похожих названий (порог {self.threshold}): {self.fuzzy}")
+            for (idminiapp, title), (keep_id, keep_title) in self.fuzzy_matches:
+                lines.append(f"  удалить {idminiapp} {title!r} ~ оставить {keep_id} {keep_title!r}")
+        return lines
+
+
+def make_stage(args=None) -> TitleDedupeStage:
+    return TitleDedupeStage(getattr(args, "fuzzy_titles", None))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Удаляет дубликаты приложений по названию.")
+    parser.add_argument("--fuzzy", action="store_true", help="искать и почти одинаковые названия (MinHash)")
+    parser.add_argument("--threshold", type=float, default=0.8, help="порог сходства Жаккара для --fuzzy")
+    parser.add_argument("--dry-run", action="store_true", help="только отчёт, без удаления")
+    parser.add_argument("--profile", action="store_true", help="сводка по SQL-запросам при выходе (query_profile)")
+    args = parser.parse_args(argv)
+    if args.profile:
+        query_profile.enable()
 
-def main():
     if not os.path.exists(DB_NAME):
         print(f"БД не найдена: {DB_NAME}")
         sys.exit(1)
 
-    import sqlite3
-    conn = sqlite3.connect(DB_NAME)
-    conn.row_factory = sqlite3.Row
-    cur = conn.cursor()
-
-    # Проверяем наличие short_description для совместимости с текущей схемой
-    cur.execute("PRAGMA table_info(channels)")
-    cur.execute(
-        "SELECT rowid, idminiapp, title FROM channels ORDER BY rowid"
-    )
-    rows = cur.fetchall()
-
-    # Группируем по нормализованному названию (без пробелов по краям, без учёта регистра)
-    from collections import defaultdict
-    by_title = defaultdict(list)
-    for r in rows:
-        key = (r["title"] or "").strip()
-        if not key:
-            continue
-        by_title[key].append({"rowid": r["rowid"], "idminiapp": r["idminiapp"], "title": r["title"]})
-
-    to_delete = []
-    for title, group in by_title.items():
-        if len(group) <= 1:
-            continue
-        # Сортируем по rowid — первый добавленный остаётся
-        group.sort(key=lambda x: x["rowid"])
-        keep = group[0]
-        for rec in group[1:]:
-            to_delete.append(rec)
-
-    if not to_delete:
-        print("Дубликатов не найдено.")
-        conn.close()
-        return
-
-    print(f"Найдено дубликатов к удалению: {len(to_delete)}")
-    for rec in to_delete:
-        print(f"  Удаляю: idminiapp={rec['idminiapp']!r}, title={rec['title']!r} (rowid={rec['rowid']})")
-
-    for rec in to_delete:
-        cur.execute("DELETE FROM channels WHERE idminiapp = ?", (rec["idminiapp"],))
-
-    conn.commit()
-    print(f"Удалено записей: {len(to_delete)}")
-    conn.close()
+    run([TitleDedupeStage(args.threshold if args.fuzzy else None)], dry_run=args.dry_run, show_diff=True)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,166 @@
+"""
+Отзывы и агрегаты рейтинга.
+
+Таблица reviews есть в reviews.db (её пишет /api/reviews) и в telegram_channels.db. В обеих БД
+поддерживается таблица review_stats: число отзывов, сумма оценок и гистограмма по звёздам для каждого
+idminiapp. Её обновляют триггеры на reviews, поэтому агрегаты верны при записи из любого клиента
+(Next.js, SQLiteStudio, этот модуль), а рейтинг приложения читается одной строкой, без обхода отзывов.
+
+Использование:
+    add_review("24", 5, "Отлично")
+    stats = get_review_stats("24")   # {"count": 3, "sum": 13, "average": 4.33, "histogram": [0, 0, 1, 0, 2]}
+    recompute_review_stats()         # пересчёт с нуля (после импорта или правок при отключённых триггерах)
+"""
+
+import os
+from typing import Dict, List, Optional
+
+import dbpool
+
+REVIEWS_DB = os.environ.get("MAINBD_REVIEWS_PATH") or os.path.join(os.path.dirname(__file__), "reviews.db")
+DEFAULT_USERNAME = "Пользователь"
+
+_STARS = range(1, 6)
+_HISTOGRAM_COLUMNS = ", ".join(f"r{star}" for star in _STARS)
+
+
+def _stats_delta(ref: str, sign: str) -> str:
+    """SET-часть UPDATE review_stats для строки ref (new/old) со знаком sign."""
+    parts = [f"count = count {sign} 1", f"sum = sum {sign} {ref}.rating"]
+    parts += [f"r{star} = r{star} {sign} ({ref}.rating = {star})" for star in _STARS]
+    return ", ".join(parts)
+
+
+def _stats_add(ref: str) -> str:
+    values = ", ".join(f"{ref}.rating = {star}" for star in _STARS)
+    updates = ", ".join(["count = count + 1", "sum = sum + excluded.sum"] +
+                        [f"r{star} = r{star} + excluded.r{star}" for star in _STARS])
+    return f"""
+        INSERT INTO review_stats (idminiapp, count, sum, {_HISTOGRAM_COLUMNS})
+        VALUES ({ref}.idminiapp, 1, {ref}.rating, {values})
+        ON CONFLICT(idminiapp) DO UPDATE SET {updates};
+    """
+
+
+def _stats_remove(ref: str) -> str:
+    return f"""
+        UPDATE review_stats SET {_stats_delta(ref, "-")} WHERE idminiapp = {ref}.idminiapp;
+        DELETE FROM review_stats WHERE idminiapp = {ref}.idminiapp AND count <= 0;
+    """
+
+
+def _ensure_schema(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS reviews (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            idminiapp TEXT NOT NULL,
+            username TEXT NOT NULL DEFAULT 'Пользователь',
+            rating INTEGER NOT NULL CHECK(rating >= 1 AND rating <= 5),
+            text TEXT NOT NULL,
+            created_at TEXT NOT NULL DEFAULT (datetime('now', 'localtime'))
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_reviews_idminiapp_created ON reviews(idminiapp, created_at)")
+    created = not conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'review_stats'"
+    ).fetchone()
+    histogram = ", ".join(f"r{star} INTEGER NOT NULL DEFAULT 0" for star in _STARS)
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS review_stats (
+            idminiapp TEXT PRIMARY KEY,
+            count INTEGER NOT NULL DEFAULT 0,
+            sum INTEGER NOT NULL DEFAULT 0,
+            {histogram}
+        ) WITHOUT ROWID
+    """)
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS reviews_stats_ai AFTER INSERT ON reviews BEGIN {_stats_add('new')} END")
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS reviews_stats_ad AFTER DELETE ON reviews BEGIN {_stats_remove('old')} END")
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS reviews_stats_au AFTER UPDATE OF idminiapp, rating ON reviews BEGIN
+            {_stats_remove('old')}
+            {_stats_add('new')}
+        END
+    """)
+    if created:
+        _recompute(conn)
+
+
+# Основная БД (telegram_channels.db) — вместе с хуками mainbd; reviews.db — только свои таблицы
+dbpool.register_schema(_ensure_schema)
+dbpool.register_schema(_ensure_schema, REVIEWS_DB)
+
+
+def register_db(db_path: str) -> None:
+    """Таблицы отзывов и триггеры агрегатов и в другой БД (например, --db у recompute_review_stats.py)."""
+    dbpool.register_schema(_ensure_schema, db_path)
+
+
+def _recompute(conn) -> int:
+    histogram = ", ".join(f"SUM(rating = {star})" for star in _STARS)
+    conn.execute("DELETE FROM review_stats")
+    cur = conn.execute(f"""
+        INSERT INTO review_stats (idminiapp, count, sum, {_HISTOGRAM_COLUMNS})
+        SELECT idminiapp, COUNT(*), SUM(rating), {histogram} FROM reviews GROUP BY idminiapp
+    """)
+    return cur.rowcount
+
+
+def recompute_review_stats(db_path: str = REVIEWS_DB) -> int:
+    """Пересчитывает review_stats по всем отзывам. Возвращает число приложений с отзывами."""
+    with dbpool.transaction(db_path) as conn:
+        return _recompute(conn)
+
+
+def _stats_dict(row) -> dict:
+    count, total = row[0], row[1]
+    return {
+        "count": count,
+        "sum": total,
+        "average": round(total / count, 2) if count else 0.0,
+        "histogram": list(row[2:]),
+    }
+
+
+def get_review_stats(idminiapp: str, db_path: str = REVIEWS_DB) -> Optional[dict]:
+    """Агрегаты отзывов приложения или None, если отзывов нет. histogram[i] — число оценок i + 1."""
+    with dbpool.connection(db_path) as conn:
+        row = conn.execute(
+            f"SELECT count, sum, {_HISTOGRAM_COLUMNS} FROM review_stats WHERE idminiapp = ?", (idminiapp,)
+        ).fetchone()
+    return _stats_dict(row) if row else None
+
+
+def get_all_review_stats(db_path: str = REVIEWS_DB) -> Dict[str, dict]:
+    """{idminiapp: агрегаты} для всех приложений с отзывами."""
+    with dbpool.connection(db_path) as conn:
+        rows = conn.execute(f"SELECT idminiapp, count, sum, {_HISTOGRAM_COLUMNS} FROM review_stats").fetchall()
+    return {row[0]: _stats_dict(row[1:]) for row in rows}
+
+
+def add_review(idminiapp: str, rating: int, text: str, username: str = DEFAULT_USERNAME,
+               db_path: str = REVIEWS_DB) -> int:
+    """Добавляет отзыв (агрегаты обновит триггер). Возвращает id отзыва."""
+    if not isinstance(rating, int) or not 1 <= rating <= 5:
+        raise ValueError("Оценка должна быть от 1 до 5")
+    if not text or not text.strip():
+        raise ValueError("Текст отзыва не может быть пустым")
+    with dbpool.transaction(db_path) as conn:
+        cur = conn.execute(
+            "INSERT INTO reviews (idminiapp, username, rating, text) VALUES (?, ?, ?, ?)",
+            (idminiapp, username, rating, text.strip()),
+        )
+        return cur.lastrowid
+
+
+def delete_review(review_id: int, db_path: str = REVIEWS_DB) -> bool:
+    with dbpool.transaction(db_path) as conn:
+        return conn.execute("DELETE FROM reviews WHERE id = ?", (review_id,)).rowcount > 0
+
+
+def get_reviews(idminiapp: str, limit: int = 50, offset: int = 0, db_path: str = REVIEWS_DB) -> List[tuple]:
+    """Отзывы приложения, новые первыми: (id, username, rating, text, created_at)."""
+    with dbpool.connection(db_path) as conn:
+        return conn.execute("""
+            SELECT id, username, rating, text, created_at FROM reviews
+            WHERE idminiapp = ? ORDER BY created_at DESC, id DESC LIMIT ? OFFSET ?
+        """, (idminiapp, limit, offset)).fetchall()
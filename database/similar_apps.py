@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Считает «похожие приложения» и сохраняет их в таблицу similar_channels (читает similar_channels.get_similar_channels).
+
+Каждое приложение — TF-IDF вектор по словам названия (с весом TITLE_WEIGHT), описаний и категории;
+русский и английский текст обрабатываются одинаково: нижний регистр, ё -> е, стоп-слова, грубая основа
+(первые STEM_LENGTH букв). Соседи — top-k по косинусной близости: произведение разреженных матриц
+считается блоками строк, поэтому в памяти одновременно только блок x N значений (около BLOCK_CELLS).
+На 100k приложений полный расчёт занимает минуты, инкрементальный — секунды.
+
+По умолчанию пересчитываются только строки, изменившиеся с прошлого запуска (журнал channel_changes),
+и строки, в чьих соседях что-то может поменяться из-за них. IDF при этом не пересчитывается для всех —
+раз в какое-то время (или после крупных правок) запускайте с --full.
+Запуск: из папки database: python3 similar_apps.py [--full] [-k 10]
+Требуется: pip install numpy scipy
+"""
+import argparse
+import math
+import re
+import time
+from collections import Counter
+
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:
+    print("Установите numpy и scipy: python3 -m pip install numpy scipy")
+    raise
+
+import dbpool
+import query_profile
+from catalogue_changes import catalogue_version, changes_since
+from mainbd import DB_NAME, get_all_channels, get_state, set_state
+from similar_channels import SIMILAR_K
+
+STATE_VERSION = "similar_apps.version"
+STATE_PARAMS = "similar_apps.params"
+TEXT_COLUMNS = "idminiapp, title, description, short_description, category"
+TITLE_WEIGHT = 3
+STEM_LENGTH = 6
+# Слова, которые есть больше чем в такой доле приложений, ничего не различают
+MAX_DF_SHARE = 0.5
+# Ниже этой близости приложение в похожие не попадает
+MIN_SCORE = 0.05
+# Размер блока: строк в блоке — BLOCK_CELLS // N (float32, ~32 МБ)
+BLOCK_CELLS = 8_000_000
+# Если изменилась такая доля каталога, дешевле пересчитать всё
+FULL_REBUILD_SHARE = 0.2
+
+STOPWORDS = frozenset("""
+    и в во не что он на я с со как а то все она так его но да ты к у же вы за бы по только ее мне было вот от
+    меня еще нет о из ему теперь когда даже ну вдруг ли если уже или ни быть был него до вас нибудь опять уж
+    вам ведь там потом себя ничего ей может они тут где есть надо ней для мы тебя их чем была сам чтоб без
+    будто чего раз тоже себе под будет ж тогда кто этот того потому этого какой совсем ним здесь этом один
+    почти мой тем чтобы нее сейчас были куда зачем всех никогда можно при наконец два об другой хоть после
+    над больше тот через эти нас про всего них какая много разве три эту моя впрочем хорошо свою этой перед
+    иногда лучше чуть том нельзя такой им более всегда конечно всю между это ваш ваши свой свои
+    a an the and or but if of to in on at by for with from as is are was were be been it its this that
+    these those you your we our they their he she his her not no can will just all any more most so than
+    too very into about also app apps bot telegram mini
+""".split())
+_WORD_RE = re.compile(r"[^\W\d_]{2,}")
+
+
+def tokens(text) -> list:
+    """Основы слов текста: нижний регистр, ё -> е, без стоп-слов и чисел, первые STEM_LENGTH букв."""
+    words = _WORD_RE.findall((text or "").lower().replace("ё", "е"))
+    return [w[:STEM_LENGTH] for w in words if w not in STOPWORDS]
+
+
+def document_terms(row: tuple) -> Counter:
+    """Частоты термов одной строки TEXT_COLUMNS: название с весом TITLE_WEIGHT, категория — отдельным термом."""
+    _, title, description, short_description, category = row
+    terms = Counter()
+    for word in tokens(title):
+        terms[word] += TITLE_WEIGHT
+    terms.update(tokens(description))
+    terms.update(tokens(short_description))
+    if category:
+        terms["категория:" + category.lower()] += 1
+    return terms
+
+
+def build_matrix(rows: list):
+    """
+    TF-IDF матрица (CSR, float32, строки нормированы по L2) для строк TEXT_COLUMNS.
+    tf — 1 + log(частота), idf — сглаженный log(N / df); слишком частые слова отбрасываются.
+    """
+    docs = [document_terms(row) for row in rows]
+    df = Counter()
+    for terms in docs:
+        df.update(terms.keys())
+    n = len(rows)
+    max_df = max(2, int(n * MAX_DF_SHARE))
+    vocabulary = {}
+    for term, count in df.items():
+        if count <= max_df:
+            vocabulary[term] = len(vocabulary)
+    idf = np.empty(len(vocabulary), dtype=np.float32)
+    for term, col in vocabulary.items():
+        idf[col] = math.log((1 + n) / (1 + df[term])) + 1
+
+    indptr, indices, data = [0], [], []
+    for terms in docs:
+        for term, count in terms.items():
+            col = vocabulary.get(term)
+            if col is not None:
+                indices.append(col)
+                data.append(1 + math.log(count))
+        indptr.append(len(indices))
+    matrix = sparse.csr_matrix(
+        (np.asarray(data, dtype=np.float32), np.asarray(indices, dtype=np.int32), np.asarray(indptr, dtype=np.int64)),
+        shape=(n, len(vocabulary)),
+    )
+    matrix.data *= idf[matrix.indices]
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    return sparse.diags(1 / norms).astype(np.float32) @ matrix
+
+
+def _blocks(matrix, row_indices: np.ndarray):
+    """Блоки (номера строк, плотная матрица близости блок x N) для строк row_indices."""
+    step = max(1, BLOCK_CELLS // max(1, *matrix.shape))
+    for start in range(0, len(row_indices), step):
+        block = row_indices[start:start + step]
+        # Разреженная N x V на плотную V x блок — в разы быстрее разреженной на разреженную с плотным результатом
+        scores = np.ascontiguousarray((matrix @ matrix[block].T.toarray()).T)
+        scores[np.arange(len(block)), block] = -1  # само приложение — не сосед
+        yield block, scores
+
+
+def top_k(scores: np.ndarray, k: int):
+    """Для каждой строки блока: номера k самых близких столбцов по убыванию и их близость."""
+    k = min(k, scores.shape[1] - 1)
+    if k <= 0:
+        empty = np.empty((scores.shape[0], 0))
+        return empty.astype(np.int64), empty
+    part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    part_scores = np.take_along_axis(scores, part, axis=1)
+    order = np.argsort(-part_scores, axis=1, kind="stable")
+    return np.take_along_axis(part, order, axis=1), np.take_along_axis(part_scores, order, axis=1)
+
+
+def neighbours(matrix, ids: list, row_indices, k: int) -> dict:
+    """{idminiapp: [(похожий idminiapp, близость), ...]} для строк row_indices."""
+    result = {}
+    for block, scores in _blocks(matrix, np.asarray(row_indices, dtype=np.int64)):
+        cols, values = top_k(scores, k)
+        for row, row_cols, row_values in zip(block, cols, values):
+            result[ids[row]] = [(ids[c], float(s)) for c, s in zip(row_cols, row_values) if s >= MIN_SCORE]
+    return result
+
+
+def _affected_rows(matrix, ids: list, changed: set, deleted: set, stored: dict, k: int) -> set:
+    """
+    Строки, чей список похожих может измениться: сами изменённые, те, у кого в списке изменённое
+    или удалённое приложение, и те, для кого изменённое стало ближе их k-го соседа.
+    """
+    index = {idminiapp: i for i, idminiapp in enumerate(ids)}
+    affected = {index[i] for i in changed if i in index}
+    gone = changed | deleted
+    # Порог строки — близость её k-го соседа (0, если соседей меньше k)
+    threshold = np.zeros(len(ids), dtype=np.float32)
+    for idminiapp, items in stored.items():
+        row = index.get(idminiapp)
+        if row is None:
+            continue
+        if any(similar in gone for similar, _ in items):
+            affected.add(row)
+        elif len(items) >= k:
+            threshold[row] = items[-1][1]
+    threshold = np.maximum(threshold, MIN_SCORE)
+    changed_rows = np.asarray(sorted(index[i] for i in changed if i in index), dtype=np.int64)
+    for _, scores in _blocks(matrix, changed_rows):
+        # Близость симметрична: столбец j блока — близость j-й строки к изменённому приложению
+        affected.update(np.flatnonzero((scores > threshold).any(axis=0)).tolist())
+    return affected
+
+
+def _stored_neighbours(conn) -> dict:
+    stored = {}
+    for idminiapp, similar_id, score in conn.execute(
+        "SELECT idminiapp, similar_id, score FROM similar_channels ORDER BY idminiapp, rank"
+    ):
+        stored.setdefault(idminiapp, []).append((similar_id, score))
+    return stored
+
+
+def save(result: dict, deleted=(), replace_all: bool = False) -> int:
+    """Записывает списки похожих одной транзакцией. Возвращает число записанных пар."""
+    pairs = [
+        (idminiapp, similar_id, rank, round(score, 4))
+        for idminiapp, items in result.items()
+        for rank, (similar_id, score) in enumerate(items, 1)
+    ]
+    with dbpool.transaction(DB_NAME) as conn:
+        if replace_all:
+            conn.execute("DELETE FROM similar_channels")
+        else:
+            conn.executemany("DELETE FROM similar_channels WHERE idminiapp = ?",
+                             [(i,) for i in list(result) + list(deleted)])
+        conn.executemany(
+            "INSERT INTO similar_channels (idminiapp, similar_id, rank, score) VALUES (?, ?, ?, ?)", pairs
+        )
+    return len(pairs)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Считает похожие приложения (TF-IDF, косинусная близость).")
+    parser.add_argument("--full", action="store_true", help="пересчитать все строки и IDF")
+    parser.add_argument("-k", type=int, default=SIMILAR_K, help=f"похожих на приложение (по умолчанию {SIMILAR_K})")
+    parser.add_argument("--profile", action="store_true", help="сводка по SQL-запросам при выходе (query_profile)")
+    args = parser.parse_args(argv)
+    if args.profile:
+        query_profile.enable()
+
+    started = time.perf_counter()
+    # Версия — до чтения строк: изменения во время расчёта попадут в следующий запуск
+    version = catalogue_version()
+    last = get_state(STATE_VERSION)
+    # При смене k или настроек векторизации старые списки несравнимы с новыми
+    params = f"k={args.k};title={TITLE_WEIGHT};stem={STEM_LENGTH};min={MIN_SCORE}"
+    incremental = not args.full and last is not None and get_state(STATE_PARAMS) == params
+    delta = changes_since(int(last), columns="idminiapp") if incremental else None
+
+    rows = get_all_channels(TEXT_COLUMNS)
+    ids = [row[0] for row in rows]
+    matrix = build_matrix(rows)
+    print(f"Приложений: {len(rows)}, термов: {matrix.shape[1]}, ненулевых: {matrix.nnz}")
+
+    full = delta is None or delta["full"] or len(delta["upserts"]) > FULL_REBUILD_SHARE * max(1, len(rows))
+    if full:
+        result = neighbours(matrix, ids, range(len(ids)), args.k)
+        pairs = save(result, replace_all=True)
+        print(f"Пересчитаны все: {len(result)} приложений, {pairs} пар")
+    else:
+        changed = {row[0] for row in delta["upserts"]}
+        deleted = set(delta["deletes"])
+        with dbpool.connection(DB_NAME) as conn:
+            stored = _stored_neighbours(conn)
+        affected = _affected_rows(matrix, ids, changed, deleted, stored, args.k) if changed or deleted else set()
+        result = neighbours(matrix, ids, sorted(affected), args.k)
+        pairs = save(result, deleted)
+        print(f"Изменено {len(changed)}, удалено {len(deleted)}; пересчитано {len(result)} приложений, {pairs} пар")
+    set_state(STATE_VERSION, str(version))
+    set_state(STATE_PARAMS, params)
+    print(f"Готово за {time.perf_counter() - started:.1f} с")
+
+
+if __name__ == "__main__":
+    main()
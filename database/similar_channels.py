@@ -0,0 +1,41 @@
+"""
+Похожие приложения: таблица similar_channels в telegram_channels.db.
+
+Считает и пишет её similar_apps.py (ему нужны numpy и scipy), читать можно без них — отсюда
+или через /api/channels?similar=<id>. Для каждого приложения хранится rank 1..k по убыванию score.
+
+Использование:
+    for row in get_similar_channels("notcoin_bot", limit=5):
+        ...
+"""
+
+import dbpool
+from mainbd import CHANNEL_COLUMNS, DB_NAME
+
+# Сколько похожих приложений считает similar_apps.py
+SIMILAR_K = 10
+
+
+def _ensure_schema(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS similar_channels (
+            idminiapp TEXT NOT NULL,
+            rank INTEGER NOT NULL,
+            similar_id TEXT NOT NULL,
+            score REAL,
+            PRIMARY KEY (idminiapp, rank)
+        ) WITHOUT ROWID
+    """)
+
+
+dbpool.register_schema(_ensure_schema)
+
+
+def get_similar_channels(idminiapp: str, limit: int = SIMILAR_K, columns: str = CHANNEL_COLUMNS) -> list:
+    """Похожие приложения (из similar_channels, см. similar_apps.py), самые близкие первыми."""
+    projection = ", ".join(f"c.{c.strip()}" for c in columns.split(","))
+    with dbpool.connection(DB_NAME) as conn:
+        return conn.execute(f"""
+            SELECT {projection} FROM similar_channels s JOIN channels c ON c.idminiapp = s.similar_id
+            WHERE s.idminiapp = ? ORDER BY s.rank LIMIT ?
+        """, (idminiapp, limit)).fetchall()
@@ -1,17 +1,25 @@
 #!/usr/bin/env python3
 """
 Переводит описания приложений в БД на русский. Названия сервисов (Telegram, WhatsApp и т.д.) остаются в оригинале.
-Запуск: из папки database: python3 translate_descriptions_to_russian.py
-Требуется: pip install deep-translator
+Запросы идут параллельно с ограничением частоты; переводы сохраняются в translation_memory.db,
+поэтому повторяющиеся описания не отправляются повторно, а прерванный прогон продолжается с места остановки.
+Это шаг translate конвейера pipeline.py: описания переводятся пачками, в БД всё пишется одной транзакцией.
+Запуск: из папки database: python3 translate_descriptions_to_russian.py [--rate 5] [--concurrency 8]
+Проверка без сети: python3 translate_descriptions_to_russian.py --backend mock
+Требуется (для --backend google): pip install deep-translator
 """
 
-try:
-    from deep_translator import GoogleTranslator
-except ImportError:
-    print("Установите: python3 -m pip install deep-translator")
-    raise SystemExit(1)
+import argparse
+import asyncio
+from typing import Optional
 
-from mainbd import get_connection, update_channel
+import query_profile
+from pipeline import Stage, run
+from translation import BACKENDS, GoogleBackend, TranslationMemory, text_hash, translate_many
+
+JOB = "descriptions_ru"
+SOURCE_LANG = "auto"
+TARGET_LANG = "ru"
 
 # Восстанавливаем оригинальные названия после перевода
 PRESERVE_RU_TO_EN = (
@@ -26,43 +34,125 @@ PRESERVE_RU_TO_EN = (
 )
 
 
-def translate_to_russian(text: str) -> str:
+def prepare_text(text: str) -> Optional[str]:
+    """Текст для отправки переводчику или None, если переводить не нужно (пусто или уже по-русски)."""
     if not text or not text.strip():
-        return text
+        return None
     text = text.strip()[:800]
     cyrillic = sum(1 for c in text if "\u0400" <= c <= "\u04FF")
     if cyrillic / max(len(text), 1) > 0.5:
-        return text
+        return None
+    return text
+
+
+def postprocess(translated: str) -> str:
+    result = translated
+    for ru, en in PRESERVE_RU_TO_EN:
+        result = result.replace(ru, en)
+    return result[:800]
+
+
+def translate_to_russian(text: str, backend=None) -> str:
+    """Перевод одного текста (без памяти и ограничения частоты)."""
+    prepared = prepare_text(text)
+    if prepared is None:
+        return text.strip() if text else text
     try:
-        translated = GoogleTranslator(source="auto", target="ru").translate(text)
+        translated = (backend or GoogleBackend()).translate(prepared, SOURCE_LANG, TARGET_LANG)
         if not translated:
-            return text
-        result = translated
-        for ru, en in PRESERVE_RU_TO_EN:
-            result = result.replace(ru, en)
-        return result[:800]
+            return prepared
+        return postprocess(translated)
+    except ImportError:
+        raise
     except Exception as e:
         print(f"   ⚠️  Перевод: {e}")
-        return text
-
-
-def main():
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("SELECT idminiapp, description FROM channels WHERE description IS NOT NULL AND description != ''")
-    rows = cur.fetchall()
-    conn.close()
-
-    updated = 0
-    for i, (idminiapp, description) in enumerate(rows, 1):
-        translated = translate_to_russian(description or "")
-        if translated == (description or "").strip():
-            continue
-        if update_channel(idminiapp, description=translated):
-            updated += 1
-            print(f"[{i}] {idminiapp} — переведено")
-
-    print(f"\nОбновлено описаний: {updated}")
+        return prepared
+
+
+class TranslateStage(Stage):
+    """
+    Шаг конвейера: перевод описаний пачки в prepare (параллельно, с ограничением частоты),
+    в apply — подстановка перевода. Переводы сразу сохраняются в translation_memory.db,
+    а чекпоинты задания — после записи в БД (commit): прерванный прогон ничего не переводит заново.
+    """
+
+    name = "translate"
+    columns = ("description",)
+
+    def __init__(self, backend, memory: TranslationMemory = None, rate: float = 5.0, concurrency: int = 8):
+        self.backend = backend
+        self.memory = memory or TranslationMemory()
+        self.rate = rate
+        self.concurrency = concurrency
+        self.done = self.memory.done_items(JOB)
+        self.translated = {}
+        self.checkpoints = []
+        self.stats = {"memory": 0, "sent": 0, "failed": 0}
+
+    def prepare(self, rows: list) -> None:
+        items = []
+        for row in rows:
+            prepared = prepare_text(row["description"] or "")
+            if prepared is None or self.done.get(row["idminiapp"]) == text_hash(prepared, SOURCE_LANG, TARGET_LANG):
+                continue
+            items.append((row["idminiapp"], prepared))
+        if not items:
+            return
+
+        def on_result(idminiapp, text, translated, h):
+            if translated is not None:
+                self.translated[idminiapp] = postprocess(translated)
+                self.checkpoints.append((idminiapp, h))
+
+        stats = asyncio.run(translate_many(
+            items, self.backend, self.memory, on_result, source=SOURCE_LANG, target=TARGET_LANG,
+            rate=self.rate, concurrency=self.concurrency,
+        ))
+        for key, value in stats.items():
+            self.stats[key] += value
+
+    def apply(self, row: dict):
+        result = self.translated.pop(row["idminiapp"], None)
+        if result is not None and result != (row["description"] or "").strip():
+            row["description"] = result
+
+    def report(self) -> list:
+        return [f"из памяти: {self.stats['memory']}, запросов: {self.stats['sent']}, ошибок: {self.stats['failed']}"]
+
+    def commit(self) -> None:
+        self.memory.mark_done(JOB, self.checkpoints)
+        self.checkpoints = []
+
+
+def make_stage(args=None) -> TranslateStage:
+    backend = BACKENDS[getattr(args, "backend", None) or "google"]()
+    return TranslateStage(backend, rate=getattr(args, "rate", 5.0), concurrency=getattr(args, "concurrency", 8))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Переводит описания приложений на русский.")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default="google")
+    parser.add_argument("--rate", type=float, default=5.0, help="запросов к переводчику в секунду")
+    parser.add_argument("--concurrency", type=int, default=8, help="одновременных запросов")
+    parser.add_argument("--batch", type=int, default=500, help="описаний в пачке конвейера")
+    parser.add_argument("--reset", action="store_true", help="забыть чекпоинт и пройти все описания заново")
+    parser.add_argument("--dry-run", action="store_true", help="перевести и показать изменения, без записи в БД")
+    parser.add_argument("--profile", action="store_true", help="сводка по SQL-запросам при выходе (query_profile)")
+    args = parser.parse_args(argv)
+    if args.profile:
+        query_profile.enable()
+
+    try:
+        stage = make_stage(args)
+    except ImportError:
+        print("Установите: python3 -m pip install deep-translator")
+        raise SystemExit(1)
+    if args.reset:
+        stage.memory.reset(JOB)
+        stage.done = {}
+    print(f"Уже обработано ранее: {len(stage.done)}")
+    run([stage], dry_run=args.dry_run, chunk_size=args.batch, show_diff=args.dry_run,
+        where=("description IS NOT NULL AND description != ''", ()))
 
 
 if __name__ == "__main__":
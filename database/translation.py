@@ -0,0 +1,234 @@
+"""
+Движок перевода для скриптов обслуживания каталога.
+
+- Backend — подключаемый переводчик: GoogleBackend (deep-translator) или MockBackend для локальных прогонов.
+- TokenBucket — ограничение частоты запросов (rate в секунду, burst — допустимый всплеск).
+- TranslationMemory — постоянная память переводов в translation_memory.db (ключ — хэш исходного текста),
+  плюс чекпоинт заданий: какие строки уже обработаны, чтобы прерванный прогон продолжился с места остановки.
+- translate_many — асинхронный пул воркеров: повторяющиеся тексты отправляются один раз,
+  уже переведённые берутся из памяти, неудачные запросы повторяются с экспоненциальной задержкой.
+"""
+
+import asyncio
+import hashlib
+import os
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import dbpool
+
+MEMORY_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "translation_memory.db")
+
+
+class Backend:
+    """Интерфейс переводчика. Достаточно реализовать translate(); atranslate() по умолчанию уходит в поток."""
+
+    name = "base"
+
+    def translate(self, text: str, source: str, target: str) -> str:
+        raise NotImplementedError
+
+    async def atranslate(self, text: str, source: str, target: str) -> str:
+        return await asyncio.to_thread(self.translate, text, source, target)
+
+
+class GoogleBackend(Backend):
+    """Google Translate через deep-translator (pip install deep-translator). Переводчик создаётся один раз на пару языков."""
+
+    name = "google"
+
+    def __init__(self):
+        from deep_translator import GoogleTranslator
+        self._cls = GoogleTranslator
+        self._translators = {}
+
+    def translate(self, text: str, source: str, target: str) -> str:
+        translator = self._translators.get((source, target))
+        if translator is None:
+            translator = self._translators[(source, target)] = self._cls(source=source, target=target)
+        return translator.translate(text)
+
+
+class MockBackend(Backend):
+    """Локальная заглушка: помечает текст и имитирует задержку сети, ничего не отправляя наружу."""
+
+    name = "mock"
+
+    def __init__(self, latency: float = 0.05, fail_every: int = 0):
+        self.latency = latency
+        self.fail_every = fail_every
+        self.calls = 0
+
+    def translate(self, text: str, source: str, target: str) -> str:
+        self.calls += 1
+        time.sleep(self.latency)
+        if self.fail_every and self.calls % self.fail_every == 0:
+            raise RuntimeError("mock: временная ошибка")
+        return f"[{target}] {text}"
+
+
+BACKENDS = {"google": GoogleBackend, "mock": MockBackend}
+
+
+class TokenBucket:
+    """Асинхронный token bucket: не больше rate запросов в секунду в среднем, всплеск до burst."""
+
+    def __init__(self, rate: float, burst: Optional[int] = None):
+        self.rate = rate
+        self.capacity = burst or max(1, int(rate))
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+def text_hash(text: str, source: str, target: str) -> str:
+    return hashlib.sha256(f"{source}\x00{target}\x00{text}".encode("utf-8")).hexdigest()
+
+
+def _ensure_schema(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS translations (
+            source_hash TEXT PRIMARY KEY,
+            source_lang TEXT NOT NULL,
+            target_lang TEXT NOT NULL,
+            source_text TEXT NOT NULL,
+            translated TEXT NOT NULL,
+            backend TEXT NOT NULL,
+            created_at TEXT NOT NULL DEFAULT (datetime('now'))
+        ) WITHOUT ROWID
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS checkpoints (
+            job TEXT NOT NULL,
+            item TEXT NOT NULL,
+            source_hash TEXT NOT NULL,
+            PRIMARY KEY (job, item)
+        ) WITHOUT ROWID
+    """)
+
+
+dbpool.register_schema(_ensure_schema, MEMORY_DB)
+
+
+class TranslationMemory:
+    """Память переводов и чекпоинты заданий в translation_memory.db."""
+
+    def __init__(self, db_path: str = MEMORY_DB):
+        self.db_path = db_path
+
+    def get_many(self, hashes: Iterable[str]) -> Dict[str, str]:
+        hashes = list(dict.fromkeys(hashes))
+        found = {}
+        conn = dbpool.get_connection(self.db_path)
+        for i in range(0, len(hashes), 500):
+            part = hashes[i:i + 500]
+            found.update(conn.execute(
+                f"SELECT source_hash, translated FROM translations WHERE source_hash IN ({', '.join('?' * len(part))})",
+                part,
+            ).fetchall())
+        return found
+
+    def put_many(self, rows: List[Tuple[str, str, str, str, str, str]]) -> None:
+        """rows: (source_hash, source_lang, target_lang, source_text, translated, backend)."""
+        if not rows:
+            return
+        with dbpool.transaction(self.db_path) as conn:
+            conn.executemany("""
+                INSERT OR REPLACE INTO translations (source_hash, source_lang, target_lang, source_text, translated, backend)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, rows)
+
+    def done_items(self, job: str) -> Dict[str, str]:
+        """{item: source_hash} уже обработанных элементов задания."""
+        conn = dbpool.get_connection(self.db_path)
+        return dict(conn.execute("SELECT item, source_hash FROM checkpoints WHERE job = ?", (job,)).fetchall())
+
+    def mark_done(self, job: str, items: List[Tuple[str, str]]) -> None:
+        """items: (item, source_hash)."""
+        if not items:
+            return
+        with dbpool.transaction(self.db_path) as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO checkpoints (job, item, source_hash) VALUES (?, ?, ?)",
+                [(job, item, h) for item, h in items],
+            )
+
+    def reset(self, job: str) -> None:
+        with dbpool.transaction(self.db_path) as conn:
+            conn.execute("DELETE FROM checkpoints WHERE job = ?", (job,))
+
+
+async def _translate_with_retry(backend: Backend, bucket: TokenBucket, text: str, source: str, target: str,
+                                retries: int) -> Optional[str]:
+    delay = 1.0
+    for attempt in range(retries + 1):
+        await bucket.acquire()
+        try:
+            return await backend.atranslate(text, source, target)
+        except Exception as e:
+            if attempt == retries:
+                print(f"   ⚠️  Перевод: {e}")
+                return None
+            await asyncio.sleep(delay)
+            delay *= 2
+    return None
+
+
+async def translate_many(items: Iterable[Tuple[str, str]], backend: Backend, memory: TranslationMemory,
+                         on_result: Callable[[str, str, Optional[str], str], None],
+                         source: str = "auto", target: str = "ru", rate: float = 5.0,
+                         concurrency: int = 8, retries: int = 3) -> dict:
+    """
+    Переводит items = [(ключ, текст)]. Для каждого ключа вызывает on_result(ключ, текст, перевод, хэш);
+    перевод None — если запрос так и не удался. Возвращает статистику: из памяти / отправлено / ошибок.
+    """
+    by_hash: Dict[str, List[Tuple[str, str]]] = {}
+    for key, text in items:
+        by_hash.setdefault(text_hash(text, source, target), []).append((key, text))
+    known = memory.get_many(by_hash)
+    stats = {"memory": 0, "sent": 0, "failed": 0}
+
+    for h, translated in known.items():
+        for key, text in by_hash.pop(h):
+            stats["memory"] += 1
+            on_result(key, text, translated, h)
+
+    queue: asyncio.Queue = asyncio.Queue()
+    for h in by_hash:
+        queue.put_nowait(h)
+    bucket = TokenBucket(rate)
+    pending_memory = []
+
+    async def worker():
+        while True:
+            try:
+                h = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            text = by_hash[h][0][1]
+            translated = await _translate_with_retry(backend, bucket, text, source, target, retries)
+            stats["sent"] += 1
+            if translated is None:
+                stats["failed"] += 1
+            else:
+                pending_memory.append((h, source, target, text, translated, backend.name))
+                if len(pending_memory) >= 50:
+                    memory.put_many(pending_memory)
+                    pending_memory.clear()
+            for key, original in by_hash[h]:
+                on_result(key, original, translated, h)
+
+    await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+    memory.put_many(pending_memory)
+    return stats
@@ -1,6 +1,10 @@
 import type { NextConfig } from "next";
 
 const nextConfig: NextConfig = {
+  // Снимок каталога (npm run snapshot, в git его нет) читается через fs — добавляем его в деплой явно
+  outputFileTracingIncludes: {
+    "/api/channels": ["./database/snapshot/**/*"],
+  },
   images: {
     remotePatterns: [
       {
@@ -0,0 +1,24 @@
+#!/usr/bin/env node
+/**
+ * Выгрузка снимка каталога для /api/channels (database/export_snapshot.py) перед сборкой.
+ * Снимок в git не коммитится: его собирает `npm run build` (prebuild), и он попадает в деплой вместе
+ * с telegram_channels.db (outputFileTracingIncludes в next.config.ts). Переменные ASSETS_BASE_URL,
+ * BLOB_STORE_URL и ASSET_VARIANTS_BASE_URL берутся из окружения сборки — те же, что у API.
+ *
+ * Без python3 или при ошибке выгрузки сборка продолжается: API тогда читает SQLite, как раньше.
+ *
+ * Запуск (из корня проекта): npm run snapshot
+ */
+
+import { spawnSync } from "child_process";
+import path from "path";
+import { fileURLToPath } from "url";
+
+const __dirname = path.dirname(fileURLToPath(import.meta.url));
+const DB_DIR = path.join(__dirname, "..", "database");
+
+const result = spawnSync(process.env.PYTHON ?? "python3", ["export_snapshot.py"], { cwd: DB_DIR, stdio: "inherit" });
+if (result.error || result.status !== 0) {
+  const reason = result.error ? result.error.message : `код выхода ${result.status}`;
+  console.warn(`\nСнимок каталога не выгружен (${reason}): /api/channels будет читать SQLite.\n`);
+}
@@ -1,11 +1,15 @@
 #!/usr/bin/env node
 /**
- * Однократная загрузка иконок и скриншотов из database/logo&screens в Vercel Blob.
+ * Загрузка иконок и скриншотов из database/logo&screens (и уменьшенных копий из database/asset_variants) в Vercel Blob.
  * После загрузки добавь в Vercel (Settings → Environment Variables):
  *   BLOB_STORE_URL = выведенный ниже Base URL (с завершающим слэшем)
  *
+ * Если есть database/asset_upload_plan.json (python3 database/asset_manifest.py), загружаются только новые
+ * и изменённые файлы, а ненужные удаляются; загруженное записывается в database/uploaded_assets.json.
+ * Флаг --all — загрузить всю папку logo&screens, как раньше.
+ *
  * Запуск (из корня проекта, с установленным BLOB_READ_WRITE_TOKEN):
- *   node scripts/upload-assets-to-blob.mjs
+ *   node scripts/upload-assets-to-blob.mjs [--all]
  *
  * Токен: Vercel → Storage → твой Blob store → Connect to Project,
  *        затем локально: vercel env pull
@@ -14,19 +18,73 @@
 import fs from "fs";
 import path from "path";
 import { fileURLToPath } from "url";
-import { put } from "@vercel/blob";
+import { put, del } from "@vercel/blob";
 
 const __dirname = path.dirname(fileURLToPath(import.meta.url));
-const ASSETS_DIR = path.join(__dirname, "..", "database", "logo&screens");
+const DB_DIR = path.join(__dirname, "..", "database");
+const ASSETS_DIR = path.join(DB_DIR, "logo&screens");
+const PLAN_FILE = path.join(DB_DIR, "asset_upload_plan.json");
+const UPLOADED_FILE = path.join(DB_DIR, "uploaded_assets.json");
 
-async function main() {
-  const token = process.env.BLOB_READ_WRITE_TOKEN;
-  if (!token) {
-    console.error("Задайте BLOB_READ_WRITE_TOKEN (Vercel → Storage → Blob store → env).");
-    console.error("Локально: vercel env pull");
-    process.exit(1);
+let baseUrl = null;
+
+async function upload(pathname, filePath) {
+  const buffer = fs.readFileSync(filePath);
+  // Без случайного суффикса: файл должен быть доступен как BLOB_STORE_URL + имя
+  const blob = await put(pathname, buffer, { access: "public", addRandomSuffix: false });
+  if (!baseUrl && blob.url && !pathname.includes("/")) {
+    baseUrl = blob.url.replace(/[^/]+$/, "");
+    console.log("\n--- Добавь в Vercel (Environment Variables): ---");
+    console.log("BLOB_STORE_URL =", baseUrl);
+    console.log("------------------------------------------------\n");
+  }
+  return blob;
+}
+
+function saveUploaded(uploaded) {
+  fs.writeFileSync(UPLOADED_FILE + ".tmp", JSON.stringify(uploaded, null, 1));
+  fs.renameSync(UPLOADED_FILE + ".tmp", UPLOADED_FILE);
+}
+
+async function uploadPlan() {
+  const plan = JSON.parse(fs.readFileSync(PLAN_FILE, "utf8"));
+  const uploaded = fs.existsSync(UPLOADED_FILE) ? JSON.parse(fs.readFileSync(UPLOADED_FILE, "utf8")) : {};
+  console.log(`По плану: загрузить ${plan.upload.length}, удалить ${plan.delete.length}.`);
+
+  let done = 0;
+  let failed = 0;
+  for (let i = 0; i < plan.upload.length; i++) {
+    const item = plan.upload[i];
+    try {
+      const blob = await upload(item.pathname, path.join(DB_DIR, item.path));
+      uploaded[item.pathname] = { hash: item.hash, url: blob.url };
+      done++;
+    } catch (e) {
+      failed++;
+      console.error("Ошибка при загрузке", item.pathname, e.message);
+    }
+    if ((i + 1) % 100 === 0) {
+      console.log(`  ${i + 1}/${plan.upload.length}`);
+      saveUploaded(uploaded);
+    }
   }
 
+  for (const item of plan.delete) {
+    try {
+      if (item.url) await del(item.url);
+      delete uploaded[item.pathname];
+    } catch (e) {
+      failed++;
+      console.error("Ошибка при удалении", item.pathname, e.message);
+    }
+  }
+
+  saveUploaded(uploaded);
+  console.log(`Готово: загружено ${done}, ошибок ${failed}.`);
+  if (failed) console.log("Запустите python3 database/asset_manifest.py и скрипт ещё раз — догрузится только несделанное.");
+}
+
+async function uploadAll() {
   if (!fs.existsSync(ASSETS_DIR)) {
     console.error("Папка не найдена:", ASSETS_DIR);
     process.exit(1);
@@ -39,20 +97,11 @@ async function main() {
   }
 
   console.log(`Найдено файлов: ${files.length}. Загрузка в Vercel Blob...`);
-  let baseUrl = null;
 
   for (let i = 0; i < files.length; i++) {
     const name = files[i];
-    const filePath = path.join(ASSETS_DIR, name);
-    const buffer = fs.readFileSync(filePath);
     try {
-      const blob = await put(name, buffer, { access: "public" });
-      if (!baseUrl && blob.url) {
-        baseUrl = blob.url.replace(/[^/]+$/, "");
-        console.log("\n--- Добавь в Vercel (Environment Variables): ---");
-        console.log("BLOB_STORE_URL =", baseUrl);
-        console.log("------------------------------------------------\n");
-      }
+      await upload(name, path.join(ASSETS_DIR, name));
       if ((i + 1) % 100 === 0) console.log(`  ${i + 1}/${files.length}`);
     } catch (e) {
       console.error("Ошибка при загрузке", name, e.message);
@@ -60,6 +109,21 @@ async function main() {
   }
 
   console.log(`Готово: ${files.length} файлов.`);
+}
+
+async function main() {
+  const token = process.env.BLOB_READ_WRITE_TOKEN;
+  if (!token) {
+    console.error("Задайте BLOB_READ_WRITE_TOKEN (Vercel → Storage → Blob store → env).");
+    console.error("Локально: vercel env pull");
+    process.exit(1);
+  }
+
+  if (!process.argv.includes("--all") && fs.existsSync(PLAN_FILE)) {
+    await uploadPlan();
+  } else {
+    await uploadAll();
+  }
   if (baseUrl) console.log("BLOB_STORE_URL =", baseUrl);
 }
 
@@ -1,6 +1,7 @@
 import { NextResponse } from "next/server";
 import path from "path";
 import fs from "fs";
+import crypto from "crypto";
 import Database from "better-sqlite3";
 
 export const runtime = "nodejs";
@@ -15,6 +16,48 @@ const ASSETS_BASE =
   process.env.BLOB_STORE_URL ??
   "https://raw.githubusercontent.com/rsn771/telegram-minimarket/main/database/logo%26screens/";
 
+// Уменьшенные копии (database/optimize_assets.py, таблица asset_variants) — тот же порядок, что variants_base()
+// в export_snapshot.py: ASSET_VARIANTS_BASE_URL; иначе подпапка variants/ в Blob или /api/static локально.
+// null — копий по этому адресу нет (asset_variants/ не коммитится, на GitHub raw их нет): только оригиналы.
+const VARIANTS_BASE: string | null =
+  process.env.ASSET_VARIANTS_BASE_URL !== undefined
+    ? process.env.ASSET_VARIANTS_BASE_URL
+    : !ASSETS_BASE
+      ? ""
+      : process.env.ASSETS_BASE_URL === undefined && process.env.BLOB_STORE_URL !== undefined
+        ? ASSETS_BASE + "variants/"
+        : null;
+
+type VariantUrls = Record<string, string>;
+
+function getVariantUrl(file: string): string {
+  return VARIANTS_BASE ? VARIANTS_BASE + encodeURIComponent(file) : `/api/static?variant=${encodeURIComponent(file)}`;
+}
+
+let variantsState: { key: string; files: Map<string, VariantUrls> } | null = null;
+
+/** {имя файла: {вариант: URL}} из asset_variants; перечитывается, только когда меняется файл БД. */
+function loadVariants(db: InstanceType<typeof Database>): Map<string, VariantUrls> {
+  if (VARIANTS_BASE === null) return new Map();
+  const key = statKey(DB_PATH);
+  if (variantsState?.key === key) return variantsState.files;
+  const files = new Map<string, VariantUrls>();
+  try {
+    const rows = db
+      .prepare("SELECT name, variant, file FROM asset_variants WHERE variant != 'original' ORDER BY name, variant")
+      .all() as { name: string; variant: string; file: string }[];
+    for (const row of rows) {
+      let urls = files.get(row.name);
+      if (!urls) files.set(row.name, (urls = {}));
+      urls[row.variant] = getVariantUrl(row.file);
+    }
+  } catch {
+    // Таблицы ещё нет (optimize_assets.py не запускался) — только оригиналы
+  }
+  variantsState = { key, files };
+  return files;
+}
+
 function getIconUrl(icon: string | null): string {
   if (!icon) return "https://api.dicebear.com/7.x/shapes/svg?seed=default";
   if (icon.startsWith("http://") || icon.startsWith("https://")) return icon;
@@ -105,7 +148,7 @@ function getSelectCols(db: InstanceType<typeof Database>): string {
   return wanted.filter((col) => existing.has(col)).join(", ");
 }
 
-function toChannel(row: ChannelRow): {
+type ApiChannel = {
   id: string;
   name: string;
   category: string;
@@ -116,8 +159,12 @@ function toChannel(row: ChannelRow): {
   isVerified: boolean;
   screenshots: string[];
   shortDescription: string;
-} {
-  return {
+  iconVariants?: VariantUrls;
+  screenshotVariants?: VariantUrls[];
+};
+
+function toChannel(row: ChannelRow, variants: Map<string, VariantUrls> = new Map()): ApiChannel {
+  const channel: ApiChannel = {
     id: String(row.idminiapp),
     name: row.title,
     category: row.category ?? "Утилиты",
@@ -129,6 +176,147 @@ function toChannel(row: ChannelRow): {
     screenshots: parseScreenshots(row.screenshots_path ?? null),
     shortDescription: row.short_description ?? "",
   };
+  // Как to_channel в export_snapshot.py: поля есть, только если копии есть
+  if (variants.size) {
+    const icon = row.icon ? variants.get(row.icon) : undefined;
+    if (icon) channel.iconVariants = icon;
+    const screenshots = (row.screenshots_path ?? "")
+      .split(";")
+      .map((s) => s.trim())
+      .filter(Boolean)
+      .map((name) => variants.get(name) ?? {});
+    if (screenshots.some((urls) => Object.keys(urls).length)) channel.screenshotVariants = screenshots;
+  }
+  return channel;
+}
+
+// Готовый снимок каталога из database/export_snapshot.py: JSON уже собран и сжат (gzip/brotli).
+// Используется, пока sha256 файла БД, ASSETS_BASE и VARIANTS_BASE совпадают с манифестом; иначе читаем SQLite.
+const SNAPSHOT_DIR = path.join(DB_DIR, "snapshot");
+const SNAPSHOT_MANIFEST = path.join(SNAPSHOT_DIR, "manifest.json");
+const SNAPSHOT_FORMAT = 2;
+
+type SnapshotEntry = {
+  file: string;
+  etag: string;
+  count: number;
+  size: number;
+  encodings: Record<string, string>;
+};
+
+type SnapshotManifest = {
+  format: number;
+  source_sha256: string;
+  assets_base: string;
+  variants_base: string | null;
+  all: SnapshotEntry;
+  categories: Record<string, SnapshotEntry>;
+};
+
+type Channel = ReturnType<typeof toChannel>;
+
+let snapshotState: { key: string; manifest: SnapshotManifest | null } | null = null;
+const snapshotFiles = new Map<string, Buffer>();
+let snapshotById: { etag: string; channels: Map<string, Channel> } | null = null;
+
+function statKey(filePath: string): string {
+  try {
+    const st = fs.statSync(filePath);
+    return `${st.size}:${st.mtimeMs}`;
+  } catch {
+    return "-";
+  }
+}
+
+/** Манифест снимка, если он соответствует текущей БД. БД хэшируется только когда меняется её stat. */
+function loadSnapshot(): SnapshotManifest | null {
+  // Непустой WAL — в БД есть правки, которых ещё нет в основном файле
+  const walPath = DB_PATH + "-wal";
+  if (fs.existsSync(walPath) && fs.statSync(walPath).size > 0) return null;
+
+  const key = `${statKey(SNAPSHOT_MANIFEST)}|${statKey(DB_PATH)}`;
+  if (snapshotState?.key === key) return snapshotState.manifest;
+
+  let manifest: SnapshotManifest | null = null;
+  try {
+    const parsed = JSON.parse(fs.readFileSync(SNAPSHOT_MANIFEST, "utf8")) as SnapshotManifest;
+    const digest = crypto.createHash("sha256").update(fs.readFileSync(DB_PATH)).digest("hex");
+    if (
+      parsed.format === SNAPSHOT_FORMAT &&
+      parsed.source_sha256 === digest &&
+      parsed.assets_base === ASSETS_BASE &&
+      parsed.variants_base === VARIANTS_BASE
+    ) {
+      manifest = parsed;
+    }
+  } catch {
+    manifest = null;
+  }
+  snapshotFiles.clear();
+  snapshotById = null;
+  snapshotState = { key, manifest };
+  return manifest;
+}
+
+function readSnapshotFile(name: string): Buffer {
+  let data = snapshotFiles.get(name);
+  if (!data) {
+    data = fs.readFileSync(path.join(SNAPSHOT_DIR, name));
+    snapshotFiles.set(name, data);
+  }
+  return data;
+}
+
+function snapshotChannel(manifest: SnapshotManifest, id: string): Channel | undefined {
+  if (snapshotById?.etag !== manifest.all.etag) {
+    const channels = JSON.parse(readSnapshotFile(manifest.all.file).toString("utf8")) as Channel[];
+    snapshotById = { etag: manifest.all.etag, channels: new Map(channels.map((c) => [c.id, c])) };
+  }
+  return snapshotById.channels.get(id);
+}
+
+/** Вес кодировки в Accept-Encoding (q, по умолчанию 1): 0 — не названа или явно запрещена (q=0). "*" — любая другая. */
+function encodingWeight(acceptEncoding: string, encoding: string): number {
+  let wildcard = 0;
+  for (const part of acceptEncoding.toLowerCase().split(",")) {
+    const [name, ...params] = part.split(";").map((s) => s.trim());
+    const q = params.find((p) => p.startsWith("q="));
+    const weight = q ? Number(q.slice(2)) : 1;
+    if (name === encoding) return weight > 0 ? weight : 0;
+    if (name === "*") wildcard = weight > 0 ? weight : 0;
+  }
+  return wildcard;
+}
+
+/** Отдаёт файл снимка: 304 по If-None-Match, иначе уже сжатая копия по Accept-Encoding. */
+function snapshotResponse(request: Request, entry: SnapshotEntry): NextResponse {
+  const acceptEncoding = request.headers.get("accept-encoding") ?? "";
+  // Больший q выигрывает, при равных — br (меньше)
+  let encoding: string | undefined;
+  let best = 0;
+  for (const enc of ["br", "gzip"]) {
+    const weight = entry.encodings[enc] ? encodingWeight(acceptEncoding, enc) : 0;
+    if (weight > best) {
+      encoding = enc;
+      best = weight;
+    }
+  }
+  // У сжатых копий свой ETag: это другое представление того же ответа
+  const etag = encoding ? `${entry.etag.slice(0, -1)}-${encoding}"` : entry.etag;
+  const headers: Record<string, string> = {
+    ETag: etag,
+    "Cache-Control": "public, max-age=0, must-revalidate",
+    Vary: "Accept-Encoding",
+  };
+
+  const ifNoneMatch = request.headers.get("if-none-match");
+  if (ifNoneMatch && ifNoneMatch.split(",").some((tag) => tag.trim().replace(/^W\//, "") === etag)) {
+    return new NextResponse(null, { status: 304, headers });
+  }
+
+  headers["Content-Type"] = "application/json; charset=utf-8";
+  if (encoding) headers["Content-Encoding"] = encoding;
+  return new NextResponse(readSnapshotFile(encoding ? entry.encodings[encoding] : entry.file), { headers });
 }
 
 export async function GET(request: Request) {
@@ -136,6 +324,54 @@ export async function GET(request: Request) {
     return NextResponse.json([]);
   }
 
+  const { searchParams } = new URL(request.url);
+  const id = searchParams.get("id");
+  const search = searchParams.get("search");
+  const category = searchParams.get("category");
+  const similar = searchParams.get("similar");
+
+  // Похожие приложения: готовые списки из similar_channels (database/similar_apps.py), один запрос по ключу
+  if (similar) {
+    let db: InstanceType<typeof Database> | undefined;
+    try {
+      db = new Database(DB_PATH, { readonly: true });
+      const cols = getSelectCols(db)
+        .split(", ")
+        .map((col) => `c.${col}`)
+        .join(", ");
+      const rows = db
+        .prepare(
+          `SELECT ${cols} FROM similar_channels s JOIN channels c ON c.idminiapp = s.similar_id
+           WHERE s.idminiapp = ? ORDER BY s.rank`
+        )
+        .all(similar) as ChannelRow[];
+      const variants = loadVariants(db);
+      return NextResponse.json(rows.map((row) => toChannel(row, variants)));
+    } catch {
+      // Таблицы ещё нет (similar_apps.py не запускался) — похожих нет
+      return NextResponse.json([]);
+    } finally {
+      db?.close();
+    }
+  }
+
+  if (!search) {
+    const snapshot = loadSnapshot();
+    if (snapshot) {
+      if (id) {
+        const channel = snapshotChannel(snapshot, id);
+        return channel
+          ? NextResponse.json(channel)
+          : NextResponse.json({ error: "Канал не найден" }, { status: 404 });
+      }
+      if (category) {
+        const entry = snapshot.categories[category];
+        return entry ? snapshotResponse(request, entry) : NextResponse.json([]);
+      }
+      return snapshotResponse(request, snapshot.all);
+    }
+  }
+
   let db: InstanceType<typeof Database> | undefined;
   try {
     ensureDbExists();
@@ -156,8 +392,7 @@ export async function GET(request: Request) {
     }
 
     const selectCols = getSelectCols(db);
-    const { searchParams } = new URL(request.url);
-    const id = searchParams.get("id");
+    const variants = loadVariants(db);
 
     if (id) {
       const row = db.prepare(`SELECT ${selectCols} FROM channels WHERE idminiapp = ?`).get(id) as ChannelRow | undefined;
@@ -165,12 +400,11 @@ export async function GET(request: Request) {
         db.close();
         return NextResponse.json({ error: "Канал не найден" }, { status: 404 });
       }
-      const channel = toChannel(row);
+      const channel = toChannel(row, variants);
       db.close();
       return NextResponse.json(channel);
     }
 
-    const search = searchParams.get("search");
     let rows: ChannelRow[];
 
     if (search) {
@@ -183,7 +417,8 @@ export async function GET(request: Request) {
       rows = db.prepare(`SELECT ${selectCols} FROM channels`).all() as ChannelRow[];
     }
 
-    const channels = rows.map((row) => toChannel(row));
+    let channels = rows.map((row) => toChannel(row, variants));
+    if (category) channels = channels.filter((c) => c.category === category);
     db.close();
     return NextResponse.json(channels);
   } catch (err) {
@@ -3,17 +3,21 @@ import path from "path";
 import fs from "fs";
 
 const LOGO_SCREENS_FOLDER = path.join(process.cwd(), "database", "logo&screens");
+// Уменьшенные копии из database/optimize_assets.py: ?variant=<хэш>_<вариант>.webp
+const VARIANTS_FOLDER = path.join(process.cwd(), "database", "asset_variants");
 
 export async function GET(request: Request) {
   try {
     const { searchParams } = new URL(request.url);
-    const file = searchParams.get("file");
+    const variant = searchParams.get("variant");
+    const file = variant ?? searchParams.get("file");
+    const folder = variant ? VARIANTS_FOLDER : LOGO_SCREENS_FOLDER;
     if (!file || !/^[\w.-]+\.webp$/i.test(file)) {
       return NextResponse.json({ error: "Неверное имя файла" }, { status: 400 });
     }
-    const filePath = path.join(LOGO_SCREENS_FOLDER, file);
+    const filePath = path.join(folder, file);
     const resolved = path.resolve(filePath);
-    if (!resolved.startsWith(path.resolve(LOGO_SCREENS_FOLDER))) {
+    if (!resolved.startsWith(path.resolve(folder))) {
       return NextResponse.json({ error: "Доступ запрещён" }, { status: 403 });
     }
     if (!fs.existsSync(resolved)) {
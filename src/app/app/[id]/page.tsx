@@ -1,9 +1,10 @@
 "use client";
 import { useState, useEffect } from "react";
+import Link from "next/link";
 import { useParams, useRouter } from "next/navigation";
 import { ChevronLeft, ChevronDown, ChevronUp, Star, ShieldCheck, Plus } from "lucide-react";
 import { hapticFeedback } from "@/utils/telegram";
-import { useApps } from "@/context/AppsContext";
+import { useApps, type AppItem } from "@/context/AppsContext";
 import { useMyApps } from "@/context/MyAppsContext";
 import { AppIcon } from "@/components/AppIcon";
 
@@ -16,6 +17,16 @@ type Review = {
   createdAt: string;
 };
 
+/** Уменьшенная копия не загрузилась (например, ещё не выложена) — показываем оригинал. */
+function fallbackToOriginal(original: string) {
+  return (e: React.SyntheticEvent<HTMLImageElement>) => {
+    const img = e.currentTarget;
+    if (img.dataset.original) return;
+    img.dataset.original = "1";
+    img.src = original;
+  };
+}
+
 export default function AppDetail() {
   const { id } = useParams();
   const router = useRouter();
@@ -30,6 +41,7 @@ export default function AppDetail() {
   const [submittingReview, setSubmittingReview] = useState(false);
   const [mounted, setMounted] = useState(false);
   const [showAllReviews, setShowAllReviews] = useState(false);
+  const [similarApps, setSimilarApps] = useState<AppItem[]>([]);
   const app = typeof id === "string" ? getAppById(id) : undefined;
 
   // ВСЕ хуки должны быть вызваны ДО любых условных возвратов (правила React Hooks)
@@ -112,6 +124,15 @@ export default function AppDetail() {
       });
   }, [mounted, app?.id]);
 
+  // Похожие приложения считаются заранее (database/similar_apps.py), здесь — один запрос
+  useEffect(() => {
+    if (!mounted || !app?.id) return;
+    fetch(`/api/channels?similar=${encodeURIComponent(app.id)}`)
+      .then((res) => res.json())
+      .then((data) => setSimilarApps(Array.isArray(data) ? data : []))
+      .catch(() => setSimilarApps([]));
+  }, [mounted, app?.id]);
+
   // Условные возвраты ПОСЛЕ всех хуков
   if (loading) return <div className="p-10 text-center font-sans text-black dark:text-white bg-transparent">Загрузка…</div>;
   if (!app) return <div className="p-10 text-center font-sans text-black dark:text-white bg-transparent">Приложение не найдено</div>;
@@ -205,7 +226,7 @@ export default function AppDetail() {
       <div className="mx-3 mt-4 rounded-2xl bg-white/60 dark:bg-gray-800/60 backdrop-blur-xl border border-white/40 dark:border-gray-600/40 pb-6 overflow-hidden">
         <div className="px-5 flex gap-5 mt-4">
           <div className="relative shrink-0">
-            <AppIcon src={app.icon} alt={app.name} className="w-28 h-28 rounded-[22%] shadow-lg border border-white/40 dark:border-gray-600/40 object-cover" />
+            <AppIcon src={app.icon} variants={app.iconVariants} size={112} alt={app.name} className="w-28 h-28 rounded-[22%] shadow-lg border border-white/40 dark:border-gray-600/40 object-cover" />
           </div>
           <div className="flex flex-col justify-between py-1">
             <div>
@@ -268,7 +289,12 @@ export default function AppDetail() {
                 onClick={() => openScreenshot(i)}
                 className="flex-shrink-0 rounded-xl overflow-hidden shadow-lg border border-white/40 dark:border-gray-600/40 bg-gray-100 dark:bg-gray-700 focus:outline-none focus:ring-2 focus:ring-[#007AFF] focus:ring-offset-2 dark:focus:ring-offset-gray-900 active:opacity-90"
               >
-                <img src={src} alt={`Скриншот ${i + 1}`} className="max-h-[420px] w-auto object-contain block" />
+                <img
+                  src={app.screenshotVariants?.[i]?.detail ?? src}
+                  alt={`Скриншот ${i + 1}`}
+                  className="max-h-[420px] w-auto object-contain block"
+                  onError={fallbackToOriginal(src)}
+                />
               </button>
             ))}
           </div>
@@ -282,6 +308,27 @@ export default function AppDetail() {
         </p>
       </div>
 
+      {similarApps.length > 0 && (
+        <div className="mt-3 mx-3 rounded-2xl bg-white/60 dark:bg-gray-800/60 backdrop-blur-xl border border-white/40 dark:border-gray-600/40 py-6 overflow-hidden">
+          <h2 className="px-5 text-[20px] font-bold mb-4 tracking-tight text-black dark:text-white">Похожие</h2>
+          <div className="flex gap-4 overflow-x-auto px-5 no-scrollbar">
+            {similarApps.map((item) => (
+              <Link
+                key={item.id}
+                href={`/app/${item.id}`}
+                onClick={() => hapticFeedback("light")}
+                className="flex-shrink-0 w-[72px] flex flex-col items-center gap-1.5 active:opacity-70"
+              >
+                <AppIcon src={item.icon} variants={item.iconVariants} size={64} alt={item.name} className="w-16 h-16 rounded-[22%] shadow border border-white/40 dark:border-gray-600/40 object-cover" />
+                <span className="w-full text-center text-[12px] leading-tight text-gray-700 dark:text-gray-300 line-clamp-2">
+                  {item.name}
+                </span>
+              </Link>
+            ))}
+          </div>
+        </div>
+      )}
+
       <div className="mx-3 mt-3 px-5 py-6 rounded-2xl bg-white/60 dark:bg-gray-800/60 backdrop-blur-xl border border-white/40 dark:border-gray-600/40">
         <h2 className="text-[20px] font-bold mb-4 tracking-tight text-black dark:text-white">Отзывы</h2>
         <div className="flex flex-wrap items-end gap-4 mb-5">
@@ -54,7 +54,7 @@ export const AppCard = ({ app, openDirectly = false }: { app: AppItem; openDirec
     <div className="flex items-center gap-4 p-4 mx-2 rounded-2xl active:bg-white/50 dark:active:bg-gray-800/50 transition-colors">
       <Link href={`/app/${app.id}`} className="flex items-center gap-4 flex-1 min-w-0" onClick={handleClick}>
         <div className="w-16 h-16 flex-shrink-0 overflow-hidden rounded-[22%] border border-white/40 dark:border-gray-600/40 shadow-sm">
-          <AppIcon src={app.icon} alt={app.name} className="w-full h-full object-cover" />
+          <AppIcon src={app.icon} variants={app.iconVariants} size={64} alt={app.name} className="w-full h-full object-cover" />
         </div>
         <div className="flex-1 border-b border-gray-200/80 dark:border-gray-600/80 pb-4 min-w-0">
           <h3 className="font-bold text-[17px] text-black dark:text-white tracking-tight truncate">
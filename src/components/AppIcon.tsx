@@ -2,16 +2,39 @@
 
 import { useState } from "react";
 
+// Уменьшенные копии иконки (database/optimize_assets.py) и их сторона в пикселях
+const ICON_VARIANTS: [string, number][] = [
+  ["icon64", 64],
+  ["icon128", 128],
+  ["icon256", 256],
+];
+
 type AppIconProps = {
   src: string;
   alt: string;
   className?: string;
+  /** iconVariants из /api/channels */
+  variants?: Record<string, string>;
+  /** Сторона иконки на экране в CSS-пикселях: по ней выбирается копия для 1x и 2x */
+  size?: number;
 };
 
-export function AppIcon({ src, alt, className = "" }: AppIconProps) {
-  const [error, setError] = useState(false);
+/** src и srcSet по наименьшей копии не меньше size (для 2x — не меньше 2 * size); null — копий нет. */
+function pickVariant(variants: Record<string, string> | undefined, size: number | undefined) {
+  const available = ICON_VARIANTS.filter(([name]) => variants?.[name]);
+  if (!variants || !size || available.length === 0) return null;
+  const at = (px: number) => (available.find(([, side]) => side >= px) ?? available[available.length - 1])[0];
+  const one = variants[at(size)];
+  const two = variants[at(size * 2)];
+  return { src: one, srcSet: two !== one ? `${one} 1x, ${two} 2x` : undefined };
+}
+
+export function AppIcon({ src, alt, className = "", variants, size }: AppIconProps) {
+  // 0 — копия, 1 — копия не загрузилась, показываем оригинал, 2 — нет и оригинала
+  const [failed, setFailed] = useState(0);
+  const variant = failed === 0 ? pickVariant(variants, size) : null;
 
-  if (error || !src) {
+  if (failed === 2 || !src) {
     const letter = alt ? alt.trim().charAt(0).toUpperCase() : "?";
     return (
       <div
@@ -25,11 +48,13 @@ export function AppIcon({ src, alt, className = "" }: AppIconProps) {
 
   return (
     <img
-      src={src}
+      key={variant ? "variant" : "original"}
+      src={variant?.src ?? src}
+      srcSet={variant?.srcSet}
       alt={alt}
       className={className}
       loading="lazy"
-      onError={() => setError(true)}
+      onError={() => setFailed(variant ? 1 : 2)}
     />
   );
 }
@@ -107,6 +107,8 @@ export function HeroBanner() {
               >
                 <AppIcon
                   src={app.icon}
+                  variants={app.iconVariants}
+                  size={72}
                   alt={app.name}
                   className="w-full h-full object-cover"
                 />
@@ -9,6 +9,7 @@ import { BottomNav } from "@/components/BottomNav";
 import { HeroBanner } from "@/components/HeroBanner";
 import { ThemeToggle } from "@/components/ThemeToggle";
 import { useApps, type AppItem } from "@/context/AppsContext";
+import { loadAutocompleteIndex, type AutocompleteIndex } from "@/utils/autocomplete";
 import { hapticFeedback } from "@/utils/telegram";
 
 function filterApps(apps: AppItem[], query: string): AppItem[] {
@@ -21,6 +22,24 @@ function filterApps(apps: AppItem[], query: string): AppItem[] {
   );
 }
 
+/** Сначала подсказки индекса (опечатки, раскладка, транслит; по рейтингу), затем совпадения по подстроке. */
+function searchApps(
+  apps: AppItem[],
+  byId: Map<string, AppItem>,
+  index: AutocompleteIndex | null,
+  query: string
+): AppItem[] {
+  const substring = filterApps(apps, query);
+  if (!index || !query.trim()) return substring;
+  // id из устаревшего индекса, которых уже нет в каталоге, пропускаются
+  const suggested = index
+    .suggest(query)
+    .map((id) => byId.get(id))
+    .filter((app): app is AppItem => app !== undefined);
+  const seen = new Set(suggested.map((app) => app.id));
+  return suggested.concat(substring.filter((app) => !seen.has(app.id)));
+}
+
 const STORAGE_KEY = "home-expand";
 const SCROLL_KEY = "home-scroll";
 
@@ -56,6 +75,7 @@ export function HomeSearch() {
   const [query, setQuery] = useState("");
   const [showSuggestions, setShowSuggestions] = useState(false);
   const [focused, setFocused] = useState(false);
+  const [index, setIndex] = useState<AutocompleteIndex | null>(null);
   const [showAllTopCharts, setShowAllTopCharts] = useState(false);
   const [showAllNeural, setShowAllNeural] = useState(false);
   const [showAllGames, setShowAllGames] = useState(false);
@@ -100,7 +120,20 @@ export function HomeSearch() {
     return () => cancelAnimationFrame(id);
   }, [showAllTopCharts, showAllNeural, showAllGames]);
 
-  const matches = useMemo(() => filterApps(apps, query), [apps, query]);
+  // Индекс подсказок грузим при первом фокусе на поиске; без него ищем по подстроке
+  useEffect(() => {
+    if (!focused || index) return;
+    let cancelled = false;
+    loadAutocompleteIndex().then((loaded) => {
+      if (!cancelled) setIndex(loaded);
+    });
+    return () => {
+      cancelled = true;
+    };
+  }, [focused, index]);
+
+  const appsById = useMemo(() => new Map<string, AppItem>(apps.map((app) => [app.id, app])), [apps]);
+  const matches = useMemo(() => searchApps(apps, appsById, index, query), [apps, appsById, index, query]);
   const hasQuery = query.trim().length > 0;
 
   useEffect(() => {
@@ -208,7 +241,7 @@ export function HomeSearch() {
                     className="flex items-center gap-3 px-4 py-3 active:bg-black/5 dark:active:bg-white/5 transition-colors"
                   >
                     <div className="w-10 h-10 flex-shrink-0 overflow-hidden rounded-[18%] border border-gray-200/80 dark:border-gray-600/80">
-                      <AppIcon src={app.icon} alt={app.name} className="w-full h-full object-cover" />
+                      <AppIcon src={app.icon} variants={app.iconVariants} size={40} alt={app.name} className="w-full h-full object-cover" />
                     </div>
                     <div className="flex-1 min-w-0">
                       <p className="font-semibold text-[15px] text-black dark:text-white truncate">
@@ -13,6 +13,10 @@ export type AppItem = {
   shortDescription?: string;
   screenshots?: string[];
   isVerified?: boolean;
+  /** Уменьшенные копии иконки: {icon64, icon128, icon256: URL} */
+  iconVariants?: Record<string, string>;
+  /** Уменьшенные копии скриншотов по порядку screenshots: {thumb, detail: URL} */
+  screenshotVariants?: Record<string, string>[];
 };
 
 type AppsContextType = {
@@ -28,7 +32,7 @@ const AppsContext = createContext<AppsContextType | null>(null);
 async function fetchApps(): Promise<AppItem[]> {
   try {
     const res = await fetch("/api/channels", {
-      cache: "no-store", // Отключаем кеширование для получения актуальных данных
+      cache: "no-cache", // Всегда сверяемся с сервером, но по ETag без повторной загрузки каталога
     });
     
     if (!res.ok) {
@@ -63,6 +67,8 @@ async function fetchApps(): Promise<AppItem[]> {
         shortDescription?: string;
         screenshots?: string[];
         isVerified?: boolean;
+        iconVariants?: Record<string, string>;
+        screenshotVariants?: Record<string, string>[];
       }) => ({
         id: c.id,
         name: c.name,
@@ -74,6 +80,8 @@ async function fetchApps(): Promise<AppItem[]> {
         shortDescription: c.shortDescription,
         screenshots: c.screenshots,
         isVerified: c.isVerified,
+        iconVariants: c.iconVariants,
+        screenshotVariants: c.screenshotVariants,
       })
     );
   } catch (error) {
@@ -0,0 +1,212 @@
+/**
+ * Подсказки поиска по индексу public/autocomplete.bin (выгружает database/autocomplete.py export).
+ * Тот же алгоритм, что в autocomplete.py: префиксное дерево по названиям в canonical-виде, запрос в другой
+ * раскладке и поиск с опечатками. canonical() и константы должны совпадать с Python-версией.
+ */
+
+const FORMAT = 1;
+const NONE = 0xffffffff;
+// Поиск с опечатками проверяет не больше стольких узлов — на оба варианта запроса вместе
+const FUZZY_NODES = 1000;
+
+const TRANSLIT: Record<string, string> = {
+  а: "a", б: "b", в: "v", г: "g", д: "d", е: "e", ё: "e", ж: "zh", з: "z", и: "i",
+  й: "y", к: "k", л: "l", м: "m", н: "n", о: "o", п: "p", р: "r", с: "s", т: "t",
+  у: "u", ф: "f", х: "h", ц: "ts", ч: "ch", ш: "sh", щ: "sch", ъ: "", ы: "y", ь: "",
+  э: "e", ю: "yu", я: "ya",
+};
+const FOLD: [string, string][] = [
+  ["zh", "j"], ["ph", "f"], ["ck", "k"], ["c", "k"], ["q", "k"], ["w", "v"], ["x", "ks"], ["y", "i"],
+];
+const LAYOUT_EN = "qwertyuiop[]asdfghjkl;'zxcvbnm,.`";
+const LAYOUT_RU = "йцукенгшщзхъфывапролджэячсмитьбюё";
+const LAYOUT: Record<string, string> = {};
+for (let i = 0; i < LAYOUT_EN.length; i++) {
+  LAYOUT[LAYOUT_EN[i]] = LAYOUT_RU[i];
+  LAYOUT[LAYOUT_RU[i]] = LAYOUT_EN[i];
+}
+
+/** Вид для ключей и запросов: a-z, 0-9 и одиночные пробелы (транслит, без диакритики, замены FOLD). */
+export function canonical(text: string): string {
+  let out = "";
+  for (const ch of (text ?? "").toLowerCase()) out += TRANSLIT[ch] ?? ch;
+  out = out.normalize("NFKD").replace(/[\u0300-\u036f]/g, "");
+  out = out.replace(/[^a-z0-9]+/g, " ").trim();
+  for (const [from, to] of FOLD) out = out.split(from).join(to);
+  return out;
+}
+
+/** Текст, набранный не в той раскладке: латиница <-> кириллица по клавишам ЙЦУКЕН/QWERTY. */
+export function swapLayout(text: string): string {
+  let out = "";
+  for (const ch of (text ?? "").toLowerCase()) out += LAYOUT[ch] ?? ch;
+  return out;
+}
+
+function maxDistance(key: string): number {
+  return key.length < 4 ? 0 : key.length < 9 ? 1 : 2;
+}
+
+export class AutocompleteIndex {
+  private constructor(
+    readonly ids: string[],
+    private readonly chars: Uint8Array,
+    private readonly subtreeEnd: Uint32Array,
+    private readonly postStart: Uint32Array,
+    private readonly postIds: Uint32Array,
+    private readonly top: Map<number, number[]>,
+    readonly limit: number
+  ) {}
+
+  /** Разбирает файл индекса. Массивы читаются без копирования (little-endian — как во всех браузерах). */
+  static parse(buffer: ArrayBuffer): AutocompleteIndex {
+    const view = new DataView(buffer);
+    const magic = String.fromCharCode(...new Uint8Array(buffer, 0, 4));
+    if (magic !== "MMAC" || view.getUint32(4, true) !== FORMAT) {
+      throw new Error("Не файл индекса подсказок или другая версия формата");
+    }
+    const [limit, items, nodes, postings, tops, idsLength] = [8, 12, 16, 20, 24, 28].map((o) =>
+      view.getUint32(o, true)
+    );
+    let offset = 32;
+    const bytes = (n: number) => {
+      const result = new Uint8Array(buffer, offset, n);
+      offset += n + ((4 - (n % 4)) % 4);
+      return result;
+    };
+    const uint32 = (n: number) => {
+      const result = new Uint32Array(buffer, offset, n);
+      offset += 4 * n;
+      return result;
+    };
+
+    const idsBytes = bytes(idsLength);
+    const ids = items ? new TextDecoder().decode(idsBytes).split("\n") : [];
+    const chars = bytes(nodes);
+    const subtreeEnd = uint32(nodes);
+    const postStart = uint32(nodes + 1);
+    const postIds = uint32(postings);
+    const topNodes = uint32(tops);
+    const topItems = uint32(tops * limit);
+    const top = new Map<number, number[]>();
+    topNodes.forEach((node, i) => {
+      top.set(node, Array.from(topItems.subarray(i * limit, (i + 1) * limit)).filter((item) => item !== NONE));
+    });
+    return new AutocompleteIndex(ids, chars, subtreeEnd, postStart, postIds, top, limit);
+  }
+
+  private child(node: number, ch: number): number {
+    const end = this.subtreeEnd[node];
+    for (let child = node + 1; child < end; child = this.subtreeEnd[child]) {
+      if (this.chars[child] === ch) return child;
+    }
+    return -1;
+  }
+
+  private find(key: string): number {
+    let node = 0;
+    for (let i = 0; i < key.length && node >= 0; i++) node = this.child(node, key.charCodeAt(i));
+    return node;
+  }
+
+  /** Лучшие номера приложений в поддереве узла. */
+  private best(node: number): number[] {
+    const cached = this.top.get(node);
+    if (cached) return cached;
+    const items = this.postIds.subarray(this.postStart[node], this.postStart[this.subtreeEnd[node]]);
+    return Array.from(new Set(items)).sort((a, b) => a - b).slice(0, this.limit);
+  }
+
+  /**
+   * Узлы на расстоянии Левенштейна не больше maxDist от key (первая буква совпадает, полоса depth ± maxDist)
+   * и остаток budget: проверяется не больше budget узлов.
+   */
+  private fuzzy(key: string, maxDist: number, budget: number = FUZZY_NODES): [Map<number, number>, number] {
+    const m = key.length;
+    const found = new Map<number, number>();
+    const start = this.child(0, key.charCodeAt(0));
+    if (start < 0) return [found, budget];
+    const far = maxDist + 1;
+    const first = [1];
+    for (let j = 1; j <= m; j++) first.push(Math.min(j - 1, far));
+    const stack: [number, number, number[]][] = [[start, 1, first]];
+    while (stack.length && budget > 0) {
+      const [node, nodeDepth, row] = stack.pop()!;
+      if (row[m] <= maxDist) {
+        if (row[m] < (found.get(node) ?? far)) found.set(node, row[m]);
+        if (Math.min(...row) >= row[m]) continue;
+      }
+      const depth = nodeDepth + 1;
+      const lo = Math.max(1, depth - maxDist);
+      const hi = Math.min(m, depth + maxDist);
+      const end = this.subtreeEnd[node];
+      for (let child = node + 1; child < end && budget > 0; child = this.subtreeEnd[child]) {
+        budget--;
+        const ch = this.chars[child];
+        const next = new Array<number>(m + 1).fill(far);
+        if (depth <= maxDist) next[0] = depth;
+        let rowMin = next[0];
+        for (let j = lo; j <= hi; j++) {
+          const cost = Math.min(row[j - 1] + (key.charCodeAt(j - 1) === ch ? 0 : 1), row[j] + 1, next[j - 1] + 1, far);
+          next[j] = cost;
+          if (cost < rowMin) rowMin = cost;
+        }
+        if (rowMin <= maxDist) stack.push([child, depth, next]);
+      }
+    }
+    return [found, budget];
+  }
+
+  /**
+   * id приложений для подсказки: префиксы запроса, если их нет — префиксы запроса в другой раскладке (как одна
+   * опечатка), если нет и их — префиксы с опечатками, тоже сначала для запроса как есть. Меньше опечаток —
+   * выше, при равенстве — выше рейтинг. На поиск с опечатками у обоих вариантов вместе FUZZY_NODES узлов.
+   */
+  suggest(query: string, limit: number = this.limit): string[] {
+    const variants: [string, number][] = [[canonical(query), 0]];
+    const swapped = swapLayout(query).trim();
+    // С ь, ъ, ы русские слова не начинаются — значит, раскладка была верной
+    if (swapped && !"ьъы".includes(swapped[0])) variants.push([canonical(swapped), 1]);
+    const keys = variants.filter(([key]) => key);
+    const best = new Map<number, number>();
+    const add = (node: number, rank: number) => {
+      for (const item of this.best(node)) {
+        if (rank < (best.get(item) ?? rank + 1)) best.set(item, rank);
+      }
+    };
+
+    for (const [key, penalty] of keys) {
+      const node = this.find(key);
+      if (node >= 0) {
+        add(node, penalty);
+        break;
+      }
+    }
+    // Сначала одна опечатка, две — только если с одной ничего нет: узкая полоса раскрывает намного меньше узлов
+    let budget = FUZZY_NODES;
+    for (const [key, penalty] of keys) {
+      for (let maxDist = 1; maxDist <= maxDistance(key) && best.size === 0 && budget > 0; maxDist++) {
+        const [found, left] = this.fuzzy(key, maxDist, budget);
+        budget = left;
+        found.forEach((dist, node) => add(node, dist + penalty));
+      }
+    }
+    return Array.from(best.keys())
+      .sort((a, b) => best.get(a)! - best.get(b)! || a - b)
+      .slice(0, Math.min(limit, this.limit))
+      .map((item) => this.ids[item]);
+  }
+}
+
+let pending: Promise<AutocompleteIndex | null> | null = null;
+
+/** Загружает индекс один раз; null — файла нет (тогда поиск работает по подстроке). */
+export function loadAutocompleteIndex(url = "/autocomplete.bin"): Promise<AutocompleteIndex | null> {
+  if (!pending) {
+    pending = fetch(url)
+      .then((res) => (res.ok ? res.arrayBuffer() : null))
+      .then((buffer) => (buffer ? AutocompleteIndex.parse(buffer) : null))
+      .catch(() => null);
+  }
+  return pending;
+}